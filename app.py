@@ -2,20 +2,35 @@
 Aplicación Flask principal - Sistema de Gestión de Tareas Web
 """
 import os
+import json
+import time
+import uuid
+import functools
+import base64
 import logging
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, g
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 from pathlib import Path
 import config
+import log_config
 import database
 import audio_pipeline
 import parser
-
-# Configurar logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='[%(levelname)s] %(message)s'
-)
+import transcription_jobs
+import audio_stream
+import instrumentation
+import response_cache
+import change_bus
+import task_io
+
+try:
+    from flask_sock import Sock
+except ImportError:  # Streaming por WebSocket desactivado
+    Sock = None
+
+# Configurar logging (asíncrono, texto o JSON según LOG_FORMAT)
+log_config.configure_logging()
 logger = logging.getLogger(__name__)
 
 # Inicializar Flask
@@ -23,11 +38,131 @@ app = Flask(__name__)
 app.secret_key = config.SECRET_KEY
 app.config['MAX_CONTENT_LENGTH'] = config.MAX_CONTENT_LENGTH
 app.config['UPLOAD_FOLDER'] = str(config.UPLOAD_FOLDER)
+sock = Sock(app) if Sock else None
 
 # Inicializar componentes
 db = database.Database()
 intent_parser = parser.IntentParser(db)
 
+api_cache = response_cache.ResponseCache()
+
+ALLOWED_AUDIO_EXTENSIONS = {'.ogg', '.wav', '.mp3', '.m4a', '.webm'}
+MAX_SEARCH_RESULTS = 50
+
+
+def _run_audio_job(audio: bytes) -> dict:
+    """Transcribe y parsea un audio (ejecutado por la cola de transcripción)"""
+    metrics = {}
+    transcript = audio_pipeline.process_audio_bytes(audio, metrics=metrics)
+    if not transcript:
+        raise ValueError('No se pudo transcribir el audio')
+    return {
+        'transcript': transcript,
+        'parsed': intent_parser.parse(transcript),
+        'metrics': metrics
+    }
+
+
+job_queue = transcription_jobs.TranscriptionJobQueue(_run_audio_job)
+
+
+def _conditional_get(view):
+    """
+    ETag según la versión de los datos: si el cliente ya tiene la versión actual se
+    responde 304 sin consultar las tablas ni serializar JSON, y las respuestas 200
+    se guardan en api_cache hasta que cambie la versión
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version = db.get_data_version()
+        etag = f'v{version}'
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+        else:
+            key = request.full_path
+            body = api_cache.get(key, version)
+            if body is None:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                api_cache.put(key, version, response.get_data())
+            else:
+                response = app.response_class(body, mimetype='application/json')
+        response.set_etag(etag)
+        # El navegador guarda la respuesta pero revalida siempre con If-None-Match
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    
+    return wrapper
+
+
+def _validate_audio_upload():
+    """Valida el archivo de audio recibido. Devuelve (file, error_response)"""
+    if 'audio' not in request.files:
+        return None, (jsonify({'error': 'No se recibió archivo de audio'}), 400)
+    
+    file = request.files['audio']
+    if file.filename == '':
+        return None, (jsonify({'error': 'Archivo vacío'}), 400)
+    
+    # Validar extensión
+    file_ext = Path(file.filename).suffix.lower()
+    if file_ext not in ALLOWED_AUDIO_EXTENSIONS:
+        return None, (jsonify({'error': f'Formato no soportado: {file_ext}'}), 400)
+    
+    return file, None
+
+
+@app.before_request
+def _assign_request_id():
+    """ID de correlación: el del proxy (X-Request-ID) o uno nuevo; aparece en los logs"""
+    request_id = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex[:16]
+    g.request_id = request_id
+    g.request_id_token = log_config.request_id_var.set(request_id)
+
+
+@app.after_request
+def _add_request_id_header(response):
+    if g.get('request_id'):
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+@app.teardown_request
+def _clear_request_id(exc=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        log_config.request_id_var.reset(token)
+
+
+@app.before_request
+def _start_request_timer():
+    if config.METRICS_ENABLED:
+        g.request_started = time.perf_counter()
+
+
+@app.after_request
+def _record_request_metrics(response):
+    """Cuenta peticiones y errores por ruta (también las 500 de excepciones no capturadas)"""
+    started = g.get('request_started')
+    if started is None:
+        return response
+    # La plantilla de la ruta ('/api/tasks/<int:task_id>') y no la URL, para acotar las series
+    route = request.url_rule.rule if request.url_rule else 'sin_ruta'
+    instrumentation.HTTP_SECONDS.observe(time.perf_counter() - started, route=route, method=request.method)
+    instrumentation.HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    if response.status_code >= 500:
+        instrumentation.HTTP_ERRORS.inc(route=route, method=request.method)
+    return response
+
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Métricas del worker en formato de texto de Prometheus"""
+    if not config.METRICS_ENABLED:
+        return jsonify({'error': 'Métricas desactivadas'}), 404
+    return app.response_class(instrumentation.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 @app.route('/')
 def index():
@@ -35,70 +170,250 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/healthz')
+def healthz():
+    """Salud del worker: 503 hasta que el modelo esté cargado y calentado"""
+    model = audio_pipeline.model_status()
+    if model['ready']:
+        return jsonify({'status': 'ok', 'model': model})
+    if model['error']:
+        # El modelo no carga, pero la API de tareas sigue funcionando
+        return jsonify({'status': 'degraded', 'model': model})
+    return jsonify({'status': 'warming', 'model': model}), 503
+
+
 @app.route('/api/audio/process', methods=['POST'])
 def process_audio():
     """Procesa audio y devuelve transcripción + parseo"""
     try:
-        if 'audio' not in request.files:
-            return jsonify({'error': 'No se recibió archivo de audio'}), 400
+        file, error = _validate_audio_upload()
+        if error:
+            return error
         
-        file = request.files['audio']
-        if file.filename == '':
-            return jsonify({'error': 'Archivo vacío'}), 400
+        # Procesar audio en memoria (sin archivos temporales)
+        logger.info(f"Procesando audio: {secure_filename(file.filename)}")
+        metrics = {}
+        with audio_pipeline.stage(metrics, 'upload'):
+            data = file.read()
+        transcript = audio_pipeline.process_audio_bytes(data, metrics=metrics)
         
-        # Validar extensión
-        allowed_extensions = {'.ogg', '.wav', '.mp3', '.m4a', '.webm'}
-        file_ext = Path(file.filename).suffix.lower()
-        if file_ext not in allowed_extensions:
-            return jsonify({'error': f'Formato no soportado: {file_ext}'}), 400
+        if not transcript:
+            return jsonify({'error': 'No se pudo transcribir el audio', 'metrics': metrics}), 400
         
-        # Guardar archivo temporal
-        filename = secure_filename(file.filename)
-        filepath = Path(app.config['UPLOAD_FOLDER']) / filename
-        file.save(str(filepath))
+        # Parsear intención
+        with audio_pipeline.stage(metrics, 'parse'):
+            parsed = intent_parser.parse(transcript)
+        
+        return jsonify({
+            'success': True,
+            'transcript': transcript,
+            'parsed': parsed,
+            'metrics': metrics
+        })
+    
+    except audio_pipeline.AudioTooLongError as e:
+        return jsonify({'error': str(e)}), 413
+    except Exception as e:
+        logger.error(f"Error procesando audio: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/audio/jobs', methods=['POST'])
+def create_audio_job():
+    """Encola un audio para transcripción y devuelve el ID del trabajo"""
+    try:
+        file, error = _validate_audio_upload()
+        if error:
+            return error
         
         try:
-            # Procesar audio
-            logger.info(f"Procesando audio: {filename}")
-            transcript = audio_pipeline.process_audio_from_file(str(filepath))
-            
-            if not transcript:
-                return jsonify({'error': 'No se pudo transcribir el audio'}), 400
-            
-            # Parsear intención
-            parsed = intent_parser.parse(transcript)
+            job = job_queue.submit(file.read())
+        except transcription_jobs.QueueFullError as e:
+            response = jsonify({'error': str(e)})
+            response.headers['Retry-After'] = '5'
+            return response, 429
+        
+        return jsonify({'success': True, 'job': job}), 202
+    
+    except Exception as e:
+        logger.error(f"Error encolando audio: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/audio/jobs/<job_id>', methods=['GET'])
+def get_audio_job(job_id):
+    """Consulta el estado de un trabajo (long-poll con ?wait=segundos)"""
+    try:
+        wait = request.args.get('wait', 0, type=float)
+        wait = max(0.0, min(wait, config.TRANSCRIPTION_MAX_WAIT_SECONDS))
+        
+        if wait:
+            job = job_queue.wait(job_id, wait)
+        else:
+            job = job_queue.get(job_id)
+        
+        if not job:
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        return jsonify({'success': True, 'job': job})
+    except Exception as e:
+        logger.error(f"Error consultando trabajo: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+def audio_stream_socket(ws):
+    """
+    Transcripción incremental: el cliente envía fragmentos binarios mientras graba
+    y un mensaje {"type": "stop"} al soltar. Se responden mensajes "partial" y un "final".
+    """
+    streamer = audio_stream.StreamingTranscriber()
+    try:
+        while True:
+            message = ws.receive()
+            if message is None:
+                return
             
-            return jsonify({
-                'success': True,
-                'transcript': transcript,
-                'parsed': parsed
-            })
+            if isinstance(message, str):
+                if json.loads(message).get('type') != 'stop':
+                    continue
+                transcript = streamer.finish()
+                ws.send(json.dumps({
+                    'type': 'final',
+                    'transcript': transcript,
+                    'parsed': intent_parser.parse(transcript) if transcript else None,
+                    'metrics': streamer.metrics
+                }))
+                return
             
-        finally:
-            # Limpiar archivo temporal
-            if filepath.exists():
-                filepath.unlink()
-                
+            streamer.feed(message)
+            partial = streamer.maybe_partial()
+            if partial is not None:
+                ws.send(json.dumps({'type': 'partial', 'text': partial}))
+    
     except Exception as e:
-        logger.error(f"Error procesando audio: {e}", exc_info=True)
+        logger.error(f"Error en streaming de audio: {e}", exc_info=True)
+        ws.send(json.dumps({'type': 'error', 'error': str(e)}))
+    finally:
+        streamer.close()
+
+
+if sock:
+    sock.route('/api/audio/stream')(audio_stream_socket)
+
+
+@app.route('/api/audio/cache', methods=['GET'])
+def get_audio_cache_stats():
+    """Estadísticas de la caché de transcripciones"""
+    return jsonify({'success': True, 'cache': audio_pipeline.cache_stats()})
+
+
+@app.route('/api/parse/batch', methods=['POST'])
+def parse_batch():
+    """Parsea un lote de textos: {"texts": [...]} -> {"results": [...]}"""
+    try:
+        data = request.get_json(silent=True) or {}
+        texts = data.get('texts')
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return jsonify({'error': 'texts debe ser una lista de textos'}), 400
+        if len(texts) > config.PARSE_BATCH_MAX:
+            return jsonify({'error': f'Máximo {config.PARSE_BATCH_MAX} textos por lote'}), 413
+        
+        results = intent_parser.parse_many(texts)
+        return jsonify({'success': True, 'results': results})
+    except Exception as e:
+        logger.error(f"Error parseando lote: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+def _encode_cursor(task: dict) -> str:
+    """Cursor opaco con la clave de orden de la última tarea devuelta"""
+    key = [task.get(f) for f in database.TASK_SORT_KEY]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def _decode_cursor(value: str):
+    """Devuelve la tupla (due_date, created_at, id) o lanza ValueError"""
+    try:
+        padded = value + '=' * (-len(value) % 4)
+        due_date, created_at, task_id = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError('Cursor inválido')
+    if not isinstance(task_id, int):
+        raise ValueError('Cursor inválido')
+    return due_date, created_at, task_id
+
+
 @app.route('/api/tasks', methods=['GET'])
+@_conditional_get
 def get_tasks():
-    """Obtiene lista de tareas"""
+    """
+    Obtiene lista de tareas paginada
+    
+    Query params: status, client_id, due_date, limit, cursor (next_cursor de la
+    página anterior), fields (lista separada por comas) e include_total=1
+    """
     try:
         status = request.args.get('status')
         client_id = request.args.get('client_id', type=int)
         due_date = request.args.get('due_date')
         
-        tasks = db.get_tasks(status=status, client_id=client_id, due_date=due_date)
-        return jsonify({'success': True, 'tasks': tasks})
+        limit = request.args.get('limit', config.TASKS_PAGE_SIZE, type=int)
+        limit = max(1, min(limit, config.TASKS_PAGE_SIZE_MAX))
+        
+        fields = None
+        if request.args.get('fields'):
+            fields = [f.strip() for f in request.args['fields'].split(',') if f.strip()]
+            unknown = [f for f in fields if f not in database.TASK_FIELDS]
+            if unknown:
+                return jsonify({'error': f'Campos desconocidos: {", ".join(unknown)}'}), 400
+        
+        after = None
+        if request.args.get('cursor'):
+            try:
+                after = _decode_cursor(request.args['cursor'])
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        # Se pide una tarea de más para saber si hay página siguiente
+        tasks = db.get_tasks(status=status, client_id=client_id, due_date=due_date,
+                             limit=limit + 1, fields=fields, after=after)
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            next_cursor = _encode_cursor(tasks[-1])
+        
+        if fields:
+            tasks = [{f: task.get(f) for f in fields} for task in tasks]
+        
+        result = {'success': True, 'tasks': tasks, 'next_cursor': next_cursor}
+        if request.args.get('include_total') in ('1', 'true'):
+            result['total'] = db.count_tasks(status=status, client_id=client_id, due_date=due_date)
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error obteniendo tareas: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/tasks/search', methods=['GET'])
+def search_tasks():
+    """Búsqueda de texto completo (?q=texto&status=pending&limit=20)"""
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({'error': 'Parámetro q requerido'}), 400
+        if not db.search_enabled:
+            return jsonify({'error': 'Búsqueda no disponible (SQLite sin FTS5)'}), 503
+        
+        status = request.args.get('status')
+        limit = request.args.get('limit', 20, type=int)
+        limit = max(1, min(limit, MAX_SEARCH_RESULTS))
+        
+        tasks = db.search_tasks(query, status=status, limit=limit)
+        return jsonify({'success': True, 'tasks': tasks})
+    except Exception as e:
+        logger.error(f"Error buscando tareas: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/tasks', methods=['POST'])
 def create_task():
     """Crea una nueva tarea"""
@@ -113,23 +428,25 @@ def create_task():
         due_date = data.get('due_date')
         priority = data.get('priority', 'normal')
         
-        # Si se proporciona nombre de cliente, buscar o crear
-        client_name = data.get('client_name')
-        if client_name and not client_id:
-            client = db.get_client_by_name(client_name)
-            if not client:
-                client_id = db.add_client(client_name)
-            else:
-                client_id = client['id']
-        
-        task_id = db.add_task(
-            title=title,
-            client_id=client_id,
-            due_date=due_date,
-            priority=priority
-        )
-        
-        task = db.get_task_by_id(task_id)
+        # Una sola transacción para cliente + tarea
+        with db.transaction():
+            # Si se proporciona nombre de cliente, buscar o crear
+            client_name = data.get('client_name')
+            if client_name and not client_id:
+                client = db.get_client_by_name(client_name)
+                if not client:
+                    client_id = db.add_client(client_name)
+                else:
+                    client_id = client['id']
+            
+            task_id = db.add_task(
+                title=title,
+                client_id=client_id,
+                due_date=due_date,
+                priority=priority
+            )
+            
+            task = db.get_task_by_id(task_id)
         return jsonify({'success': True, 'task': task}), 201
         
     except Exception as e:
@@ -137,6 +454,64 @@ def create_task():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/tasks/bulk', methods=['POST'])
+def import_tasks():
+    """
+    Importa tareas en bloque desde NDJSON o CSV con cabecera
+    
+    El formato sale de ?format=csv|ndjson o del Content-Type. Columnas: title y,
+    opcionalmente, client_id, client_name, due_date, priority, status, solution,
+    ampliacion, created_at y completed_at. Las filas con errores se omiten y se
+    devuelven con su número de línea; con ?atomic=1 anulan toda la importación
+    (422, o 413 si hay más de BULK_IMPORT_MAX_ROWS filas).
+    """
+    try:
+        fmt = task_io.detect_format(request.content_type, request.args.get('format'))
+        if not fmt:
+            return jsonify({'error': 'Formato no soportado (usa text/csv o application/x-ndjson)'}), 415
+        atomic = request.args.get('atomic') in ('1', 'true')
+        
+        try:
+            result = task_io.import_tasks(db, request.stream, fmt, atomic=atomic)
+        except task_io.ImportTooLarge as e:
+            result = dict(e.args[0], imported=0)
+            return jsonify({'error': f'Máximo {config.BULK_IMPORT_MAX_ROWS} filas por importación', **result}), 413
+        except task_io.ImportAborted as e:
+            result = dict(e.args[0], imported=0)
+            return jsonify({'error': 'Importación anulada por filas con errores', **result}), 422
+        return jsonify({'success': True, **result}), 201 if result['imported'] else 200
+    
+    except RequestEntityTooLarge:
+        return jsonify({'error': f'Cuerpo mayor de {config.MAX_CONTENT_LENGTH // (1024 * 1024)}MB'}), 413
+    except Exception as e:
+        logger.error(f"Error importando tareas: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/tasks/export', methods=['GET'])
+def export_tasks():
+    """Exporta todas las tareas (?format=csv|ndjson&status=&client_id=) sin cargarlas en memoria"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in task_io.FORMATS:
+        return jsonify({'error': f'Formato no soportado: {fmt}'}), 400
+    status = request.args.get('status')
+    client_id = request.args.get('client_id', type=int)
+    
+    def generate():
+        try:
+            yield from task_io.export_tasks(db, fmt, status=status, client_id=client_id)
+        except Exception as e:
+            # Con la respuesta ya empezada solo queda cortarla y dejar constancia
+            logger.error(f"Error exportando tareas: {e}", exc_info=True)
+            raise
+    
+    filename = f'tareas-{time.strftime("%Y%m%d")}.{fmt}'
+    return app.response_class(generate(), mimetype=task_io.CONTENT_TYPES[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Cache-Control': 'no-store',
+    })
+
+
 @app.route('/api/tasks/<int:task_id>', methods=['GET'])
 def get_task(task_id):
     """Obtiene una tarea por ID"""
@@ -156,22 +531,23 @@ def update_task(task_id):
     try:
         data = request.get_json()
         
-        # Si se proporciona nombre de cliente, buscar o crear
-        client_name = data.get('client_name')
-        if client_name:
-            client = db.get_client_by_name(client_name)
-            if not client:
-                client_id = db.add_client(client_name)
-            else:
-                client_id = client['id']
-            data['client_id'] = client_id
-            data.pop('client_name', None)
+        with db.transaction():
+            # Si se proporciona nombre de cliente, buscar o crear
+            client_name = data.get('client_name')
+            if client_name:
+                client = db.get_client_by_name(client_name)
+                if not client:
+                    client_id = db.add_client(client_name)
+                else:
+                    client_id = client['id']
+                data['client_id'] = client_id
+                data.pop('client_name', None)
+            
+            success = db.update_task(task_id, **data)
+            task = db.get_task_by_id(task_id) if success else None
         
-        success = db.update_task(task_id, **data)
         if not success:
             return jsonify({'error': 'Tarea no encontrada'}), 404
-        
-        task = db.get_task_by_id(task_id)
         return jsonify({'success': True, 'task': task})
         
     except Exception as e:
@@ -218,11 +594,20 @@ def ampliar_task(task_id):
 
 
 @app.route('/api/clients', methods=['GET'])
+@_conditional_get
 def get_clients():
-    """Obtiene lista de clientes"""
+    """
+    Obtiene lista de clientes
+    
+    Con ?q= devuelve sugerencias ordenadas por relevancia (10 por defecto,
+    ?limit= hasta MAX_SEARCH_RESULTS); sin q, todos los clientes
+    """
     try:
-        query = request.args.get('q')
-        clients = db.search_clients(query=query)
+        query = request.args.get('q', '').strip()
+        limit = request.args.get('limit', type=int)
+        if query:
+            limit = max(1, min(limit or 10, MAX_SEARCH_RESULTS))
+        clients = db.search_clients(query=query or None, limit=limit)
         return jsonify({'success': True, 'clients': clients})
     except Exception as e:
         logger.error(f"Error obteniendo clientes: {e}", exc_info=True)
@@ -249,6 +634,7 @@ def create_client():
 
 
 @app.route('/api/clients/<int:client_id>', methods=['GET'])
+@_conditional_get
 def get_client(client_id):
     """Obtiene un cliente por ID"""
     try:
@@ -261,6 +647,72 @@ def get_client(client_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/events', methods=['GET'])
+def change_events():
+    """
+    Cambios de tareas y clientes como Server-Sent Events
+    
+    Eventos: task.created (tarea completa), task.updated (id y campos cambiados),
+    task.deleted, client.created, client.deleted y resync (recargar las listas).
+    Al reconectar, EventSource envía Last-Event-ID y se reenvían los perdidos.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    # El hueco se reserva al suscribir: comprobarlo antes dejaría pasar peticiones simultáneas
+    subscription = db.changes.subscribe(last_event_id, limit=config.EVENTS_MAX_STREAMS)
+    if subscription is None:
+        response = jsonify({'error': 'Demasiadas conexiones de eventos'})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    
+    response = app.response_class(
+        _event_stream(subscription),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # El servidor cierra la respuesta aunque el generador no llegue a empezar
+    response.call_on_close(subscription.close)
+    return response
+
+
+def _format_event(message: dict) -> str:
+    lines = [f"id: {message['id']}"] if 'id' in message else []
+    lines.append(f"event: {message['type']}")
+    lines.append(f"data: {json.dumps(message['data'], ensure_ascii=False)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def _event_stream(subscription: change_bus.Subscription):
+    """Eventos del bus, resync por escrituras de otros procesos y heartbeat"""
+    try:
+        # Al reconectar se parte de la versión del último evento recibido: las escrituras
+        # hechas mientras no había nadie conectado no están en el historial, pero sí en la versión
+        known_version = subscription.last_version
+        if known_version is None:
+            known_version = db.get_data_version()
+        yield 'retry: 3000\n\n'
+        last_sent = started = time.monotonic()
+        while time.monotonic() - started < config.EVENTS_STREAM_SECONDS:
+            message = subscription.get(timeout=config.EVENTS_POLL_SECONDS)
+            if message is not None:
+                known_version = max(known_version, message['data'].get('version', 0))
+            else:
+                # Las escrituras de otros workers no pasan por este bus: se notan en la versión
+                version = db.get_data_version()
+                if version > known_version:
+                    known_version = version
+                    message = change_bus.RESYNC
+                elif time.monotonic() - last_sent >= config.EVENTS_HEARTBEAT_SECONDS:
+                    last_sent = time.monotonic()
+                    yield ': ping\n\n'
+                    continue
+                else:
+                    continue
+            last_sent = time.monotonic()
+            yield _format_event(message)
+    finally:
+        subscription.close()
+
+
 # Rutas de administración web (opcional, para gestión avanzada)
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
@@ -298,12 +750,12 @@ def admin_clients():
 
 
 if __name__ == '__main__':
-    # Pre-cargar modelo Whisper si está disponible
-    try:
-        logger.info("Pre-cargando modelo Whisper...")
-        audio_pipeline.preload_model()
-    except Exception as e:
-        logger.warning(f"No se pudo pre-cargar modelo: {e}")
+    # Cargar y calentar modelo Whisper si está disponible
+    if config.WHISPER_WARMUP:
+        try:
+            audio_pipeline.warm_up()
+        except Exception as e:
+            logger.warning(f"No se pudo pre-cargar modelo: {e}")
     
     # Ejecutar en desarrollo
     app.run(host='0.0.0.0', port=int(os.getenv('PORT', 5000)), debug=True)
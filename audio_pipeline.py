@@ -2,96 +2,670 @@
 Pipeline de procesamiento de audio
 Convierte y transcribe audio usando faster-whisper
 """
+import hashlib
+import importlib.util
+import json
 import logging
-import os
+import queue
+import struct
 import subprocess
+import tempfile
 import threading
+import time
 from pathlib import Path
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple, Union
+import numpy as np
 import config
+import instrumentation
+import transcription_cache
 
 logger = logging.getLogger(__name__)
 
+# Formato que esperan los modelos Whisper
+SAMPLE_RATE = 16000
+
+# Códecs PCM que se pueden leer directamente sin ffmpeg
+PCM_DTYPES = {'pcm_s16le': np.int16, 'pcm_f32le': np.float32}
+# Formatos de ffprobe (format_name) que ffmpeg necesita leer con seek
+SEEKABLE_CONTAINERS = {'mov', 'mp4', 'm4a', '3gp', '3g2', 'mj2'}
+
+# Whisper procesa ventanas de 30s: solo clips más cortos se pueden agrupar en un batch
+MAX_BATCH_CLIP_SECONDS = 30
+
+# Tamaño de trama del VAD
+VAD_FRAME_MS = 30
+
 # Modelo Whisper global (carga única)
 _whisper_model = None
 _model_lock = threading.Lock()
 
+# Estado del calentamiento (para el endpoint de salud)
+_model_ready = threading.Event()
+# Solo hay que esperar al calentamiento si alguien lo ha lanzado (gunicorn o __main__)
+_warmup_started = threading.Event()
+_warmup_error = None
+
+# Caché de transcripciones compartida por el proceso
+_cache = transcription_cache.TranscriptionCache(
+    db_path=config.TRANSCRIPTION_CACHE_PATH if config.TRANSCRIPTION_CACHE_DISK else None
+) if config.TRANSCRIPTION_CACHE_ENABLED else None
+
+
+class AudioTooLongError(Exception):
+    """El audio supera AUDIO_MAX_DURATION_SECONDS"""
+
+
+@contextmanager
+def stage(metrics: Optional[Dict], name: str):
+    """Mide y registra la duración de una etapa del pipeline"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        instrumentation.AUDIO_STAGE_SECONDS.observe(elapsed, stage=name)
+        elapsed_ms = round(elapsed * 1000, 1)
+        logger.info("Etapa %s: %sms", name, elapsed_ms, extra={'stage': name, 'duration_ms': elapsed_ms})
+        if metrics is not None:
+            metrics.setdefault('timings_ms', {})[name] = elapsed_ms
+
+
+class TranscriptionBackend:
+    """Interfaz común de los backends de transcripción"""
+    
+    name = 'base'
+    remote = False
+    # transcribe_batch hace una sola pasada por el modelo (no un bucle de transcribe)
+    batched = False
+    # Backend, modelo y parámetros que determinan el texto (clave de la caché de transcripciones)
+    model_id = 'base'
+    
+    def transcribe(self, audio, language: str = 'es') -> str:
+        """
+        Transcribe audio
+        
+        Args:
+            audio: Ruta del archivo o array float32 mono a 16kHz
+            language: Código de idioma
+        
+        Returns:
+            Texto transcrito (sin normalizar)
+        """
+        raise NotImplementedError
+    
+    def transcribe_batch(self, audios: List[np.ndarray], language: str = 'es') -> List[str]:
+        """Transcribe varios clips; por defecto uno a uno"""
+        return [self.transcribe(audio, language=language) for audio in audios]
+    
+    def warm_up(self):
+        """Inferencia de prueba para pagar el arranque antes de la primera petición"""
+        self.transcribe(_warmup_audio(), language='es')
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """Backend faster-whisper (CTranslate2), respeta compute type e hilos"""
+    
+    name = 'faster-whisper'
+    batched = True
+    
+    def __init__(self, model_name: str, device: str, compute_type: str, cpu_threads: int):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(
+            model_name,
+            device=device,
+            compute_type=compute_type,
+            cpu_threads=cpu_threads
+        )
+        self.model_id = _whisper_model_id(self.name, model_name, compute_type)
+    
+    def transcribe(self, audio, language: str = 'es') -> str:
+        segments, _info = self.model.transcribe(
+            audio,
+            language=language,
+            beam_size=config.WHISPER_BEAM_SIZE
+        )
+        # Los segmentos son un generador: la inferencia ocurre al recorrerlo
+        return ''.join(segment.text for segment in segments)
+    
+    def transcribe_batch(self, audios: List[np.ndarray], language: str = 'es') -> List[str]:
+        """Una sola pasada de encoder y decoder para todos los clips (<= 30s cada uno)"""
+        from faster_whisper.tokenizer import Tokenizer
+        
+        extractor = self.model.feature_extractor
+        features = []
+        for audio in audios:
+            feats = extractor(audio)[:, :extractor.nb_max_frames]
+            pad = extractor.nb_max_frames - feats.shape[-1]
+            features.append(np.pad(feats, ((0, 0), (0, pad))))
+        
+        encoder_output = self.model.encode(np.stack(features))
+        tokenizer = Tokenizer(
+            self.model.hf_tokenizer,
+            self.model.model.is_multilingual,
+            task='transcribe',
+            language=language
+        )
+        prompt = self.model.get_prompt(tokenizer, previous_tokens=[], without_timestamps=True)
+        results = self.model.model.generate(
+            encoder_output,
+            [prompt] * len(audios),
+            beam_size=config.WHISPER_BEAM_SIZE,
+            max_length=self.model.max_length,
+            suppress_blank=True
+        )
+        return [
+            tokenizer.decode([t for t in result.sequences_ids[0] if t < tokenizer.eot])
+            for result in results
+        ]
+
+
+class OpenAIWhisperBackend(TranscriptionBackend):
+    """Backend openai-whisper (PyTorch), usado como alternativa"""
+    
+    name = 'openai-whisper'
+    
+    def __init__(self, model_name: str, device: str, cpu_threads: int):
+        import torch
+        import whisper
+        if device == 'cpu' and cpu_threads:
+            torch.set_num_threads(cpu_threads)
+        self.model = whisper.load_model(model_name, device=device)
+        self.model_id = _whisper_model_id(self.name, model_name)
+    
+    def transcribe(self, audio, language: str = 'es') -> str:
+        result = self.model.transcribe(
+            audio,
+            language=language,
+            fp16=False  # Usar float32 para compatibilidad
+        )
+        return result["text"]
+
+
+class BatchingBackend(TranscriptionBackend):
+    """
+    Micro-batching delante de otro backend: agrupa las peticiones concurrentes
+    durante unos milisegundos (o hasta N clips) y las ejecuta en un único batch
+    """
+    
+    def __init__(self, inner: TranscriptionBackend, max_batch: int, max_wait_ms: int):
+        self.inner = inner
+        self.name = f'{inner.name}+batch'
+        self.model_id = inner.model_id
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        threading.Thread(target=self._dispatch_loop, name='transcription-batcher', daemon=True).start()
+    
+    def transcribe(self, audio, language: str = 'es') -> str:
+        # Rutas y clips largos no se agrupan
+        if not isinstance(audio, np.ndarray) or len(audio) > MAX_BATCH_CLIP_SECONDS * SAMPLE_RATE:
+            return self.inner.transcribe(audio, language=language)
+        
+        future = Future()
+        self._queue.put((audio, language, future))
+        return future.result()
+    
+    def _collect(self) -> list:
+        """Espera la primera petición y junta las que lleguen dentro de la ventana"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect()
+            by_language = {}
+            for audio, language, future in batch:
+                by_language.setdefault(language, []).append((audio, future))
+            
+            for language, items in by_language.items():
+                try:
+                    texts = self.inner.transcribe_batch([audio for audio, _ in items], language=language)
+                    for (_, future), text in zip(items, texts):
+                        future.set_result(text)
+                except Exception as e:
+                    logger.error(f"Error en batch de transcripción: {e}")
+                    for _, future in items:
+                        future.set_exception(e)
+            logger.info("Batch de transcripción: %s clip(s)", len(batch), extra={'batch_size': len(batch)})
+
+
+class RemoteBackend(TranscriptionBackend):
+    """Delega la inferencia al servidor de transcripción (el worker no carga el modelo)"""
+    
+    name = 'remote'
+    remote = True
+    
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self._model_id = None
+    
+    @property
+    def model_id(self) -> str:
+        # El modelo lo carga el servidor: se le pregunta una vez
+        if self._model_id is None:
+            self._model_id = self._request('ping')
+        return self._model_id
+    
+    def _request(self, *message):
+        from multiprocessing.connection import Client
+        try:
+            conn = Client(self.socket_path, family='AF_UNIX', authkey=config.SECRET_KEY.encode())
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            raise Exception(f"Servidor de transcripción no disponible: {e}")
+        try:
+            conn.send(message)
+            # Sin respuesta a tiempo se libera el hilo HTTP en vez de esperar al timeout de gunicorn
+            if not conn.poll(config.TRANSCRIPTION_SERVER_TIMEOUT_SECONDS):
+                raise Exception(f"El servidor de transcripción no respondió en "
+                                f"{config.TRANSCRIPTION_SERVER_TIMEOUT_SECONDS}s")
+            status, payload = conn.recv()
+        finally:
+            conn.close()
+        if status != 'ok':
+            raise Exception(f"Error en servidor de transcripción: {payload}")
+        return payload
+    
+    def transcribe(self, audio, language: str = 'es') -> str:
+        return self._request('transcribe', audio, language)
+    
+    def warm_up(self):
+        """Espera a que el servidor tenga el modelo cargado"""
+        deadline = time.monotonic() + config.TRANSCRIPTION_SERVER_WAIT_SECONDS
+        while True:
+            try:
+                self._model_id = self._request('ping')
+                logger.info(f"Servidor de transcripción disponible ({self._model_id})")
+                return
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(1)
+
+
+def check_remote_secret():
+    """El socket se autentica con SECRET_KEY: con la clave por defecto cualquiera podría usarlo"""
+    if config.SECRET_KEY == config.DEFAULT_SECRET_KEY:
+        raise ValueError("TRANSCRIPTION_MODE=remote requiere definir SECRET_KEY")
+
+
+def _load_backend() -> TranscriptionBackend:
+    """Crea el backend según TRANSCRIPTION_MODE"""
+    if config.TRANSCRIPTION_MODE == 'remote':
+        check_remote_secret()
+        logger.info(f"Usando servidor de transcripción: {config.TRANSCRIPTION_SERVER_SOCKET}")
+        return RemoteBackend(config.TRANSCRIPTION_SERVER_SOCKET)
+    if config.TRANSCRIPTION_MODE != 'local':
+        raise ValueError(f"Modo de transcripción desconocido: {config.TRANSCRIPTION_MODE}")
+    return load_local_backend()
+
+
+def load_local_backend() -> TranscriptionBackend:
+    """Carga el modelo en este proceso, con micro-batching si está configurado"""
+    backend = _load_model_backend()
+    if config.TRANSCRIPTION_BATCH_SIZE > 1 and not backend.batched:
+        # Agrupar sin batch real solo añadiría la espera de la ventana
+        logger.warning(f"Micro-batching no disponible con {backend.name}, se transcribe clip a clip")
+    elif config.TRANSCRIPTION_BATCH_SIZE > 1:
+        logger.info(f"Micro-batching activado: hasta {config.TRANSCRIPTION_BATCH_SIZE} clips "
+                    f"o {config.TRANSCRIPTION_BATCH_WAIT_MS}ms")
+        backend = BatchingBackend(
+            backend,
+            max_batch=config.TRANSCRIPTION_BATCH_SIZE,
+            max_wait_ms=config.TRANSCRIPTION_BATCH_WAIT_MS
+        )
+    return backend
+
+
+def _whisper_model_id(backend: str, model_name: str, compute_type: str = None) -> str:
+    """model_id de un backend local, con los parámetros que determinan el texto"""
+    if backend == 'faster-whisper':
+        return f'{backend}/{model_name}/{compute_type}/beam{config.WHISPER_BEAM_SIZE}'
+    return f'{backend}/{model_name}/fp32'
+
 
-def _get_whisper_model():
-    """Obtiene el modelo Whisper (carga única, thread-safe)"""
+def _configured_model_id() -> str:
+    """model_id del backend que cargaría _load_model_backend, sin cargar el modelo"""
+    backend = config.WHISPER_BACKEND
+    if backend == 'auto':
+        # Mismo criterio que el fallback de _load_model_backend (ImportError)
+        has_faster_whisper = importlib.util.find_spec('faster_whisper') is not None
+        backend = 'faster-whisper' if has_faster_whisper else 'openai-whisper'
+    return _whisper_model_id(backend, config.WHISPER_MODEL, config.WHISPER_COMPUTE_TYPE)
+
+
+def _load_model_backend() -> TranscriptionBackend:
+    """Carga el modelo en este proceso (faster-whisper con fallback a openai-whisper)"""
+    backend = config.WHISPER_BACKEND
+    
+    if backend in ('auto', 'faster-whisper'):
+        try:
+            logger.info(f"Cargando modelo faster-whisper: {config.WHISPER_MODEL} "
+                        f"({config.WHISPER_DEVICE}, {config.WHISPER_COMPUTE_TYPE}, "
+                        f"{config.WHISPER_CPU_THREADS} hilos)")
+            return FasterWhisperBackend(
+                config.WHISPER_MODEL,
+                device=config.WHISPER_DEVICE,
+                compute_type=config.WHISPER_COMPUTE_TYPE,
+                cpu_threads=config.WHISPER_CPU_THREADS
+            )
+        except ImportError:
+            if backend == 'faster-whisper':
+                raise
+            logger.warning("faster-whisper no disponible, usando openai-whisper")
+    elif backend != 'openai-whisper':
+        raise ValueError(f"Backend de transcripción desconocido: {backend}")
+    
+    logger.info(f"Cargando modelo openai-whisper: {config.WHISPER_MODEL}")
+    return OpenAIWhisperBackend(
+        config.WHISPER_MODEL,
+        device=config.WHISPER_DEVICE,
+        cpu_threads=config.WHISPER_CPU_THREADS
+    )
+
+
+def _get_whisper_model() -> TranscriptionBackend:
+    """Obtiene el backend de transcripción (carga única, thread-safe)"""
     global _whisper_model
     if _whisper_model is None:
         with _model_lock:
             if _whisper_model is None:
                 try:
-                    import whisper
-                    logger.info(f"Cargando modelo Whisper: {config.WHISPER_MODEL}")
-                    _whisper_model = whisper.load_model(config.WHISPER_MODEL)
-                    logger.info("Modelo Whisper cargado correctamente")
+                    _whisper_model = _load_backend()
+                    logger.info(f"Modelo Whisper cargado correctamente ({_whisper_model.name})")
                 except Exception as e:
                     logger.error(f"Error cargando modelo Whisper: {e}")
                     raise
     return _whisper_model
 
 
-def convert_to_wav(input_path: str, output_path: str = None) -> str:
+def _parse_wav_header(data: bytes) -> Optional[Dict]:
+    """
+    Lee la cabecera RIFF/WAVE sin lanzar procesos
+    
+    Returns:
+        Dict con codec, sample_rate, channels, duration, data_offset y data_size,
+        o None si no es un WAV reconocible
+    """
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return None
+    
+    info = {'container': 'wav', 'codec': None}
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id, chunk_size = struct.unpack('<4sI', data[pos:pos + 8])
+        body = pos + 8
+        if chunk_id == b'fmt ' and chunk_size >= 16:
+            if body + 16 > len(data):
+                # Cabecera cortada
+                return None
+            fmt, channels, rate, _, _, bits = struct.unpack('<HHIIHH', data[body:body + 16])
+            if not (channels and rate and bits):
+                # Cabecera inválida: mejor que la lea ffmpeg (o que falle con un error claro)
+                return None
+            codecs = {(1, 16): 'pcm_s16le', (3, 32): 'pcm_f32le'}
+            info.update(codec=codecs.get((fmt, bits), f'wav_fmt_{fmt}_{bits}'),
+                        channels=channels, sample_rate=rate, bits=bits)
+        elif chunk_id == b'data':
+            # WAV generados en streaming declaran un tamaño inválido
+            size = min(chunk_size, len(data) - body)
+            info.update(data_offset=body, data_size=size)
+            break
+        pos = body + chunk_size + (chunk_size & 1)
+    
+    if info['codec'] is None or 'data_offset' not in info:
+        return None
+    frame_bytes = max(1, info['channels'] * info['bits'] // 8)
+    info['duration'] = info['data_size'] / frame_bytes / info['sample_rate']
+    return info
+
+
+def _ffprobe(source: Union[bytes, str]) -> Optional[Dict]:
+    """Sondea formatos comprimidos con ffprobe (la duración puede no estar disponible)"""
+    from_bytes = isinstance(source, (bytes, bytearray))
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'a:0',
+        '-show_entries', 'stream=codec_name,sample_rate,channels,duration:format=format_name,duration',
+        '-of', 'json',
+        'pipe:0' if from_bytes else source
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            input=bytes(source) if from_bytes else b'',
+            capture_output=True,
+            timeout=10
+        )
+    except (FileNotFoundError, subprocess.TimeoutExpired) as e:
+        logger.warning(f"No se pudo sondear el audio con ffprobe: {e}")
+        return None
+    if result.returncode != 0:
+        return None
+    
+    try:
+        probed = json.loads(result.stdout)
+        stream = probed['streams'][0]
+    except (ValueError, KeyError, IndexError):
+        return None
+    fmt = probed.get('format', {})
+    duration = stream.get('duration') or fmt.get('duration')
+    return {
+        'container': fmt.get('format_name'),
+        'codec': stream.get('codec_name'),
+        'sample_rate': int(stream['sample_rate']) if stream.get('sample_rate') else None,
+        'channels': stream.get('channels'),
+        'duration': float(duration) if duration not in (None, 'N/A') else None,
+    }
+
+
+def probe_audio(source: Union[bytes, str]) -> Optional[Dict]:
     """
-    Convierte audio a WAV 16kHz mono usando ffmpeg
+    Obtiene códec, sample rate, canales y duración del audio
+    
+    WAV se lee directamente de la cabecera; el resto se sondea con ffprobe
+    si AUDIO_PROBE está activo.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        info = _parse_wav_header(source)
+    else:
+        with open(source, 'rb') as f:
+            is_wav = f.read(4) == b'RIFF'
+        info = _parse_wav_header(Path(source).read_bytes()) if is_wav else None
+    if info is not None:
+        return info
+    if config.AUDIO_PROBE:
+        return _ffprobe(source)
+    return None
+
+
+def _is_compliant(info: Optional[Dict]) -> bool:
+    """WAV PCM 16kHz mono: se puede usar sin convertir"""
+    return bool(info and info.get('container') == 'wav' and info['codec'] in PCM_DTYPES
+                and info['sample_rate'] == SAMPLE_RATE and info['channels'] == 1)
+
+
+def _check_duration(duration: Optional[float]):
+    if duration is not None and duration > config.AUDIO_MAX_DURATION_SECONDS:
+        raise AudioTooLongError(f"Audio demasiado largo (máximo {config.AUDIO_MAX_DURATION_SECONDS}s)")
+
+
+def _needs_seekable_input(data: bytes, info: Optional[Dict], stderr: str) -> bool:
+    """Contenedores MP4/MOV (m4a, 3gp): con el índice al final no se pueden leer desde un pipe"""
+    container = (info or {}).get('container') or ''
+    return (data[4:8] == b'ftyp'
+            or bool(SEEKABLE_CONTAINERS.intersection(container.split(',')))
+            or 'moov atom not found' in stderr)
+
+
+def ffmpeg_decode_command(input_path: str) -> List[str]:
+    """Comando ffmpeg que escribe en stdout PCM float32 mono 16kHz con los filtros configurados"""
+    cmd = [
+        'ffmpeg',
+        '-hide_banner',
+        '-i', input_path,
+        # Cortar justo después del máximo permitido: nunca se decodifica de más
+        '-t', str(config.AUDIO_MAX_DURATION_SECONDS + 1),
+        '-ar', str(SAMPLE_RATE),
+        '-ac', '1',
+    ]
+    if config.AUDIO_FILTER_CHAIN:
+        cmd += ['-af', config.AUDIO_FILTER_CHAIN]
+    cmd += ['-f', 'f32le', 'pipe:1']
+    return cmd
+
+
+def decode_audio(source: Union[bytes, str], info: Dict = None) -> np.ndarray:
+    """
+    Decodifica audio a PCM float32 mono 16kHz en memoria con una sola llamada a ffmpeg
+    
+    Si el audio ya es WAV PCM 16kHz mono (según info de probe_audio) se lee
+    directamente sin lanzar ffmpeg.
     
     Args:
-        input_path: Ruta del archivo de entrada
-        output_path: Ruta del archivo de salida (opcional)
+        source: Bytes del archivo subido (se envían por stdin) o ruta del archivo
+        info: Resultado de probe_audio (opcional)
     
     Returns:
-        Ruta del archivo WAV generado
+        Array NumPy float32 con las muestras
     """
-    if output_path is None:
-        output_path = str(Path(input_path).with_suffix('.wav'))
+    from_bytes = isinstance(source, (bytes, bytearray))
+    
+    if _is_compliant(info) and not (config.AUDIO_FILTER_COMPLIANT and config.AUDIO_FILTER_CHAIN):
+        data = source if from_bytes else Path(source).read_bytes()
+        raw = bytes(data[info['data_offset']:info['data_offset'] + info['data_size']])
+        dtype = PCM_DTYPES[info['codec']]
+        raw = raw[:len(raw) - len(raw) % np.dtype(dtype).itemsize]
+        audio = np.frombuffer(raw, dtype=dtype)
+        if dtype == np.int16:
+            audio = audio.astype(np.float32) / 32768.0
+        audio_seconds = round(len(audio) / SAMPLE_RATE, 1)
+        logger.info("Audio ya compatible, sin conversión: %ss", audio_seconds,
+                    extra={'audio_seconds': audio_seconds, 'ffmpeg': False})
+        return audio
+    
+    cmd = ffmpeg_decode_command('pipe:0' if from_bytes else source)
     
     try:
-        # Comando ffmpeg con filtros para mejorar calidad
-        cmd = [
-            'ffmpeg',
-            '-i', input_path,
-            '-ar', '16000',  # Sample rate 16kHz
-            '-ac', '1',      # Mono
-            '-f', 'wav',
-            '-y',            # Sobrescribir si existe
-            '-af', 'highpass=f=80,acompressor=threshold=0.089:ratio=9:attack=200:release=1000',
-            output_path
-        ]
-        
-        logger.info(f"Convirtiendo audio: {input_path} -> {output_path}")
         result = subprocess.run(
             cmd,
+            input=bytes(source) if from_bytes else b'',
             capture_output=True,
-            text=True,
             timeout=30
         )
+    except subprocess.TimeoutExpired:
+        logger.error("Timeout en decodificación de audio")
+        raise Exception("Timeout en decodificación de audio")
+    
+    if result.returncode != 0:
+        stderr = result.stderr.decode('utf-8', errors='replace')
+        if from_bytes and _needs_seekable_input(source, info, stderr):
+            # Contenedores con el índice al final (p. ej. m4a) no se pueden leer
+            # desde un pipe: se reintenta una única vez con archivo temporal
+            logger.warning("ffmpeg no pudo leer desde stdin, reintentando con archivo temporal")
+            with tempfile.NamedTemporaryFile(dir=config.UPLOAD_FOLDER) as tmp:
+                tmp.write(source)
+                tmp.flush()
+                return decode_audio(tmp.name)
+        logger.error(f"Error en ffmpeg: {stderr}")
+        raise Exception(f"Error de decodificación: {stderr}")
+    
+    audio = np.frombuffer(result.stdout, dtype=np.float32)
+    audio_seconds = round(len(audio) / SAMPLE_RATE, 1)
+    logger.info("Audio decodificado: %ss", audio_seconds,
+                extra={'audio_seconds': audio_seconds, 'ffmpeg': True})
+    return audio
+
+
+def _runs(mask: np.ndarray):
+    """Devuelve los tramos consecutivos (inicio, fin, valor) de un array booleano"""
+    change = np.flatnonzero(np.diff(mask.astype(np.int8))) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.concatenate((change, [len(mask)]))
+    return [(int(a), int(b), bool(mask[a])) for a, b in zip(starts, ends)]
+
+
+def apply_vad(audio: np.ndarray) -> Tuple[np.ndarray, Dict]:
+    """
+    Recorta silencios por energía: inicio, final y pausas internas largas
+    
+    Args:
+        audio: Array float32 mono 16kHz
+    
+    Returns:
+        (audio recortado, métricas). El audio queda vacío si no hay voz.
+    """
+    frame = SAMPLE_RATE * VAD_FRAME_MS // 1000
+    n_frames = len(audio) // frame
+    original_seconds = len(audio) / SAMPLE_RATE
+    
+    if n_frames == 0:
+        trimmed = audio[:0]
+    else:
+        frames = audio[:n_frames * frame].reshape(n_frames, frame)
+        rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+        db = 20 * np.log10(rms + 1e-10)
         
-        if result.returncode != 0:
-            logger.error(f"Error en ffmpeg: {result.stderr}")
-            raise Exception(f"Error de conversión: {result.stderr}")
-        
-        if not Path(output_path).exists():
-            raise Exception("Archivo WAV no generado")
-        
-        logger.info(f"Conversión completada: {output_path}")
-        return output_path
+        # Umbral adaptativo: por encima del ruido de fondo, sin exigir más que la voz real
+        noise_floor = np.percentile(db, 10)
+        threshold = max(config.VAD_THRESHOLD_DB, min(noise_floor + 10, db.max() - 20))
+        speech = db > threshold
         
-    except subprocess.TimeoutExpired:
-        logger.error("Timeout en conversión de audio")
-        raise Exception("Timeout en conversión de audio")
-    except Exception as e:
-        logger.error(f"Error convirtiendo audio: {e}")
-        raise
+        min_speech_frames = max(1, config.VAD_MIN_SPEECH_MS // VAD_FRAME_MS)
+        if speech.sum() < min_speech_frames:
+            trimmed = audio[:0]
+        else:
+            # Dilatar la voz para no cortar consonantes al principio y al final
+            pad = config.VAD_PAD_MS // VAD_FRAME_MS
+            if pad:
+                # Suma acumulada en vez de convolve: con clips de menos de 2*pad+1 tramas,
+                # convolve(mode='same') devuelve la longitud del núcleo y no la de speech
+                counts = np.concatenate(([0], np.cumsum(speech)))
+                index = np.arange(n_frames)
+                speech = counts[np.minimum(index + pad + 1, n_frames)] > counts[np.maximum(index - pad, 0)]
+            
+            keep = speech.copy()
+            max_pause = config.VAD_MAX_PAUSE_MS // VAD_FRAME_MS
+            runs = _runs(speech)
+            for i, (start, end, is_speech) in enumerate(runs):
+                if is_speech or i == 0 or i == len(runs) - 1:
+                    continue
+                # Pausa interna: conservar solo max_pause tramas, repartidas a cada lado
+                if end - start > max_pause:
+                    half = max_pause // 2
+                    keep[start:start + half] = True
+                    keep[end - (max_pause - half):end] = True
+                else:
+                    keep[start:end] = True
+            
+            trimmed = frames[keep].reshape(-1)
+    
+    kept_seconds = len(trimmed) / SAMPLE_RATE
+    metrics = {
+        'original_seconds': round(original_seconds, 3),
+        'kept_seconds': round(kept_seconds, 3),
+        'dropped_seconds': round(original_seconds - kept_seconds, 3),
+        'dropped_ratio': round(1 - kept_seconds / original_seconds, 3) if original_seconds else 0.0,
+    }
+    return trimmed, metrics
 
 
-def transcribe_audio(audio_path: str, language: str = 'es') -> str:
+def transcribe_audio(audio: Union[np.ndarray, str], language: str = 'es') -> str:
     """
-    Transcribe audio usando openai-whisper
+    Transcribe audio con el backend configurado (faster-whisper u openai-whisper)
     
     Args:
-        audio_path: Ruta del archivo de audio (WAV)
+        audio: Array float32 mono 16kHz o ruta del archivo de audio (WAV)
         language: Código de idioma (default: 'es')
     
     Returns:
@@ -99,16 +673,23 @@ def transcribe_audio(audio_path: str, language: str = 'es') -> str:
     """
     try:
         model = _get_whisper_model()
-        logger.info(f"Iniciando transcripción: {audio_path}")
+        if isinstance(audio, np.ndarray):
+            audio_seconds = round(len(audio) / SAMPLE_RATE, 1)
+            logger.info("Iniciando transcripción: %ss de audio", audio_seconds,
+                        extra={'audio_seconds': audio_seconds, 'backend': model.name})
+        else:
+            logger.info("Iniciando transcripción: %s", audio, extra={'backend': model.name})
         
-        result = model.transcribe(
-            audio_path,
-            language=language,
-            fp16=False  # Usar float32 para compatibilidad
-        )
-        
-        transcript = result["text"].strip()
-        logger.info(f"Transcripción completada: {len(transcript)} caracteres")
+        started = time.perf_counter()
+        transcript = model.transcribe(audio, language=language).strip()
+        elapsed = time.perf_counter() - started
+        instrumentation.TRANSCRIBE_SECONDS.observe(elapsed, backend=model.name)
+        if isinstance(audio, np.ndarray) and elapsed > 0:
+            audio_seconds = len(audio) / SAMPLE_RATE
+            instrumentation.TRANSCRIBED_AUDIO_SECONDS.inc(audio_seconds, backend=model.name)
+            instrumentation.TRANSCRIBE_REALTIME_FACTOR.observe(audio_seconds / elapsed, backend=model.name)
+        logger.info("Transcripción completada: %s caracteres", len(transcript),
+                    extra={'chars': len(transcript), 'backend': model.name})
         
         if not transcript:
             logger.warning("Transcripción vacía")
@@ -121,44 +702,192 @@ def transcribe_audio(audio_path: str, language: str = 'es') -> str:
         raise
 
 
-def process_audio_from_file(file_path: str, language: str = 'es') -> str:
+def _transcribe_decoded(audio: np.ndarray, language: str, metrics: Dict = None) -> str:
+    """Aplica VAD (si está activo) y transcribe el audio decodificado"""
+    if config.VAD_ENABLED:
+        with stage(metrics, 'vad'):
+            audio, vad_metrics = apply_vad(audio)
+        logger.info("VAD: %ss de silencio descartados de %ss",
+                    vad_metrics['dropped_seconds'], vad_metrics['original_seconds'],
+                    extra={'dropped_seconds': vad_metrics['dropped_seconds'],
+                           'audio_seconds': vad_metrics['original_seconds']})
+        if metrics is not None:
+            metrics['vad'] = vad_metrics
+        if len(audio) == 0:
+            # Clip sin voz: no hace falta cargar ni ejecutar el modelo
+            logger.warning("No se detectó voz en el audio")
+            return ""
+    
+    if _whisper_model is None:
+        # Sin calentamiento previo la carga del modelo no cuenta como transcripción
+        with stage(metrics, 'model_load'):
+            _get_whisper_model()
+    
+    with stage(metrics, 'transcribe'):
+        return transcribe_audio(audio, language)
+
+
+def _model_id() -> str:
+    """
+    Identifica para la clave de caché el backend (con WHISPER_BACKEND=auto puede
+    ser cualquiera de los dos) y el preprocesado que cambia el audio que recibe el
+    modelo: filtros de ffmpeg y VAD. Si el modelo aún no está cargado se deduce de
+    la configuración, para que un acierto de caché o un clip sin voz no lo carguen
     """
-    Pipeline completo: convierte y transcribe audio
+    preprocessing = [config.AUDIO_FILTER_CHAIN, config.AUDIO_FILTER_COMPLIANT, config.VAD_ENABLED]
+    if config.VAD_ENABLED:
+        preprocessing += [config.VAD_THRESHOLD_DB, config.VAD_MIN_SPEECH_MS,
+                          config.VAD_PAD_MS, config.VAD_MAX_PAUSE_MS]
+    digest = hashlib.sha256(repr(preprocessing).encode()).hexdigest()[:12]
+    if _whisper_model is not None or config.TRANSCRIPTION_MODE == 'remote':
+        # RemoteBackend no carga nada: pregunta al servidor qué modelo tiene
+        model_id = _get_whisper_model().model_id
+    else:
+        model_id = _configured_model_id()
+    return f"{model_id}/{digest}"
+
+
+def cache_stats() -> Dict:
+    """Contadores de la caché de transcripciones"""
+    if _cache is None:
+        return {'enabled': False}
+    return dict(_cache.stats(), enabled=True)
+
+
+def process_audio_bytes(data: bytes, language: str = 'es', metrics: Dict = None) -> str:
+    """
+    Pipeline completo en memoria: decodifica y transcribe sin tocar disco
+    
+    Args:
+        data: Contenido del archivo de audio original
+        language: Código de idioma (default: 'es')
+        metrics: Dict opcional que se rellena con métricas del procesamiento
+    
+    Returns:
+        Texto transcrito
+    """
+    return _process_cached(data, data, language, metrics)
+
+
+def process_audio_from_file(file_path: str, language: str = 'es', metrics: Dict = None) -> str:
+    """
+    Pipeline completo: decodifica y transcribe audio
     
     Args:
         file_path: Ruta del archivo de audio original
         language: Código de idioma (default: 'es')
+        metrics: Dict opcional que se rellena con métricas del procesamiento
     
     Returns:
         Texto transcrito
     """
-    wav_path = None
+    data = Path(file_path).read_bytes() if _cache is not None else None
+    return _process_cached(data, file_path, language, metrics)
+
+
+def _process_cached(data: bytes, source: Union[bytes, str], language: str,
+                    metrics: Dict = None) -> str:
+    """Consulta la caché por hash del audio y, si falla, decodifica y transcribe"""
+    key = None
+    if _cache is not None:
+        key = _cache.make_key(data, _model_id(), language)
+        transcript = _cache.get(key)
+        if metrics is not None:
+            metrics['cache'] = 'hit' if transcript is not None else 'miss'
+        if transcript is not None:
+            logger.info("Transcripción obtenida de la caché")
+            return transcript
+    
+    with stage(metrics, 'probe'):
+        info = probe_audio(source)
+    if metrics is not None and info:
+        metrics['input'] = {k: info.get(k) for k in ('container', 'codec', 'sample_rate',
+                                                     'channels', 'duration')}
+    _check_duration(info and info.get('duration'))
+    
+    with stage(metrics, 'decode'):
+        audio = decode_audio(source, info)
+    # Formatos sin duración en la cabecera: comprobar tras decodificar (acotado por -t)
+    _check_duration(len(audio) / SAMPLE_RATE)
+    
+    transcript = _transcribe_decoded(audio, language, metrics)
+    
+    if key is not None:
+        _cache.put(key, transcript)
+    return transcript
+
+
+def _warmup_audio() -> np.ndarray:
+    """Clip sintético de 1s (armónicos + ruido) para la inferencia de calentamiento"""
+    t = np.arange(SAMPLE_RATE, dtype=np.float32) / SAMPLE_RATE
+    tone = sum(np.sin(2 * np.pi * f * t) for f in (180, 360, 720)) * 0.1
+    noise = np.random.default_rng(0).normal(0, 0.01, SAMPLE_RATE)
+    return (tone + noise).astype(np.float32)
+
+
+def warm_up(run_inference: bool = None):
+    """
+    Carga el modelo compartido del proceso y opcionalmente ejecuta una inferencia
+    de prueba, para que la primera petición real no pague la carga ni el arranque
+    
+    Args:
+        run_inference: Ejecutar inferencia de prueba (default: WHISPER_WARMUP_INFERENCE)
+    """
+    global _warmup_error
+    if run_inference is None:
+        run_inference = config.WHISPER_WARMUP_INFERENCE
+    _warmup_started.set()
+    
     try:
-        # Convertir a WAV
-        wav_path = convert_to_wav(file_path)
-        
-        # Transcribir
-        transcript = transcribe_audio(wav_path, language)
-        
-        return transcript
-        
-    finally:
-        # Limpiar archivo temporal WAV
-        if wav_path and Path(wav_path).exists():
-            try:
-                os.remove(wav_path)
-            except Exception as e:
-                logger.warning(f"No se pudo eliminar archivo temporal: {e}")
+        started = time.monotonic()
+        model = _get_whisper_model()
+        if run_inference or model.remote:
+            model.warm_up()
+        _warmup_error = None
+        _model_ready.set()
+        logger.info(f"Modelo Whisper listo en {time.monotonic() - started:.1f}s")
+    except Exception as e:
+        _warmup_error = str(e)
+        logger.error(f"Error calentando modelo Whisper: {e}")
+        raise
+
+
+def warm_up_in_background(on_error: Callable[[Exception], None] = None):
+    """
+    Lanza warm_up en un hilo; /healthz responde 503 desde este momento hasta que
+    termine, también si el hilo aún no ha empezado
+    """
+    _warmup_started.set()
+    
+    def _run():
+        try:
+            warm_up()
+        except Exception as e:
+            if on_error:
+                on_error(e)
+    
+    threading.Thread(target=_run, name='whisper-warmup', daemon=True).start()
+
+
+def model_status() -> Dict:
+    """Estado del modelo para el endpoint de salud"""
+    return {
+        'loaded': _whisper_model is not None,
+        'backend': _whisper_model.name if _whisper_model is not None else None,
+        'warm': _model_ready.is_set(),
+        'error': _warmup_error,
+        # Sin calentamiento lanzado (WHISPER_WARMUP=false, flask run, otro servidor WSGI)
+        # el modelo se carga en la primera petición
+        'ready': _model_ready.is_set() or not _warmup_started.is_set(),
+    }
 
 
 def preload_model():
-    """Pre-carga el modelo Whisper (útil para build en Render)"""
+    """Pre-carga el modelo Whisper en el proceso (descarga los pesos en el build de Render)"""
     try:
         logger.info("Pre-cargando modelo Whisper...")
-        import whisper
-        whisper.load_model(config.WHISPER_MODEL)
+        _get_whisper_model()
         logger.info("Modelo pre-cargado correctamente")
     except Exception as e:
         logger.error(f"Error pre-cargando modelo: {e}")
         raise
-
@@ -0,0 +1,236 @@
+"""
+Transcripción incremental de audio en streaming
+Recibe los fragmentos Opus mientras el usuario graba y transcribe por ventanas,
+de modo que al soltar el botón solo queda pendiente la última ventana
+"""
+import logging
+import subprocess
+import threading
+import time
+from typing import Optional
+import numpy as np
+import config
+import audio_pipeline
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = audio_pipeline.SAMPLE_RATE
+
+
+class StreamTooLargeError(Exception):
+    """El audio recibido supera el tamaño o la duración permitidos"""
+
+
+class _StreamDecoder:
+    """
+    Proceso ffmpeg abierto durante toda la grabación
+
+    Los fragmentos de MediaRecorder no se pueden decodificar por separado (solo el
+    primero lleva la cabecera del contenedor), así que se escriben en el stdin de
+    un único ffmpeg y cada uno se decodifica una sola vez. Un hilo recoge las
+    muestras según ffmpeg las escribe.
+    """
+
+    def __init__(self):
+        self._process = subprocess.Popen(
+            audio_pipeline.ffmpeg_decode_command('pipe:0'),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        self._pcm = bytearray()
+        self._stderr = b''
+        self._lock = threading.Lock()
+        self._input_error = None
+        self._readers = [
+            threading.Thread(target=self._read_stdout, name='stream-decoder', daemon=True),
+            threading.Thread(target=self._read_stderr, name='stream-decoder-log', daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+    def _read_stdout(self):
+        while True:
+            data = self._process.stdout.read1(65536)
+            if not data:
+                return
+            with self._lock:
+                self._pcm.extend(data)
+
+    def _read_stderr(self):
+        # Se vacía siempre para que ffmpeg no se bloquee, pero solo se guarda el final
+        while True:
+            data = self._process.stderr.read1(4096)
+            if not data:
+                return
+            self._stderr = (self._stderr + data)[-4096:]
+
+    def write(self, chunk: bytes):
+        if self._input_error is not None:
+            return
+        try:
+            self._process.stdin.write(chunk)
+            self._process.stdin.flush()
+        except OSError as e:
+            # ffmpeg ha terminado (entrada no válida): el error se informa en finish
+            self._input_error = e
+
+    def sample_count(self) -> int:
+        with self._lock:
+            return len(self._pcm) // 4
+
+    def samples(self, start: int) -> np.ndarray:
+        """Muestras decodificadas desde start (solo se copia la ventana pedida)"""
+        with self._lock:
+            end = len(self._pcm) - len(self._pcm) % 4
+            return np.frombuffer(bytes(self._pcm[start * 4:end]), dtype=np.float32)
+
+    def finish(self):
+        """Cierra la entrada y espera a que ffmpeg entregue las últimas muestras"""
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        try:
+            self._process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.close()
+            raise Exception("Timeout en decodificación de audio")
+        for reader in self._readers:
+            reader.join()
+        if self._process.returncode != 0:
+            stderr = self._stderr.decode('utf-8', errors='replace')
+            if not self.sample_count():
+                raise Exception(f"Error de decodificación: {stderr}")
+            # El último fragmento puede estar cortado a mitad de página Opus
+            logger.debug(f"ffmpeg terminó con error tras decodificar el audio: {stderr}")
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+
+class StreamingTranscriber:
+    """
+    Acumula los fragmentos del MediaRecorder y transcribe en una ventana deslizante
+
+    El audio se decodifica de forma incremental (_StreamDecoder) y solo se
+    transcribe el audio aún no confirmado, como mucho STREAM_WINDOW_SECONDS más lo
+    recibido desde el último parcial: el coste de cada parcial no crece con la
+    duración de la grabación.
+    """
+
+    def __init__(self, language: str = 'es'):
+        self.language = language
+        self._decoder = _StreamDecoder()
+        self._received = 0
+        self._committed_text = []
+        self._committed_samples = 0
+        self._last_partial_at = 0.0
+        self._last_partial_samples = 0
+        self._last_pending = ''
+        self.metrics = {'chunks': 0, 'partials': 0, 'commits': 0}
+
+    def feed(self, chunk: bytes):
+        """Añade un fragmento recibido del cliente"""
+        self._received += len(chunk)
+        self.metrics['chunks'] += 1
+        if self._received > config.MAX_CONTENT_LENGTH:
+            raise StreamTooLargeError('Audio demasiado grande')
+        self._decoder.write(chunk)
+
+    def maybe_partial(self) -> Optional[str]:
+        """
+        Transcribe la ventana pendiente si ha pasado el intervalo mínimo
+
+        Returns:
+            Transcripción parcial acumulada o None si no toca actualizar
+        """
+        if time.monotonic() - self._last_partial_at < config.STREAM_PARTIAL_INTERVAL_SECONDS:
+            return None
+
+        decoded = self._decoder.sample_count()
+        # Sin audio nuevo suficiente no merece la pena otra pasada del modelo
+        if decoded - self._last_partial_samples < SAMPLE_RATE // 2:
+            return None
+
+        window = self._commit_long_window(self._pending_audio())
+        pending = self._transcribe(window)
+
+        self._last_partial_at = time.monotonic()
+        self._last_partial_samples = self._committed_samples + len(window)
+        self._last_pending = pending
+        self.metrics['partials'] += 1
+        return self._join(pending)
+
+    def finish(self) -> str:
+        """Transcribe la última ventana y devuelve el texto completo"""
+        if not self._received:
+            return self._join('')
+        self._decoder.finish()
+        window = self._pending_audio()
+        decoded = self._committed_samples + len(window)
+        if decoded == self._last_partial_samples:
+            # Nada nuevo desde el último parcial: ya está transcrito
+            pending = self._last_pending
+        else:
+            pending = self._transcribe(window)
+        self.metrics['audio_seconds'] = round(decoded / SAMPLE_RATE, 3)
+        return self._join(pending)
+
+    def close(self):
+        """Termina ffmpeg si la conexión se corta antes de finish"""
+        self._decoder.close()
+
+    def _pending_audio(self) -> np.ndarray:
+        """Audio decodificado aún no confirmado"""
+        window = self._decoder.samples(self._committed_samples)
+        if self._committed_samples + len(window) > config.AUDIO_MAX_DURATION_SECONDS * SAMPLE_RATE:
+            raise StreamTooLargeError(
+                f'Audio demasiado largo (máximo {config.AUDIO_MAX_DURATION_SECONDS}s)'
+            )
+        return window
+
+    def _commit_long_window(self, window: np.ndarray) -> np.ndarray:
+        """
+        Confirma el inicio de la ventana en un silencio cuando supera el tamaño máximo
+
+        Returns:
+            La parte de la ventana que sigue pendiente
+        """
+        max_window = int(config.STREAM_WINDOW_SECONDS * SAMPLE_RATE)
+        if len(window) <= max_window:
+            return window
+
+        cut = _quietest_point(window[:max_window])
+        text = self._transcribe(window[:cut])
+        if text:
+            self._committed_text.append(text)
+        self._committed_samples += cut
+        self.metrics['commits'] += 1
+        return window[cut:]
+
+    def _transcribe(self, audio: np.ndarray) -> str:
+        if len(audio) == 0:
+            return ''
+        if config.VAD_ENABLED:
+            audio, _ = audio_pipeline.apply_vad(audio)
+            if len(audio) == 0:
+                return ''
+        return audio_pipeline.transcribe_audio(audio, self.language)
+
+    def _join(self, pending: str) -> str:
+        return ' '.join(part for part in self._committed_text + [pending] if part).strip()
+
+
+def _quietest_point(window: np.ndarray) -> int:
+    """Muestra de menor energía en el último tercio de la ventana (corte entre palabras)"""
+    frame = SAMPLE_RATE * audio_pipeline.VAD_FRAME_MS // 1000
+    start = (len(window) * 2 // 3) // frame
+    n_frames = len(window) // frame
+    if n_frames <= start:
+        return len(window)
+    frames = window[:n_frames * frame].reshape(n_frames, frame)[start:]
+    energy = np.mean(np.square(frames, dtype=np.float64), axis=1)
+    return int((start + int(np.argmin(energy)) + 1) * frame)
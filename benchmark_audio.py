@@ -0,0 +1,354 @@
+"""
+Benchmark del camino audio → tarea
+Envía clips sintéticos (y grabaciones propias, si se indican) por /api/audio/process
+con el cliente de pruebas de Flask, o directamente por audio_pipeline, y mide la
+latencia p50/p95/p99 de cada etapa (upload, probe, decode, vad, transcribe, parse),
+el rendimiento con N clientes concurrentes y el pico de memoria (RSS).
+
+Los resultados se guardan en JSON para comparar backends, tamaños de modelo o
+configuraciones entre ejecuciones (--baseline muestra la diferencia con otra).
+
+Uso: python benchmark_audio.py [--mode app|pipeline] [--durations 2,5,10,30]
+                               [--formats webm,wav] [--fixtures DIR] [--concurrency 1,4]
+                               [--iterations 3] [--output resultados.json] [--baseline anterior.json]
+"""
+import os
+import tempfile
+
+# La caché devolvería la transcripción sin pasar por el modelo y la base de datos
+# del benchmark no debe mezclarse con la real: se fijan antes de importar config
+_tmp_dir = tempfile.TemporaryDirectory()
+os.environ.setdefault('TRANSCRIPTION_CACHE_ENABLED', 'false')
+os.environ.setdefault('SQLITE_PATH', os.path.join(_tmp_dir.name, 'benchmark.db'))
+
+import argparse
+import io
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+import config
+import audio_pipeline
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = audio_pipeline.SAMPLE_RATE
+RESULTS_DIR = Path(__file__).parent / 'benchmarks' / 'results'
+
+STAGES = ('upload', 'probe', 'decode', 'vad', 'model_load', 'transcribe', 'parse')
+PERCENTILES = (50, 95, 99)
+
+# Códec de ffmpeg para cada formato sintético (webm/opus es lo que graba el navegador)
+FORMAT_CODECS = {
+    'webm': ['-c:a', 'libopus', '-b:a', '32k'],
+    'ogg': ['-c:a', 'libopus', '-b:a', '32k'],
+    'mp3': ['-c:a', 'libmp3lame', '-b:a', '64k'],
+    'm4a': ['-c:a', 'aac', '-b:a', '64k'],
+}
+
+# Las mismas extensiones que acepta /api/audio/process
+FIXTURE_EXTENSIONS = {'.ogg', '.wav', '.mp3', '.m4a', '.webm'}
+
+CONFIG_KEYS = (
+    'TRANSCRIPTION_MODE', 'WHISPER_BACKEND', 'WHISPER_MODEL', 'WHISPER_DEVICE',
+    'WHISPER_COMPUTE_TYPE', 'WHISPER_CPU_THREADS', 'WHISPER_BEAM_SIZE',
+    'TRANSCRIPTION_BATCH_SIZE', 'TRANSCRIPTION_BATCH_WAIT_MS', 'VAD_ENABLED',
+    'AUDIO_FILTER_CHAIN', 'TRANSCRIPTION_CACHE_ENABLED',
+)
+
+
+def synthetic_clip(seconds: float, seed: int = 0) -> np.ndarray:
+    """Sílabas sintéticas (armónicos con vibrato) separadas por pausas, con ruido de fondo"""
+    rng = np.random.default_rng(seed)
+    audio = rng.normal(0, 0.005, int(seconds * SAMPLE_RATE)).astype(np.float32)
+    position = int(0.3 * SAMPLE_RATE)
+    while position < len(audio):
+        length = int(rng.uniform(0.12, 0.35) * SAMPLE_RATE)
+        t = np.arange(min(length, len(audio) - position)) / SAMPLE_RATE
+        pitch = rng.uniform(110, 220) * (1 + 0.03 * np.sin(2 * np.pi * 5 * t))
+        syllable = sum(np.sin(2 * np.pi * pitch * k * t) / k for k in (1, 2, 3, 4))
+        audio[position:position + len(t)] += (0.15 * syllable * np.hanning(len(t))).astype(np.float32)
+        # Pausas más largas cada pocas sílabas, como entre palabras
+        position += len(t) + int(rng.choice([0.05, 0.05, 0.08, 0.4]) * SAMPLE_RATE)
+    return np.clip(audio, -1, 1)
+
+
+def _wav_bytes(audio: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(SAMPLE_RATE)
+        wav.writeframes((audio * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+def encode_clip(audio: np.ndarray, fmt: str) -> bytes:
+    """Codifica el clip en el formato indicado (WAV directamente, el resto con ffmpeg)"""
+    wav = _wav_bytes(audio)
+    if fmt == 'wav':
+        return wav
+    with tempfile.NamedTemporaryFile(suffix=f'.{fmt}') as out:
+        subprocess.run(
+            ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', '-i', 'pipe:0',
+             *FORMAT_CODECS[fmt], out.name],
+            input=wav, check=True, capture_output=True
+        )
+        return Path(out.name).read_bytes()
+
+
+def load_fixtures(durations: List[float], formats: List[str], fixtures_dir: Path = None) -> List[Dict]:
+    """Clips sintéticos de cada duración y formato más las grabaciones de fixtures_dir"""
+    fixtures = []
+    for seconds in durations:
+        audio = synthetic_clip(seconds, seed=int(seconds * 10))
+        for fmt in formats:
+            fixtures.append({
+                'name': f'synthetic-{seconds:g}s.{fmt}',
+                'format': fmt,
+                'seconds': seconds,
+                'data': encode_clip(audio, fmt),
+            })
+    
+    if fixtures_dir:
+        for path in sorted(fixtures_dir.iterdir()):
+            if path.suffix.lower() not in FIXTURE_EXTENSIONS:
+                continue
+            fmt = path.suffix.lower().lstrip('.')
+            info = audio_pipeline.probe_audio(str(path)) or {}
+            fixtures.append({
+                'name': path.name,
+                'format': fmt,
+                'seconds': info.get('duration'),
+                'data': path.read_bytes(),
+            })
+    return fixtures
+
+
+def _percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {}
+    summary = {f'p{p}': round(float(np.percentile(values, p)), 1) for p in PERCENTILES}
+    summary.update(mean=round(float(np.mean(values)), 1), count=len(values))
+    return summary
+
+
+def _peak_rss_mb() -> Dict:
+    """Pico de memoria residente del proceso y de los hijos (ffmpeg) en MB"""
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    unit = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return {
+        'self': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        'children': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+
+class AppRunner:
+    """Recorre /api/audio/process con el cliente de pruebas de Flask (un cliente por hilo)"""
+    
+    def __init__(self):
+        import app
+        self.app = app.app
+        self._local = threading.local()
+    
+    def __call__(self, fixture: Dict) -> Dict:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.post(
+            '/api/audio/process',
+            data={'audio': (io.BytesIO(fixture['data']), fixture['name'])},
+            content_type='multipart/form-data'
+        )
+        body = response.get_json() or {}
+        return {
+            'status': response.status_code,
+            'metrics': body.get('metrics', {}),
+            'transcript': body.get('transcript', ''),
+        }
+
+
+class PipelineRunner:
+    """Llama directamente a audio_pipeline y al parser, sin Flask"""
+    
+    def __init__(self):
+        import database
+        import parser
+        self.intent_parser = parser.IntentParser(database.Database())
+    
+    def __call__(self, fixture: Dict) -> Dict:
+        metrics = {}
+        transcript = audio_pipeline.process_audio_bytes(fixture['data'], metrics=metrics)
+        if transcript:
+            with audio_pipeline.stage(metrics, 'parse'):
+                self.intent_parser.parse(transcript)
+        return {'status': 200 if transcript else 400, 'metrics': metrics, 'transcript': transcript}
+
+
+def _timed(runner, fixture: Dict) -> Dict:
+    started = time.perf_counter()
+    try:
+        result = runner(fixture)
+    except Exception as e:
+        logger.error(f"Error con {fixture['name']}: {e}")
+        result = {'status': None, 'metrics': {}, 'transcript': '', 'error': str(e)}
+    result['total_ms'] = (time.perf_counter() - started) * 1000
+    result['fixture'] = fixture
+    return result
+
+
+def run_level(runner, fixtures: List[Dict], concurrency: int, iterations: int) -> Dict:
+    """Lanza fixtures × iterations peticiones con `concurrency` clientes simultáneos"""
+    jobs = [fixture for _ in range(iterations) for fixture in fixtures]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda fixture: _timed(runner, fixture), jobs))
+    wall = time.perf_counter() - started
+    
+    # 400 = clip sin voz o transcripción vacía: la petición se completó igualmente
+    completed = [r for r in results if r['status'] in (200, 400)]
+    stages = {}
+    for name in STAGES:
+        values = [r['metrics']['timings_ms'][name] for r in completed
+                  if name in r['metrics'].get('timings_ms', {})]
+        if values:
+            stages[name] = _percentiles(values)
+    
+    per_fixture = {}
+    for fixture in fixtures:
+        totals = [r['total_ms'] for r in completed if r['fixture'] is fixture]
+        per_fixture[fixture['name']] = _percentiles(totals)
+    
+    audio_seconds = sum(r['fixture']['seconds'] or 0 for r in completed)
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'errors': len(results) - len(completed),
+        'empty_transcripts': sum(1 for r in completed if not r['transcript']),
+        'wall_seconds': round(wall, 3),
+        'requests_per_second': round(len(completed) / wall, 2),
+        # Segundos de audio procesados por segundo de reloj (>1 = más rápido que tiempo real)
+        'audio_seconds_per_second': round(audio_seconds / wall, 2),
+        'total_ms': _percentiles([r['total_ms'] for r in completed]),
+        'stages_ms': stages,
+        'fixtures_ms': per_fixture,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def run(args) -> Dict:
+    fixtures = load_fixtures(args.durations, args.formats, args.fixtures)
+    runner = AppRunner() if args.mode == 'app' else PipelineRunner()
+    
+    # Carga del modelo por separado: es un coste de arranque, no de cada petición
+    started = time.perf_counter()
+    audio_pipeline.warm_up(run_inference=False)
+    model_load_ms = round((time.perf_counter() - started) * 1000, 1)
+    
+    first = _timed(runner, fixtures[0])
+    for _ in range(args.warmup):
+        for fixture in fixtures:
+            _timed(runner, fixture)
+    
+    levels = []
+    for concurrency in args.concurrency:
+        logger.warning(f"Concurrencia {concurrency}: {len(fixtures) * args.iterations} peticiones")
+        levels.append(run_level(runner, fixtures, concurrency, args.iterations))
+    
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'mode': args.mode,
+        'label': args.label,
+        'host': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'config': {key: getattr(config, key) for key in CONFIG_KEYS},
+        'backend': audio_pipeline.model_status()['backend'],
+        'fixtures': [dict(name=f['name'], format=f['format'], seconds=f['seconds'], bytes=len(f['data']))
+                     for f in fixtures],
+        'model_load_ms': model_load_ms,
+        'first_request_ms': round(first['total_ms'], 1),
+        'levels': levels,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def _delta(current, previous) -> str:
+    if not previous:
+        return ''
+    return f" ({(current - previous) / previous * 100:+.0f}%)"
+
+
+def print_report(report: Dict, baseline: Dict = None):
+    baseline_levels = {level['concurrency']: level for level in (baseline or {}).get('levels', [])}
+    print(f"Backend: {report['backend']} | modelo {report['config']['WHISPER_MODEL']} "
+          f"| carga {report['model_load_ms']}ms | primera petición {report['first_request_ms']}ms")
+    for level in report['levels']:
+        previous = baseline_levels.get(level['concurrency'], {})
+        print(f"\nConcurrencia {level['concurrency']}: {level['requests_per_second']} peticiones/s"
+              f"{_delta(level['requests_per_second'], previous.get('requests_per_second'))}, "
+              f"{level['audio_seconds_per_second']}s de audio/s, {level['errors']} errores")
+        print(f"  {'etapa':<12} {'p50':>9} {'p95':>9} {'p99':>9}")
+        rows = list(level['stages_ms'].items()) + [('total', level['total_ms'])]
+        for name, stats in rows:
+            old = previous.get('stages_ms', {}).get(name) if name != 'total' else previous.get('total_ms')
+            print(f"  {name:<12} {stats['p50']:>9} {stats['p95']:>9} {stats['p99']:>9}"
+                  f"{_delta(stats['p50'], (old or {}).get('p50'))}")
+    rss = report['peak_rss_mb']
+    print(f"\nPico de memoria: {rss['self']} MB (ffmpeg: {rss['children']} MB)")
+
+
+def _csv(cast):
+    return lambda value: [cast(item) for item in value.split(',') if item]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark del camino audio → tarea')
+    arg_parser.add_argument('--mode', choices=('app', 'pipeline'), default='app',
+                            help='app: /api/audio/process con el cliente de Flask; pipeline: audio_pipeline directo')
+    arg_parser.add_argument('--durations', type=_csv(float), default=[2, 5, 10, 30],
+                            help='Duraciones de los clips sintéticos en segundos')
+    arg_parser.add_argument('--formats', type=_csv(str), default=['webm', 'wav'],
+                            help=f"Formatos de los clips sintéticos ({', '.join(['wav', *FORMAT_CODECS])})")
+    arg_parser.add_argument('--fixtures', type=Path, help='Directorio con grabaciones reales')
+    arg_parser.add_argument('--concurrency', type=_csv(int), default=[1, 4])
+    arg_parser.add_argument('--iterations', type=int, default=3, help='Pasadas por clip en cada nivel')
+    arg_parser.add_argument('--warmup', type=int, default=1, help='Pasadas descartadas antes de medir')
+    arg_parser.add_argument('--label', help='Etiqueta libre guardada con los resultados')
+    arg_parser.add_argument('--output', type=Path, help='Archivo JSON de resultados '
+                            '(default: benchmarks/results/audio-<fecha>.json)')
+    arg_parser.add_argument('--baseline', type=Path, help='Resultados anteriores con los que comparar')
+    args = arg_parser.parse_args()
+    
+    unknown = [fmt for fmt in args.formats if fmt != 'wav' and fmt not in FORMAT_CODECS]
+    if unknown:
+        arg_parser.error(f"Formato no soportado: {', '.join(unknown)}")
+    
+    # Los logs por etapa del pipeline falsearían las medidas
+    logging.basicConfig(level=logging.WARNING, format='[%(levelname)s] %(message)s')
+    report = run(args)
+    
+    output = args.output or RESULTS_DIR / f"audio-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+    
+    baseline = json.loads(args.baseline.read_text(encoding='utf-8')) if args.baseline else None
+    print_report(report, baseline)
+    print(f"Resultados guardados en {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""
+Benchmark del parser de intenciones
+Parsea el corpus de benchmarks/parser_corpus.jsonl y mide a la vez velocidad
+(textos por segundo) y calidad (acierto por intención, fecha y cliente), para
+detectar regresiones de ambos tipos con un solo comando.
+
+Uso: python benchmark_parser.py [--repeat 50] [--processes 4]
+                                [--min-accuracy 0.8] [--min-throughput 2000] [--json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+import database
+import parser
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CORPUS = Path(__file__).parent / 'benchmarks' / 'parser_corpus.jsonl'
+
+# Las fechas esperadas del corpus son relativas a este día (lunes)
+CORPUS_TODAY = date(2026, 1, 5)
+
+
+def load_corpus(path: Path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(corpus, results):
+    """Acierto por intención y de fechas/clientes donde el corpus los indica"""
+    per_intent = defaultdict(lambda: {'total': 0, 'correct': 0})
+    dates = {'total': 0, 'correct': 0}
+    clients = {'total': 0, 'correct': 0}
+    errors = []
+
+    for case, result in zip(corpus, results):
+        entities = result.get('entities', {})
+        stats = per_intent[case['intent']]
+        stats['total'] += 1
+        if result['intent'] == case['intent']:
+            stats['correct'] += 1
+        else:
+            errors.append({'text': case['text'], 'expected': case['intent'], 'got': result['intent']})
+
+        if 'due_date' in case:
+            dates['total'] += 1
+            if entities.get('due_date') == case['due_date']:
+                dates['correct'] += 1
+            else:
+                errors.append({'text': case['text'], 'expected_date': case['due_date'],
+                               'got_date': entities.get('due_date')})
+
+        if 'client' in case:
+            clients['total'] += 1
+            client = entities.get('client') or {}
+            if client.get('id') and client.get('name') == case['client']:
+                clients['correct'] += 1
+            else:
+                errors.append({'text': case['text'], 'expected_client': case['client'],
+                               'got_client': client.get('name')})
+
+    def ratio(stats):
+        return round(stats['correct'] / stats['total'], 3) if stats['total'] else None
+
+    total = sum(s['total'] for s in per_intent.values())
+    correct = sum(s['correct'] for s in per_intent.values())
+    return {
+        'intent_accuracy': round(correct / total, 3) if total else None,
+        'per_intent': {intent: dict(stats, accuracy=ratio(stats))
+                       for intent, stats in sorted(per_intent.items())},
+        'date_accuracy': ratio(dates),
+        'client_accuracy': ratio(clients),
+        'errors': errors,
+    }
+
+
+def run(corpus_path: Path, repeat: int, processes: int):
+    corpus = load_corpus(corpus_path)
+    texts = [case['text'] for case in corpus]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = database.Database(os.path.join(tmp, 'benchmark.db'))
+        for name in sorted({case['client'] for case in corpus if 'client' in case}):
+            db.add_client(name)
+        intent_parser = parser.IntentParser(db)
+
+        results = intent_parser.parse_many(texts, today=CORPUS_TODAY)
+        report = evaluate(corpus, results)
+
+        batch = texts * repeat
+        start = time.perf_counter()
+        intent_parser.parse_many(batch, processes=processes, today=CORPUS_TODAY)
+        elapsed = time.perf_counter() - start
+        db.close()
+
+    report['throughput'] = {
+        'texts': len(batch),
+        'processes': processes,
+        'seconds': round(elapsed, 4),
+        'texts_per_second': round(len(batch) / elapsed, 1),
+        'mean_us': round(elapsed / len(batch) * 1e6, 1),
+    }
+    return report
+
+
+def print_report(report):
+    print('Intención      Total  Aciertos  Acierto')
+    for intent, stats in report['per_intent'].items():
+        print(f"{intent:<14} {stats['total']:>5}  {stats['correct']:>8}  {stats['accuracy']:>7}")
+    print(f"\nAcierto de intención: {report['intent_accuracy']}")
+    print(f"Acierto de fecha:     {report['date_accuracy']}")
+    print(f"Acierto de cliente:   {report['client_accuracy']}")
+    throughput = report['throughput']
+    print(f"\nVelocidad: {throughput['texts_per_second']} textos/s "
+          f"({throughput['mean_us']} µs por texto, {throughput['texts']} textos, "
+          f"{throughput['processes']} proceso(s))")
+    if report['errors']:
+        print('\nFallos:')
+        for error in report['errors']:
+            print(f"  {json.dumps(error, ensure_ascii=False)}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmark del parser de intenciones')
+    arg_parser.add_argument('--corpus', type=Path, default=DEFAULT_CORPUS)
+    arg_parser.add_argument('--repeat', type=int, default=50,
+                            help='Veces que se repite el corpus al medir la velocidad')
+    arg_parser.add_argument('--processes', type=int, default=1)
+    arg_parser.add_argument('--min-accuracy', type=float,
+                            help='Falla si el acierto de intención queda por debajo')
+    arg_parser.add_argument('--min-throughput', type=float,
+                            help='Falla si se parsean menos textos por segundo')
+    arg_parser.add_argument('--json', action='store_true', help='Salida en JSON')
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='[%(levelname)s] %(message)s')
+    report = run(args.corpus, args.repeat, args.processes)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print_report(report)
+
+    failed = False
+    if args.min_accuracy is not None and report['intent_accuracy'] < args.min_accuracy:
+        logger.error(f"Acierto {report['intent_accuracy']} por debajo de {args.min_accuracy}")
+        failed = True
+    if args.min_throughput is not None and report['throughput']['texts_per_second'] < args.min_throughput:
+        logger.error(f"Velocidad {report['throughput']['texts_per_second']} textos/s "
+                     f"por debajo de {args.min_throughput}")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Bus de cambios en proceso
+Database publica aquí cada escritura confirmada (tarea creada, actualizada o
+borrada; cliente creado o borrado) y /api/events la reenvía a los navegadores
+como Server-Sent Events. Guarda los últimos eventos para que un cliente que
+se reconecta con Last-Event-ID reciba lo que se perdió.
+"""
+import itertools
+import queue
+import threading
+import uuid
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+import config
+
+# Evento sin id que pide al cliente recargar sus listas (historial insuficiente,
+# suscriptor demasiado lento o cambios hechos por otro proceso)
+RESYNC = {'type': 'resync', 'data': {}}
+
+
+class Subscription:
+    """Cola de eventos de un cliente conectado"""
+
+    def __init__(self, bus: 'ChangeBus', max_pending: int):
+        self._bus = bus
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._overflowed = False
+        # Versión de los datos del último evento que el cliente ya tenía al reconectar
+        self.last_version = None
+
+    def _push(self, event: Dict):
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            # Cliente que no consume: se descartan sus eventos y se le pide recargar
+            self._overflowed = True
+
+    def get(self, timeout: float) -> Optional[Dict]:
+        """Siguiente evento o None si no llega ninguno en `timeout` segundos"""
+        if self._overflowed:
+            self._overflowed = False
+            with self._queue.mutex:
+                self._queue.queue.clear()
+            return RESYNC
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._bus._unsubscribe(self)
+
+
+def _number(message: Dict) -> int:
+    return int(message['id'].rsplit('-', 1)[1])
+
+
+class ChangeBus:
+    """Publicación/suscripción de cambios con historial acotado"""
+
+    def __init__(self, history: int = None, max_pending: int = None):
+        """
+        Args:
+            history: Eventos recientes que se conservan para reconexiones
+            max_pending: Eventos sin leer por suscriptor antes de pedirle recargar
+        """
+        self.max_pending = max_pending or config.EVENTS_MAX_PENDING
+        # Los ids llevan un prefijo del proceso: un Last-Event-ID de otro worker no es válido aquí
+        self._prefix = uuid.uuid4().hex[:8]
+        self._counter = itertools.count(1)
+        self._history = deque(maxlen=history or config.EVENTS_HISTORY)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        """Hay algún cliente conectado (si no, no merece la pena preparar eventos)"""
+        return bool(self._subscribers)
+
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, events: List[Dict], version: int = None):
+        """
+        Publica eventos ya confirmados en la base de datos
+
+        Args:
+            events: Dicts con 'type' y el resto de campos como datos del evento
+            version: Versión de los datos tras la escritura (get_data_version)
+        """
+        with self._lock:
+            for event in events:
+                data = {k: v for k, v in event.items() if k != 'type'}
+                if version is not None:
+                    data['version'] = version
+                message = {'id': f'{self._prefix}-{next(self._counter)}',
+                           'type': event['type'], 'data': data}
+                self._history.append(message)
+                for subscription in self._subscribers:
+                    subscription._push(message)
+
+    def subscribe(self, last_event_id: str = None, limit: int = None) -> Optional[Subscription]:
+        """
+        Registra un cliente; con last_event_id se le reenvía lo publicado después.
+        Sin last_event_id, o si ya no está en el historial, recibe un evento de
+        resincronización: no se sabe qué se perdió mientras estaba desconectado.
+
+        Args:
+            limit: Suscriptores máximos; si ya los hay devuelve None (la
+                comprobación y el alta son atómicas)
+        """
+        subscription = Subscription(self, self.max_pending)
+        with self._lock:
+            if limit is not None and len(self._subscribers) >= limit:
+                return None
+            missed = self._missed_since(last_event_id) if last_event_id else None
+            if missed is None:
+                subscription._push(RESYNC)
+            else:
+                subscription.last_version, messages = missed
+                for message in messages:
+                    subscription._push(message)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _missed_since(self, last_event_id: str) -> Optional[Tuple[Optional[int], List[Dict]]]:
+        """(versión del último evento recibido, eventos posteriores) o None si ya no está en el historial"""
+        prefix, _, number = last_event_id.rpartition('-')
+        if prefix != self._prefix or not number.isdigit() or not self._history:
+            return None
+        index = int(number) - _number(self._history[0])
+        if not 0 <= index < len(self._history):
+            return None
+        received = self._history[index]
+        return received['data'].get('version'), list(itertools.islice(self._history, index + 1, None))
+
+    def _unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
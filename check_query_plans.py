@@ -0,0 +1,141 @@
+"""
+Comprobación de planes de consulta
+Ejecuta los métodos de Database de CASES sobre una base temporal, captura las
+consultas SELECT/UPDATE/DELETE que emiten y revisa su EXPLAIN QUERY PLAN. Falla
+(código 1) si alguna recorre una tabla completa o necesita ordenar en un B-tree
+temporal. Los INSERT y la creación del esquema no se revisan.
+
+Uso: python check_query_plans.py
+"""
+import logging
+import os
+import sys
+import tempfile
+import database
+
+logging.basicConfig(level=logging.WARNING, format='[%(levelname)s] %(message)s')
+logger = logging.getLogger(__name__)
+
+KEYSET_AFTER = ('2026-01-01', '2026-01-01 10:00:00', 10)
+
+
+def _data_version(db):
+    # Sin el marcador, get_data_version vuelve a leer la tabla
+    db._local.version_marker = None
+    return db.get_data_version()
+
+
+# (descripción, llamada, se permite SCAN). Cada SCAN permitido lleva su motivo
+CASES = [
+    ('get_data_version', _data_version, False),
+    ('get_client_by_name', lambda db: db.get_client_by_name('Acme'), False),
+    ('get_client_by_id', lambda db: db.get_client_by_id(1), False),
+    ('add_client (existente)', lambda db: db.add_client('Acme'), False),
+    ('ensure_clients (existentes)', lambda db: db.ensure_clients(['Acme']), False),
+    ('ensure_clients (nuevos)', lambda db: db.ensure_clients(['Acme', 'Nuevo']), False),
+    ('get_client_ids', lambda db: db.get_client_ids([1, 2, 999]), False),
+    # Listado completo (GET /api/clients sin q): recorre el índice de nombres ya ordenado
+    ('search_clients()', lambda db: db.search_clients(), True),
+    ('search_clients(query)', lambda db: db.search_clients('ac', limit=10), False),
+    ('get_task_by_id', lambda db: db.get_task_by_id(1), False),
+    ('search_tasks', lambda db: db.search_tasks('prueba'), False),
+    ('search_tasks(status)', lambda db: db.search_tasks('prue', status='pending'), False),
+    # Sin filtro: recorre idx_tasks_due, que ya está en el orden de la lista, hasta el LIMIT
+    ('get_tasks()', lambda db: db.get_tasks(limit=50), True),
+    ('get_tasks(status)', lambda db: db.get_tasks(status='pending', limit=50), False),
+    ('get_tasks(client_id)', lambda db: db.get_tasks(client_id=1, limit=50), False),
+    ('get_tasks(due_date)', lambda db: db.get_tasks(due_date='2026-01-01'), False),
+    ('get_tasks(status, client_id)',
+     lambda db: db.get_tasks(status='pending', client_id=1, limit=50), False),
+    ('get_tasks(status, due_date)',
+     lambda db: db.get_tasks(status='pending', due_date='2026-01-01'), False),
+    ('get_tasks(status, client_id, due_date)',
+     lambda db: db.get_tasks(status='pending', client_id=1, due_date='2026-01-01'), False),
+    ('get_tasks(status, after)',
+     lambda db: db.get_tasks(status='pending', limit=50, after=KEYSET_AFTER), False),
+    ('get_tasks(status, after sin fecha)',
+     lambda db: db.get_tasks(status='pending', limit=50, after=(None,) + KEYSET_AFTER[1:]), False),
+    ('get_tasks(client_id, after)',
+     lambda db: db.get_tasks(client_id=1, limit=50, after=KEYSET_AFTER), False),
+    ('get_tasks(fields)',
+     lambda db: db.get_tasks(status='pending', limit=50, fields=['id', 'title']), False),
+    ('iter_tasks(status)',
+     lambda db: list(db.iter_tasks(status='pending', batch_size=10)), False),
+    # COUNT(*) sin filtro cuenta todas las filas: recorre el índice más pequeño
+    ('count_tasks()', lambda db: db.count_tasks(), True),
+    ('count_tasks(status)', lambda db: db.count_tasks(status='pending'), False),
+    ('count_tasks(client_id)', lambda db: db.count_tasks(client_id=1), False),
+    ('update_task', lambda db: db.update_task(1, title='x'), False),
+    ('delete_task', lambda db: db.delete_task(999), False),
+    ('delete_client', lambda db: db.delete_client(999), False),
+    # Lee el último id de sqlite_sequence, que no tiene índices (una fila por tabla AUTOINCREMENT)
+    ('add_tasks_bulk', lambda db: db.add_tasks_bulk([{'title': 'Importada'}]), True),
+    ('_backfill_client_keys', lambda db: db._backfill_client_keys(), False),
+    # Solo al arrancar: el NOT IN lee una vez por lote los rowid de {table}_fts (tabla virtual)
+    ('_backfill_search(tasks)',
+     lambda db: db._backfill_search('tasks', ('title', 'solution', 'ampliacion')), False),
+    ('_backfill_search(clients)', lambda db: db._backfill_search('clients', ('name',)), False),
+]
+
+CHECKED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+def _capture(db, call):
+    """Ejecuta la llamada y devuelve las consultas (con parámetros) que lanza"""
+    statements = []
+    conn = db.get_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        call(db)
+    finally:
+        conn.set_trace_callback(None)
+    return [s for s in statements if s.lstrip().upper().startswith(CHECKED_STATEMENTS)]
+
+
+def _problems(db, statement: str, allow_scan: bool):
+    """Líneas del plan que indican recorrido completo u ordenación temporal"""
+    plan = [row[3] for row in db.get_connection().execute('EXPLAIN QUERY PLAN ' + statement)]
+    problems = [line for line in plan if 'USE TEMP B-TREE' in line]
+    if not allow_scan:
+        # Las tablas FTS5 aparecen como SCAN ... VIRTUAL TABLE pero usan su propio índice
+        problems += [line for line in plan
+                     if line.startswith('SCAN') and 'VIRTUAL TABLE' not in line]
+    return plan, problems
+
+
+def check(db) -> int:
+    """Revisa todos los casos y devuelve el número de consultas con problemas"""
+    failures = 0
+    for description, call, allow_scan in CASES:
+        for statement in _capture(db, call):
+            plan, problems = _problems(db, statement, allow_scan)
+            if problems:
+                failures += 1
+                print(f"FALLO {description}")
+                print(f"    {' '.join(statement.split())}")
+                for line in plan:
+                    print(f"    -> {line}")
+            else:
+                print(f"ok    {description}: {'; '.join(plan)}")
+    return failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db = database.Database(os.path.join(tmp, 'plans.db'))
+        client_id = db.add_client('Acme')
+        db.add_task('Tarea de prueba', client_id=client_id, due_date='2026-01-01')
+        try:
+            failures = check(db)
+        finally:
+            db.close()
+
+    if failures:
+        print(f"\n{failures} consulta(s) sin índice adecuado")
+        return 1
+    print("\nTodas las consultas usan índices")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -11,7 +11,8 @@ TELEGRAM_WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET', '')
 
 # Aplicación
 ADMIN_PASSWORD = os.getenv('ADMIN_PASSWORD', 'admin123')
-SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
+DEFAULT_SECRET_KEY = 'dev-secret-key-change-in-production'
+SECRET_KEY = os.getenv('SECRET_KEY', DEFAULT_SECRET_KEY)
 
 # Base de datos
 # En Render, usar Persistent Disk montado en /opt/render/project/src/data
@@ -22,12 +23,100 @@ if not DATA_DIR.exists():
     DATA_DIR.mkdir(exist_ok=True)
 
 SQLITE_PATH = os.getenv('SQLITE_PATH', str(DATA_DIR / 'app.db'))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '20000'))
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+# Paginación de GET /api/tasks
+TASKS_PAGE_SIZE = int(os.getenv('TASKS_PAGE_SIZE', '50'))
+TASKS_PAGE_SIZE_MAX = int(os.getenv('TASKS_PAGE_SIZE_MAX', '500'))
+# Importación/exportación en bloque (/api/tasks/bulk, /api/tasks/export)
+BULK_IMPORT_MAX_ROWS = int(os.getenv('BULK_IMPORT_MAX_ROWS', '50000'))  # Filas por petición
+BULK_IMPORT_BATCH_SIZE = int(os.getenv('BULK_IMPORT_BATCH_SIZE', '500'))  # Filas por executemany
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '500'))  # Tareas leídas por consulta
+# Cambios en vivo (/api/events, Server-Sent Events)
+# Cada conexión abierta ocupa un hilo de gunicorn (--threads) mientras dura
+EVENTS_MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', '2'))  # Conexiones por proceso
+EVENTS_STREAM_SECONDS = int(os.getenv('EVENTS_STREAM_SECONDS', '300'))  # Luego el navegador reconecta
+EVENTS_POLL_SECONDS = float(os.getenv('EVENTS_POLL_SECONDS', '2'))  # Comprobación de cambios de otros workers
+EVENTS_HEARTBEAT_SECONDS = int(os.getenv('EVENTS_HEARTBEAT_SECONDS', '15'))
+EVENTS_HISTORY = int(os.getenv('EVENTS_HISTORY', '500'))  # Eventos guardados para reconexiones
+EVENTS_MAX_PENDING = int(os.getenv('EVENTS_MAX_PENDING', '1000'))  # Sin leer por conexión antes de resync
+
+# Caché de respuestas de listados (se invalida con cada escritura en la base de datos)
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '256'))  # Entradas (0 = desactivada)
+RESPONSE_CACHE_MAX_MB = int(os.getenv('RESPONSE_CACHE_MAX_MB', '16'))
 
 # Audio
 AUDIO_MAX_DURATION_SECONDS = int(os.getenv('AUDIO_MAX_DURATION_SECONDS', '60'))
+# Cadena de filtros ffmpeg (vacía = sin filtros)
+AUDIO_FILTER_CHAIN = os.getenv(
+    'AUDIO_FILTER_CHAIN',
+    'highpass=f=80,acompressor=threshold=0.089:ratio=9:attack=200:release=1000'
+)
+# Aplicar los filtros también a WAV que ya está en 16kHz mono PCM (desactiva el camino rápido)
+AUDIO_FILTER_COMPLIANT = os.getenv('AUDIO_FILTER_COMPLIANT', 'false').lower() == 'true'
+# Sondear con ffprobe los formatos comprimidos para rechazar clips largos antes de decodificar
+AUDIO_PROBE = os.getenv('AUDIO_PROBE', 'true').lower() == 'true'
 WHISPER_MODEL = os.getenv('WHISPER_MODEL', 'base')  # tiny, base, small, medium
 WHISPER_DEVICE = os.getenv('WHISPER_DEVICE', 'cpu')
 WHISPER_COMPUTE_TYPE = os.getenv('WHISPER_COMPUTE_TYPE', 'int8')
+# Backend de transcripción: auto (faster-whisper si está instalado), faster-whisper, openai-whisper
+WHISPER_BACKEND = os.getenv('WHISPER_BACKEND', 'auto')
+WHISPER_CPU_THREADS = int(os.getenv('WHISPER_CPU_THREADS', str(os.cpu_count() or 1)))
+WHISPER_BEAM_SIZE = int(os.getenv('WHISPER_BEAM_SIZE', '5'))
+# Modo de transcripción: local (cada worker carga el modelo) o remote (servidor único por socket Unix)
+TRANSCRIPTION_MODE = os.getenv('TRANSCRIPTION_MODE', 'local')
+TRANSCRIPTION_SERVER_SOCKET = os.getenv('TRANSCRIPTION_SERVER_SOCKET', '/tmp/agenteweb-transcription.sock')
+TRANSCRIPTION_SERVER_AUTOSTART = os.getenv('TRANSCRIPTION_SERVER_AUTOSTART', 'true').lower() == 'true'
+TRANSCRIPTION_SERVER_WAIT_SECONDS = int(os.getenv('TRANSCRIPTION_SERVER_WAIT_SECONDS', '300'))
+# Espera máxima de cada respuesta del servidor (por debajo del --timeout de gunicorn)
+TRANSCRIPTION_SERVER_TIMEOUT_SECONDS = int(os.getenv('TRANSCRIPTION_SERVER_TIMEOUT_SECONDS', '120'))
+# Pausa antes de relanzar el servidor si termina inesperadamente
+TRANSCRIPTION_SERVER_RESTART_DELAY_SECONDS = int(os.getenv('TRANSCRIPTION_SERVER_RESTART_DELAY_SECONDS', '5'))
+
+# Calentamiento del modelo al arrancar cada worker de gunicorn
+WHISPER_WARMUP = os.getenv('WHISPER_WARMUP', 'true').lower() == 'true'
+WHISPER_WARMUP_INFERENCE = os.getenv('WHISPER_WARMUP_INFERENCE', 'true').lower() == 'true'
+
+# Micro-batching de inferencia (1 = desactivado)
+TRANSCRIPTION_BATCH_SIZE = int(os.getenv('TRANSCRIPTION_BATCH_SIZE', '1'))
+TRANSCRIPTION_BATCH_WAIT_MS = int(os.getenv('TRANSCRIPTION_BATCH_WAIT_MS', '20'))
+
+# Transcripción en streaming (WebSocket)
+STREAM_WINDOW_SECONDS = float(os.getenv('STREAM_WINDOW_SECONDS', '10'))
+STREAM_PARTIAL_INTERVAL_SECONDS = float(os.getenv('STREAM_PARTIAL_INTERVAL_SECONDS', '1.0'))
+
+# Detección de voz (VAD) antes de transcribir
+VAD_ENABLED = os.getenv('VAD_ENABLED', 'true').lower() == 'true'
+VAD_THRESHOLD_DB = float(os.getenv('VAD_THRESHOLD_DB', '-45'))  # dBFS mínimo para considerar voz
+VAD_MIN_SPEECH_MS = int(os.getenv('VAD_MIN_SPEECH_MS', '250'))  # Menos voz que esto = clip silencioso
+VAD_PAD_MS = int(os.getenv('VAD_PAD_MS', '200'))  # Margen conservado alrededor de la voz
+VAD_MAX_PAUSE_MS = int(os.getenv('VAD_MAX_PAUSE_MS', '600'))  # Pausas internas se recortan a esto
+
+# Caché de transcripciones (por hash del audio + backend y modelo cargados + preprocesado + idioma)
+TRANSCRIPTION_CACHE_ENABLED = os.getenv('TRANSCRIPTION_CACHE_ENABLED', 'true').lower() == 'true'
+TRANSCRIPTION_CACHE_SIZE = int(os.getenv('TRANSCRIPTION_CACHE_SIZE', '256'))  # Entradas en memoria (LRU)
+TRANSCRIPTION_CACHE_DISK = os.getenv('TRANSCRIPTION_CACHE_DISK', 'true').lower() == 'true'
+TRANSCRIPTION_CACHE_DISK_MAX_ENTRIES = int(os.getenv('TRANSCRIPTION_CACHE_DISK_MAX_ENTRIES', '5000'))
+TRANSCRIPTION_CACHE_TTL_SECONDS = int(os.getenv('TRANSCRIPTION_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+TRANSCRIPTION_CACHE_PATH = os.getenv('TRANSCRIPTION_CACHE_PATH', str(DATA_DIR / 'transcription_cache.db'))
+
+# Cola de transcripción asíncrona
+TRANSCRIPTION_WORKERS = int(os.getenv('TRANSCRIPTION_WORKERS', '1'))
+TRANSCRIPTION_QUEUE_MAX = int(os.getenv('TRANSCRIPTION_QUEUE_MAX', '8'))
+TRANSCRIPTION_JOB_TTL_SECONDS = int(os.getenv('TRANSCRIPTION_JOB_TTL_SECONDS', '3600'))
+TRANSCRIPTION_MAX_WAIT_SECONDS = int(os.getenv('TRANSCRIPTION_MAX_WAIT_SECONDS', '25'))
+
+# Logging
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')  # text o json (una línea JSON por registro)
+# Formatear y escribir los logs en un hilo aparte, fuera de las peticiones
+LOG_ASYNC = os.getenv('LOG_ASYNC', 'true').lower() == 'true'
+# Fracción de registros INFO/DEBUG que se conservan por logger: 'parser=0.1,database=0.1'
+LOG_SAMPLING = os.getenv('LOG_SAMPLING', '')
+
+# Métricas (endpoint /metrics en formato Prometheus)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
 
 # Google Calendar (Opcional)
 GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID', '')
@@ -38,9 +127,14 @@ GOOGLE_CALENDAR_ID = os.getenv('GOOGLE_CALENDAR_ID', '')
 # Parser
 FUZZY_MATCH_THRESHOLD_AUTO = float(os.getenv('FUZZY_MATCH_THRESHOLD_AUTO', '0.85'))
 FUZZY_MATCH_THRESHOLD_CONFIRM = float(os.getenv('FUZZY_MATCH_THRESHOLD_CONFIRM', '0.70'))
+# Segundos que el parser reutiliza su índice de clientes (recoge altas de otros workers)
+PARSER_CLIENT_INDEX_TTL_SECONDS = int(os.getenv('PARSER_CLIENT_INDEX_TTL_SECONDS', '30'))
+PARSE_BATCH_MAX = int(os.getenv('PARSE_BATCH_MAX', '1000'))  # Textos máximos en /api/parse/batch
 
 # Uploads
 UPLOAD_FOLDER = DATA_DIR / 'uploads'
 UPLOAD_FOLDER.mkdir(exist_ok=True)
+JOBS_FOLDER = DATA_DIR / 'jobs'
+JOBS_FOLDER.mkdir(exist_ok=True)
 MAX_CONTENT_LENGTH = 10 * 1024 * 1024  # 10MB máximo
 
@@ -1,33 +1,199 @@
 """
 Gestión de base de datos SQLite
 """
+import os
+import re
+import time
 import sqlite3
 import logging
+import functools
+import threading
+import unicodedata
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 import config
+import change_bus
+import instrumentation
 
 logger = logging.getLogger(__name__)
 
+# Campos que se pueden pedir en get_tasks(fields=...)
+TASK_FIELDS = ('id', 'title', 'client_id', 'client_name', 'due_date', 'priority', 'status',
+               'created_at', 'completed_at', 'solution', 'ampliacion')
+# Orden de las listas de tareas; también es la clave del cursor de paginación
+TASK_SORT_KEY = ('due_date', 'created_at', 'id')
+# Índices compuestos de tasks: filtros de igualdad + columnas de orden
+TASK_INDEXES = {
+    'idx_tasks_due': 'due_date, created_at DESC, id DESC',
+    'idx_tasks_status_due': 'status, due_date, created_at DESC, id DESC',
+    'idx_tasks_client_due': 'client_id, due_date, created_at DESC, id DESC',
+    'idx_tasks_client_status_due': 'client_id, status, due_date, created_at DESC, id DESC',
+}
+# Pesos BM25 de (title, solution, ampliacion) en la búsqueda de tareas
+TASK_SEARCH_RANK = 'bm25(10.0, 2.0, 2.0)'
+# Valores por consulta IN (...), por debajo del límite de variables de SQLite antiguos (999)
+SQL_IN_CHUNK = 500
+
+
+def _fts_query(text: str) -> str:
+    """Convierte el texto del usuario en una consulta FTS5 segura (AND de términos)"""
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def normalize_name(name: str) -> str:
+    """Clave de búsqueda de un nombre: minúsculas, sin acentos y espacios simples"""
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    without_accents = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(without_accents.lower().split())
+
+
+def _instrumented(method):
+    """Registra para /metrics la duración de cada llamada y, en las lecturas, las filas devueltas"""
+    name = method.__name__
+    reads = name.startswith(('get_', 'search_'))
+    
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        except Exception:
+            instrumentation.DB_ERRORS.inc(method=name)
+            raise
+        finally:
+            instrumentation.DB_QUERY_SECONDS.observe(time.perf_counter() - started, method=name)
+        if reads:
+            rows = len(result) if isinstance(result, list) else int(result is not None)
+            instrumentation.DB_ROWS.observe(rows, method=name)
+        return result
+    
+    return wrapper
+
 
 class Database:
     """Gestor de base de datos SQLite"""
     
     def __init__(self, db_path: str = None):
         self.db_path = db_path or config.SQLITE_PATH
+        # Una conexión por hilo, reutilizada entre llamadas
+        self._local = threading.local()
+        self.search_enabled = False
+        # Se incrementa en cada alta/baja de cliente (invalida cachés como la del parser)
+        self.clients_version = 0
+        # Transacciones confirmadas en este proceso (ver get_data_version)
+        self.local_writes = 0
+        # Cambios confirmados, para /api/events
+        self.changes = change_bus.ChangeBus()
         self.init_db()
     
-    def get_connection(self):
-        """Obtiene conexión a la base de datos"""
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self):
+        """Abre una conexión nueva con los pragmas de rendimiento"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None  # Transacciones explícitas con transaction()
+        )
         conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}')
+        conn.execute(f'PRAGMA cache_size=-{config.SQLITE_CACHE_SIZE_KB}')
+        conn.execute(f'PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}')
+        conn.execute('PRAGMA temp_store=MEMORY')
         return conn
     
+    def get_connection(self):
+        """Obtiene la conexión del hilo actual (se crea la primera vez)"""
+        conn = getattr(self._local, 'conn', None)
+        # Tras un fork (gunicorn) no se reutiliza la conexión del proceso padre
+        if conn is None or self._local.pid != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+            self._local.depth = 0
+            self._local.version_marker = None
+        return conn
+    
+    def close(self):
+        """Cierra la conexión del hilo actual"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    @contextmanager
+    def transaction(self):
+        """
+        Unidad de trabajo: todas las llamadas dentro del bloque comparten
+        conexión y transacción (commit al salir, rollback si hay excepción)
+        """
+        conn = self.get_connection()
+        if self._local.depth:
+            # Transacción anidada: se integra en la exterior
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        self._local.pending_events = []
+        self._local.clients_changed = False
+        version = None
+        try:
+            yield conn
+            if self._local.pending_events:
+                # Versión de esta escritura, leída aún con el bloqueo: después del COMMIT
+                # podría incluir escrituras de otros que no han publicado eventos
+                version = conn.execute('SELECT version FROM data_version WHERE id = 1').fetchone()[0]
+            conn.execute('COMMIT')
+            self.local_writes += 1
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            self._local.depth = 0
+            events, self._local.pending_events = self._local.pending_events, []
+        # Solo tras el COMMIT: antes, el parser podría recargar su índice sin el cliente nuevo
+        if self._local.clients_changed:
+            self.clients_version += 1
+        # Solo tras el COMMIT: un rollback descarta los eventos de la unidad de trabajo
+        if events:
+            self.changes.publish(events, version)
+    
+    def _emit(self, event_type: str, **data):
+        """Publica un cambio en self.changes cuando se confirme la transacción en curso"""
+        event = dict(data, type=event_type)
+        if self._local.depth:
+            self._local.pending_events.append(event)
+        else:
+            self.changes.publish([event], self.get_data_version())
+    
+    def _clients_changed(self):
+        """Incrementa clients_version cuando se confirme la transacción en curso"""
+        self._local.clients_changed = True
+    
     def init_db(self):
         """Inicializa las tablas si no existen"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.transaction() as conn:
+            self._create_schema(conn.cursor())
+        self._backfill_client_keys()
+        if self.search_enabled:
+            self._backfill_search('tasks', ('title', 'solution', 'ampliacion'))
+            self._backfill_search('clients', ('name',))
+        logger.info(f"Base de datos inicializada en {self.db_path}")
+    
+    def _create_schema(self, cursor):
+        """Crea tablas e índices y aplica migraciones"""
         
         # Tabla de clientes
         cursor.execute('''
@@ -55,18 +221,11 @@ class Database:
             )
         ''')
         
-        # Crear índices
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_client_id ON tasks(client_id)')
+        # Crear índices (los de tareas se crean en _migrate_schema)
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(name)')
         
-        # Migración: añadir columnas si no existen
+        # Migración: añadir columnas e índices si no existen
         self._migrate_schema(cursor)
-        
-        conn.commit()
-        conn.close()
-        logger.info(f"Base de datos inicializada en {self.db_path}")
     
     def _migrate_schema(self, cursor):
         """Migra el esquema añadiendo columnas faltantes"""
@@ -80,97 +239,493 @@ class Database:
         if 'ampliacion' not in columns:
             cursor.execute('ALTER TABLE tasks ADD COLUMN ampliacion TEXT')
             logger.info("Columna 'ampliacion' añadida a tasks")
+        
+        cursor.execute("PRAGMA table_info(clients)")
+        client_columns = [row[1] for row in cursor.fetchall()]
+        
+        if 'name_key' not in client_columns:
+            # Nombre normalizado para la búsqueda por prefijo (se rellena en _backfill_client_keys)
+            cursor.execute('ALTER TABLE clients ADD COLUMN name_key TEXT')
+            logger.info("Columna 'name_key' añadida a clients")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_clients_name_key ON clients(name_key)')
+        
+        self._migrate_task_indexes(cursor)
+        self._migrate_data_version(cursor)
+        self._migrate_task_search(cursor)
+        if self.search_enabled:
+            self._migrate_client_search(cursor)
+    
+    def _migrate_task_indexes(self, cursor):
+        """
+        Índices compuestos para cada combinación de filtros de get_tasks
+        
+        Todos terminan en el orden de las listas (due_date, created_at DESC, id DESC),
+        así que SQLite recorre el índice ya ordenado sin ordenar en un B-tree temporal.
+        Sustituyen a los índices de una sola columna, que son prefijos de estos.
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'tasks'")
+        existing = {row[0] for row in cursor.fetchall()}
+        
+        for name, columns in TASK_INDEXES.items():
+            if name not in existing:
+                cursor.execute(f'CREATE INDEX {name} ON tasks({columns})')
+                logger.info(f"Índice '{name}' creado en tasks")
+        
+        for name in ('idx_tasks_status', 'idx_tasks_due_date', 'idx_tasks_client_id'):
+            if name in existing:
+                cursor.execute(f'DROP INDEX {name}')
+                logger.info(f"Índice '{name}' eliminado (sustituido por un índice compuesto)")
+    
+    def _migrate_data_version(self, cursor):
+        """
+        Contador global de cambios en tareas y clientes
+        
+        Lo incrementan triggers, así que cuenta cualquier escritura (también de otros
+        procesos o herramientas externas). Es la base de los ETag de la API.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)')
+        for table in ('tasks', 'clients'):
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS {table}_version_{event.lower()}
+                    AFTER {event} ON {table} BEGIN
+                        UPDATE data_version SET version = version + 1 WHERE id = 1;
+                    END
+                ''')
+    
+    def _migrate_task_search(self, cursor):
+        """
+        Tabla FTS5 para buscar en título, solución y ampliación
+        
+        Se mantiene sincronizada con triggers. Guarda su propia copia del texto
+        (no es external-content) para que borrar una fila que aún no se ha
+        indexado no corrompa el índice mientras dura el backfill.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tasks_fts'")
+        if not cursor.fetchone():
+            try:
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE tasks_fts USING fts5(
+                        title, solution, ampliacion,
+                        tokenize = 'unicode61 remove_diacritics 2'
+                    )
+                ''')
+            except sqlite3.OperationalError as e:
+                logger.warning(f"FTS5 no disponible, búsqueda de tareas desactivada: {e}")
+                self.search_enabled = False
+                return
+            # Ranking por defecto (ORDER BY rank): el título pesa más que las notas
+            cursor.execute("INSERT INTO tasks_fts(tasks_fts, rank) VALUES ('rank', ?)",
+                           (TASK_SEARCH_RANK,))
+            logger.info("Tabla 'tasks_fts' creada")
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+                INSERT INTO tasks_fts (rowid, title, solution, ampliacion)
+                VALUES (new.id, new.title, new.solution, new.ampliacion);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+                DELETE FROM tasks_fts WHERE rowid = old.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS tasks_fts_update
+            AFTER UPDATE OF title, solution, ampliacion ON tasks BEGIN
+                DELETE FROM tasks_fts WHERE rowid = old.id;
+                INSERT INTO tasks_fts (rowid, title, solution, ampliacion)
+                VALUES (new.id, new.title, new.solution, new.ampliacion);
+            END
+        ''')
+        self.search_enabled = True
     
+    def _migrate_client_search(self, cursor):
+        """
+        Tabla FTS5 con los nombres de clientes para la búsqueda mientras se escribe
+        
+        Busca por prefijo de palabra ("per" encuentra "Juan Pérez") sin distinguir
+        acentos; los índices de prefijo de 2 y 3 letras sirven las primeras pulsaciones.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clients_fts'")
+        if not cursor.fetchone():
+            cursor.execute('''
+                CREATE VIRTUAL TABLE clients_fts USING fts5(
+                    name,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                )
+            ''')
+            logger.info("Tabla 'clients_fts' creada")
+        
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS clients_fts_insert AFTER INSERT ON clients BEGIN
+                INSERT INTO clients_fts (rowid, name) VALUES (new.id, new.name);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS clients_fts_delete AFTER DELETE ON clients BEGIN
+                DELETE FROM clients_fts WHERE rowid = old.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS clients_fts_update AFTER UPDATE OF name ON clients BEGIN
+                DELETE FROM clients_fts WHERE rowid = old.id;
+                INSERT INTO clients_fts (rowid, name) VALUES (new.id, new.name);
+            END
+        ''')
+    
+    def _backfill_client_keys(self, batch_size: int = 1000):
+        """Calcula name_key de los clientes creados antes de existir la columna"""
+        while True:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('SELECT id, name FROM clients WHERE name_key IS NULL LIMIT ?',
+                               (batch_size,))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                cursor.executemany('UPDATE clients SET name_key = ? WHERE id = ?',
+                                   [(normalize_name(row['name']), row['id']) for row in rows])
+    
+    def _backfill_search(self, table: str, columns: Tuple[str, ...], batch_size: int = 1000):
+        """
+        Indexa en {table}_fts las filas anteriores a la tabla FTS
+        
+        Va por lotes, cada uno en su propia transacción, para no bloquear las
+        escrituras. Si el proceso se corta, el siguiente arranque continúa.
+        """
+        column_list = ', '.join(columns)
+        placeholders = ', '.join('?' * (len(columns) + 1))
+        last_id = 0
+        total = 0
+        while True:
+            with self.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT id, {column_list} FROM {table}
+                    WHERE id > ? AND id NOT IN (SELECT rowid FROM {table}_fts)
+                    ORDER BY id
+                    LIMIT ?
+                ''', (last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                cursor.executemany(f'''
+                    INSERT INTO {table}_fts (rowid, {column_list})
+                    VALUES ({placeholders})
+                ''', [tuple(row) for row in rows])
+            last_id = rows[-1]['id']
+            total += len(rows)
+        if total:
+            logger.info(f"Índice de búsqueda: {total} filas de {table} indexadas")
+    
+    def get_data_version(self) -> int:
+        """
+        Versión actual de los datos de tareas y clientes
+        
+        Solo se lee la tabla si algo ha cambiado desde la última lectura de este
+        hilo: PRAGMA data_version cambia con los commits de otras conexiones y
+        local_writes con los de esta.
+        """
+        conn = self.get_connection()
+        # El marcador se lee antes que la versión: nunca se guarda una versión más antigua que él
+        marker = (conn.execute('PRAGMA data_version').fetchone()[0], self.local_writes)
+        if self._local.version_marker != marker:
+            row = conn.execute('SELECT version FROM data_version WHERE id = 1').fetchone()
+            self._local.data_version = row[0]
+            self._local.version_marker = marker
+        return self._local.data_version
+    
+    @_instrumented
     def add_client(self, name: str) -> int:
         """Añade un nuevo cliente"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute('INSERT INTO clients (name) VALUES (?)', (name,))
-            conn.commit()
-            client_id = cursor.lastrowid
-            logger.info(f"Cliente añadido: {name} (ID: {client_id})")
-            return client_id
-        except sqlite3.IntegrityError:
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            # OR IGNORE: un IntegrityError abortaría la unidad de trabajo que nos contiene
+            cursor.execute('INSERT OR IGNORE INTO clients (name, name_key) VALUES (?, ?)',
+                           (name, normalize_name(name)))
+            if cursor.rowcount:
+                client_id = cursor.lastrowid
+                self._clients_changed()
+                if self.changes.active:
+                    self._emit('client.created', client={'id': client_id, 'name': name})
+                logger.info(f"Cliente añadido: {name} (ID: {client_id})")
+                return client_id
             # Cliente ya existe
             cursor.execute('SELECT id FROM clients WHERE name = ?', (name,))
             result = cursor.fetchone()
             return result[0] if result else None
-        finally:
-            conn.close()
     
+    @_instrumented
     def get_client_by_name(self, name: str) -> Optional[Dict]:
         """Obtiene un cliente por nombre exacto"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM clients WHERE name = ?', (name,))
+        cursor.execute('SELECT id, name, created_at FROM clients WHERE name = ?', (name,))
         row = cursor.fetchone()
-        conn.close()
         return dict(row) if row else None
     
+    @_instrumented
     def get_client_by_id(self, client_id: int) -> Optional[Dict]:
         """Obtiene un cliente por ID"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM clients WHERE id = ?', (client_id,))
+        cursor.execute('SELECT id, name, created_at FROM clients WHERE id = ?', (client_id,))
         row = cursor.fetchone()
-        conn.close()
         return dict(row) if row else None
     
-    def search_clients(self, query: str = None) -> List[Dict]:
-        """Busca clientes (todos o filtrados)"""
+    @_instrumented
+    def search_clients(self, query: str = None, limit: int = None) -> List[Dict]:
+        """
+        Busca clientes (todos o filtrados)
+        
+        Con query, primero los nombres que empiezan por el texto (índice sobre
+        name_key) y después los que tienen alguna palabra que empieza por él
+        (índice FTS), sin distinguir acentos ni mayúsculas. Sin query, todos por nombre.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
-        if query:
-            cursor.execute('SELECT * FROM clients WHERE name LIKE ? ORDER BY name', (f'%{query}%',))
-        else:
-            cursor.execute('SELECT * FROM clients ORDER BY name')
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+        if not query:
+            sql = 'SELECT id, name, created_at FROM clients ORDER BY name'
+            params = []
+            if limit:
+                sql += ' LIMIT ?'
+                params.append(limit)
+            cursor.execute(sql, params)
+            return [dict(row) for row in cursor.fetchall()]
+        
+        key = normalize_name(query)
+        if not key:
+            return []
+        # Rango [key, key + U+FFFF) = nombres que empiezan por key
+        sql = '''
+            SELECT id, name, created_at FROM clients
+            WHERE name_key >= ? AND name_key < ?
+            ORDER BY name_key
+        '''
+        params = [key, key + '\uffff']
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit)
+        cursor.execute(sql, params)
+        clients = [dict(row) for row in cursor.fetchall()]
+        
+        if limit and len(clients) >= limit:
+            return clients
+        # Sin palabras ("-", "@@") no hay consulta FTS posible: MATCH '' es un error de sintaxis
+        match = _fts_query(query)
+        if not match or not self.search_enabled:
+            return clients
+        
+        # Coincidencias en palabras intermedias ("per" -> "Juan Pérez").
+        # Sin ORDER BY rank: FTS5 no tiene que puntuar todas las coincidencias
+        seen = {client['id'] for client in clients}
+        sql = '''
+            SELECT c.id, c.name, c.created_at FROM clients_fts
+            JOIN clients c ON c.id = clients_fts.rowid
+            WHERE clients_fts MATCH ?
+        '''
+        params = [match]
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(limit + len(seen))
+        cursor.execute(sql, params)
+        for row in cursor.fetchall():
+            if row['id'] not in seen:
+                clients.append(dict(row))
+        return clients[:limit] if limit else clients
     
+    @_instrumented
     def add_task(self, title: str, client_id: int = None, due_date: str = None, 
                  priority: str = 'normal') -> int:
         """Añade una nueva tarea"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO tasks (title, client_id, due_date, priority)
-            VALUES (?, ?, ?, ?)
-        ''', (title, client_id, due_date, priority))
-        conn.commit()
-        task_id = cursor.lastrowid
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO tasks (title, client_id, due_date, priority)
+                VALUES (?, ?, ?, ?)
+            ''', (title, client_id, due_date, priority))
+            task_id = cursor.lastrowid
+            if self.changes.active:
+                self._emit('task.created', task=self.get_task_by_id(task_id))
         logger.info(f"Tarea añadida: {title} (ID: {task_id})")
         return task_id
     
-    def get_tasks(self, status: str = None, client_id: int = None, 
-                  due_date: str = None, limit: int = None) -> List[Dict]:
-        """Obtiene tareas con filtros"""
+    @_instrumented
+    def ensure_clients(self, names: List[str]) -> Dict[str, int]:
+        """
+        IDs de varios clientes por nombre, creando los que no existan
+        
+        Mismo criterio que create_task (nombre exacto), pero con una consulta por
+        bloque de nombres y un único executemany para las altas.
+        
+        Returns:
+            Dict nombre -> id
+        """
+        names = list(dict.fromkeys(name for name in names if name))
+        if not names:
+            return {}
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            ids = self._client_ids_by_name(cursor, names)
+            missing = [name for name in names if name not in ids]
+            if missing:
+                cursor.executemany('INSERT OR IGNORE INTO clients (name, name_key) VALUES (?, ?)',
+                                   [(name, normalize_name(name)) for name in missing])
+                created = self._client_ids_by_name(cursor, missing)
+                ids.update(created)
+                self._clients_changed()
+                if self.changes.active:
+                    for name, client_id in created.items():
+                        self._emit('client.created', client={'id': client_id, 'name': name})
+                logger.info(f"Clientes añadidos: {len(created)}")
+        return ids
+    
+    @_instrumented
+    def get_client_ids(self, client_ids: List[int]) -> List[int]:
+        """Los IDs de la lista que corresponden a clientes existentes"""
         conn = self.get_connection()
         cursor = conn.cursor()
+        found = []
+        for start in range(0, len(client_ids), SQL_IN_CHUNK):
+            chunk = client_ids[start:start + SQL_IN_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT id FROM clients WHERE id IN ({placeholders})', chunk)
+            found.extend(row['id'] for row in cursor.fetchall())
+        return found
+    
+    def _client_ids_by_name(self, cursor, names: List[str]) -> Dict[str, int]:
+        ids = {}
+        for start in range(0, len(names), SQL_IN_CHUNK):
+            chunk = names[start:start + SQL_IN_CHUNK]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f'SELECT id, name FROM clients WHERE name IN ({placeholders})', chunk)
+            ids.update((row['name'], row['id']) for row in cursor.fetchall())
+        return ids
+    
+    @_instrumented
+    def add_tasks_bulk(self, tasks: List[Dict]) -> List[int]:
+        """
+        Inserta muchas tareas con un solo executemany
         
-        query = '''
-            SELECT t.*, c.name as client_name
-            FROM tasks t
-            LEFT JOIN clients c ON t.client_id = c.id
-            WHERE 1=1
-        '''
+        Args:
+            tasks: Dicts con title y opcionalmente client_id, due_date, priority,
+                status, solution, ampliacion, created_at y completed_at
+        
+        Returns:
+            IDs asignados, en el mismo orden que tasks
+        """
+        if not tasks:
+            return []
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany('''
+                INSERT INTO tasks (title, client_id, due_date, priority, status,
+                                   solution, ampliacion, created_at, completed_at)
+                VALUES (?, ?, ?, COALESCE(?, 'normal'), COALESCE(?, 'pending'),
+                        ?, ?, COALESCE(?, CURRENT_TIMESTAMP), ?)
+            ''', [(t['title'], t.get('client_id'), t.get('due_date'), t.get('priority'),
+                   t.get('status'), t.get('solution'), t.get('ampliacion'),
+                   t.get('created_at'), t.get('completed_at')) for t in tasks])
+            # Con AUTOINCREMENT y el bloqueo de escritura tomado los IDs son consecutivos
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+            last_id = cursor.fetchone()[0]
+            task_ids = list(range(last_id - len(tasks) + 1, last_id + 1))
+            if self.changes.active:
+                # Un solo evento: miles de task.created desbordarían a los suscriptores
+                self._emit('tasks.imported', count=len(task_ids),
+                           first_id=task_ids[0], last_id=task_ids[-1])
+        logger.info(f"Tareas importadas: {len(task_ids)}")
+        return task_ids
+    
+    def iter_tasks(self, status: str = None, client_id: int = None,
+                   batch_size: int = 500):
+        """
+        Recorre todas las tareas en el orden de get_tasks, de batch_size en
+        batch_size (paginación keyset), sin cargarlas todas en memoria
+        """
+        after = None
+        while True:
+            tasks = self.get_tasks(status=status, client_id=client_id,
+                                   limit=batch_size, after=after)
+            yield from tasks
+            if len(tasks) < batch_size:
+                return
+            after = tuple(tasks[-1][key] for key in TASK_SORT_KEY)
+    
+    def _task_filters(self, status: str = None, client_id: int = None,
+                      due_date: str = None) -> Tuple[str, list]:
+        """Cláusula WHERE común a get_tasks y count_tasks"""
+        where = 'WHERE 1=1'
         params = []
         
         if status:
-            query += ' AND t.status = ?'
+            where += ' AND t.status = ?'
             params.append(status)
         
         if client_id:
-            query += ' AND t.client_id = ?'
+            where += ' AND t.client_id = ?'
             params.append(client_id)
         
         if due_date:
-            query += ' AND t.due_date = ?'
+            where += ' AND t.due_date = ?'
             params.append(due_date)
         
-        query += ' ORDER BY t.due_date ASC, t.created_at DESC'
+        return where, params
+    
+    @_instrumented
+    def get_tasks(self, status: str = None, client_id: int = None, 
+                  due_date: str = None, limit: int = None, fields: List[str] = None,
+                  after: Tuple = None) -> List[Dict]:
+        """
+        Obtiene tareas con filtros
+        
+        Args:
+            limit: Número máximo de tareas
+            fields: Campos a devolver (de TASK_FIELDS); None = todos
+            after: Clave (due_date, created_at, id) de la última tarea de la
+                página anterior; se devuelven las siguientes (paginación keyset)
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        if fields:
+            # Las columnas de orden se leen siempre para poder construir el cursor
+            selected = list(dict.fromkeys(list(TASK_SORT_KEY) + [f for f in fields if f in TASK_FIELDS]))
+        else:
+            selected = list(TASK_FIELDS)
+        columns = ', '.join('c.name as client_name' if f == 'client_name' else f't.{f}'
+                            for f in selected)
+        join = 'LEFT JOIN clients c ON t.client_id = c.id' if 'client_name' in selected else ''
+        
+        where, params = self._task_filters(status, client_id, due_date)
+        query = f'''
+            SELECT {columns}
+            FROM tasks t
+            {join}
+            {where}
+        '''
+        
+        if after:
+            after_due_date, after_created_at, after_id = after
+            # Mismo orden que ORDER BY: due_date ASC (NULL primero), created_at DESC, id DESC
+            next_in_group = '(t.created_at < ? OR (t.created_at = ? AND t.id < ?))'
+            if after_due_date is None:
+                query += f' AND (t.due_date IS NOT NULL OR (t.due_date IS NULL AND {next_in_group}))'
+                params.extend([after_created_at, after_created_at, after_id])
+            else:
+                query += f' AND (t.due_date > ? OR (t.due_date = ? AND {next_in_group}))'
+                params.extend([after_due_date, after_due_date,
+                               after_created_at, after_created_at, after_id])
+        
+        query += ' ORDER BY t.due_date ASC, t.created_at DESC, t.id DESC'
         
         if limit:
             query += ' LIMIT ?'
@@ -178,7 +733,6 @@ class Database:
         
         cursor.execute(query, params)
         rows = cursor.fetchall()
-        conn.close()
         
         tasks = []
         for row in rows:
@@ -194,6 +748,17 @@ class Database:
         
         return tasks
     
+    @_instrumented
+    def count_tasks(self, status: str = None, client_id: int = None,
+                    due_date: str = None) -> int:
+        """Cuenta las tareas que cumplen los filtros"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        where, params = self._task_filters(status, client_id, due_date)
+        cursor.execute(f'SELECT COUNT(*) FROM tasks t {where}', params)
+        return cursor.fetchone()[0]
+    
+    @_instrumented
     def get_task_by_id(self, task_id: int) -> Optional[Dict]:
         """Obtiene una tarea por ID"""
         conn = self.get_connection()
@@ -205,7 +770,6 @@ class Database:
             WHERE t.id = ?
         ''', (task_id,))
         row = cursor.fetchone()
-        conn.close()
         if row:
             task = dict(row)
             if task.get('due_date'):
@@ -217,6 +781,50 @@ class Database:
             return task
         return None
     
+    @_instrumented
+    def search_tasks(self, query: str, status: str = None, limit: int = 20) -> List[Dict]:
+        """
+        Búsqueda de texto completo en título, solución y ampliación
+        
+        Los resultados van ordenados por relevancia (BM25) e incluyen
+        title_highlight y snippet con los términos marcados con <mark>.
+        La última palabra se busca como prefijo (búsqueda mientras se escribe).
+        """
+        match = _fts_query(query)
+        if not match or not self.search_enabled:
+            return []
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        sql = '''
+            SELECT t.id, t.title, t.client_id, c.name as client_name, t.due_date,
+                   t.priority, t.status,
+                   highlight(tasks_fts, 0, '<mark>', '</mark>') as title_highlight,
+                   snippet(tasks_fts, -1, '<mark>', '</mark>', '…', 12) as snippet
+            FROM tasks_fts
+            JOIN tasks t ON t.id = tasks_fts.rowid
+            LEFT JOIN clients c ON t.client_id = c.id
+            WHERE tasks_fts MATCH ?
+        '''
+        params = [match]
+        
+        if status:
+            sql += ' AND t.status = ?'
+            params.append(status)
+        
+        sql += ' ORDER BY rank LIMIT ?'
+        params.append(limit)
+        
+        cursor.execute(sql, params)
+        tasks = []
+        for row in cursor.fetchall():
+            task = dict(row)
+            if task.get('due_date'):
+                task['due_date'] = str(task['due_date'])
+            tasks.append(task)
+        return tasks
+    
+    @_instrumented
     def update_task(self, task_id: int, **kwargs) -> bool:
         """Actualiza una tarea"""
         allowed_fields = ['title', 'client_id', 'due_date', 'priority', 'status', 
@@ -226,15 +834,18 @@ class Database:
         if not updates:
             return False
         
-        conn = self.get_connection()
-        cursor = conn.cursor()
         set_clause = ', '.join([f'{k} = ?' for k in updates.keys()])
         values = list(updates.values()) + [task_id]
-        cursor.execute(f'UPDATE tasks SET {set_clause} WHERE id = ?', values)
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
-        logger.info(f"Tarea {task_id} actualizada: {updates}")
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'UPDATE tasks SET {set_clause} WHERE id = ?', values)
+            success = cursor.rowcount > 0
+            if success and self.changes.active:
+                # Diff de la tarea: solo los campos modificados
+                self._emit('task.updated', id=task_id, changes=updates)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Tarea %s actualizada: %s", task_id, updates,
+                        extra={'task_id': task_id, 'fields': sorted(updates)})
         return success
     
     def complete_task(self, task_id: int) -> bool:
@@ -242,31 +853,34 @@ class Database:
         return self.update_task(task_id, status='completed', 
                                completed_at=datetime.now().isoformat())
     
+    @_instrumented
     def delete_task(self, task_id: int) -> bool:
         """Elimina una tarea"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+            success = cursor.rowcount > 0
+            if success and self.changes.active:
+                self._emit('task.deleted', id=task_id)
         logger.info(f"Tarea {task_id} eliminada")
         return success
     
+    @_instrumented
     def delete_client(self, client_id: int) -> bool:
         """Elimina un cliente (solo si no tiene tareas)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        # Verificar si tiene tareas
-        cursor.execute('SELECT COUNT(*) FROM tasks WHERE client_id = ?', (client_id,))
-        count = cursor.fetchone()[0]
-        if count > 0:
-            conn.close()
-            return False
-        cursor.execute('DELETE FROM clients WHERE id = ?', (client_id,))
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            # Verificar si tiene tareas
+            cursor.execute('SELECT COUNT(*) FROM tasks WHERE client_id = ?', (client_id,))
+            count = cursor.fetchone()[0]
+            if count > 0:
+                return False
+            cursor.execute('DELETE FROM clients WHERE id = ?', (client_id,))
+            success = cursor.rowcount > 0
+            if success:
+                self._clients_changed()
+                if self.changes.active:
+                    self._emit('client.deleted', id=client_id)
         logger.info(f"Cliente {client_id} eliminado")
         return success
 
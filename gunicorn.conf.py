@@ -0,0 +1,70 @@
+"""
+Configuración de gunicorn
+Calienta el modelo Whisper en cada worker nada más arrancar y, en modo remoto,
+lanza el servidor de transcripción compartido
+"""
+import os
+import subprocess
+import sys
+import threading
+
+_transcription_server = None
+_server_lock = threading.Lock()
+_stopping = threading.Event()
+
+
+def on_starting(server):
+    """En TRANSCRIPTION_MODE=remote arranca un único proceso dueño del modelo y lo vigila"""
+    import config
+    if config.TRANSCRIPTION_MODE != 'remote' or not config.TRANSCRIPTION_SERVER_AUTOSTART:
+        return
+    if config.SECRET_KEY == config.DEFAULT_SECRET_KEY:
+        raise RuntimeError("TRANSCRIPTION_MODE=remote requiere definir SECRET_KEY")
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'transcription_server.py')
+    threading.Thread(
+        target=_supervise,
+        args=(server, script, config.TRANSCRIPTION_SERVER_RESTART_DELAY_SECONDS),
+        name='transcription-server-supervisor',
+        daemon=True
+    ).start()
+
+
+def _supervise(server, script, restart_delay):
+    """Relanza el servidor de transcripción si termina mientras gunicorn sigue en marcha"""
+    global _transcription_server
+    while True:
+        with _server_lock:
+            if _stopping.is_set():
+                return
+            _transcription_server = subprocess.Popen([sys.executable, script])
+        server.log.info(f"Servidor de transcripción lanzado (pid {_transcription_server.pid})")
+        code = _transcription_server.wait()
+        if _stopping.is_set():
+            return
+        server.log.error(f"Servidor de transcripción terminado (código {code}), "
+                         f"se relanza en {restart_delay}s")
+        _stopping.wait(restart_delay)
+
+
+def on_exit(server):
+    with _server_lock:
+        _stopping.set()
+    if _transcription_server and _transcription_server.poll() is None:
+        _transcription_server.terminate()
+        try:
+            _transcription_server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _transcription_server.kill()
+
+
+def post_fork(server, worker):
+    """Carga el modelo en segundo plano; /healthz devuelve 503 hasta que esté listo"""
+    import config
+    if not config.WHISPER_WARMUP:
+        return
+
+    import audio_pipeline
+    audio_pipeline.warm_up_in_background(
+        on_error=lambda e: server.log.warning(f"Worker {worker.pid}: no se pudo calentar el modelo: {e}")
+    )
@@ -0,0 +1,179 @@
+"""
+Métricas internas en formato Prometheus
+Contadores e histogramas en memoria, sin dependencias, que se exponen en /metrics.
+Registrar una observación es una búsqueda binaria y una suma bajo un lock, así que
+se pueden dejar activas en producción.
+
+Con gunicorn cada worker tiene sus propias métricas; /metrics devuelve las del
+worker que atiende la petición, con la etiqueta `pid` para distinguirlos.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+# Duraciones en segundos
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+ROW_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000)
+# Segundos de audio por segundo de reloj (>1 = más rápido que tiempo real)
+REALTIME_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32, 64)
+
+_registry: List['_Metric'] = []
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, pid: str, extra: Tuple = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra) + [('pid', pid)]
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def render(self, pid: str) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+            lines += self._render_items(items, pid)
+        return lines
+
+    def _render_items(self, items, pid: str) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Contador que solo crece"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _render_items(self, items, pid: str) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labels, key, pid)} {_format_number(value)}'
+                for key, value in items]
+
+
+class Histogram(_Metric):
+    """Histograma con buckets fijos (acumulados al exponerlo, como espera Prometheus)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [conteos por bucket (+Inf al final), suma, total]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observa la duración del bloque en segundos"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _render_items(self, items, pid: str) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, pid, (('le', _format_number(bound)),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, key, pid)
+            lines.append(f'{self.name}_sum{labels} {_format_number(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+def render() -> str:
+    """Todas las métricas en el formato de texto de Prometheus"""
+    # El pid se toma al exponer: con preload_app el módulo se importa antes del fork
+    pid = str(os.getpid())
+    lines = []
+    for metric in _registry:
+        lines += metric.render(pid)
+    return '\n'.join(lines) + '\n'
+
+
+HTTP_REQUESTS = Counter(
+    'agenteweb_http_requests_total', 'Peticiones HTTP por ruta, método y código',
+    ('route', 'method', 'status')
+)
+HTTP_ERRORS = Counter(
+    'agenteweb_http_errors_total', 'Peticiones HTTP con error 5xx o excepción no capturada',
+    ('route', 'method')
+)
+HTTP_SECONDS = Histogram(
+    'agenteweb_http_request_seconds', 'Duración de las peticiones HTTP por ruta',
+    ('route', 'method')
+)
+AUDIO_STAGE_SECONDS = Histogram(
+    'agenteweb_audio_stage_seconds',
+    'Duración de cada etapa del pipeline de audio (upload, probe, decode, vad, '
+    'model_load, transcribe, parse)',
+    ('stage',)
+)
+TRANSCRIBE_SECONDS = Histogram(
+    'agenteweb_transcribe_seconds', 'Duración de transcribe_audio', ('backend',)
+)
+TRANSCRIBE_REALTIME_FACTOR = Histogram(
+    'agenteweb_transcribe_realtime_factor',
+    'Segundos de audio transcritos por segundo de reloj', ('backend',), buckets=REALTIME_BUCKETS
+)
+TRANSCRIBED_AUDIO_SECONDS = Counter(
+    'agenteweb_transcribed_audio_seconds_total', 'Segundos de audio transcritos', ('backend',)
+)
+PARSE_SECONDS = Histogram(
+    'agenteweb_parse_seconds', 'Duración de IntentParser.parse por texto', ('intent',),
+    buckets=FAST_BUCKETS
+)
+DB_QUERY_SECONDS = Histogram(
+    'agenteweb_db_query_seconds', 'Duración de los métodos de Database', ('method',),
+    buckets=FAST_BUCKETS
+)
+DB_ROWS = Histogram(
+    'agenteweb_db_rows', 'Filas devueltas por los métodos de lectura de Database', ('method',),
+    buckets=ROW_BUCKETS
+)
+DB_ERRORS = Counter(
+    'agenteweb_db_errors_total', 'Excepciones en los métodos de Database', ('method',)
+)
@@ -0,0 +1,143 @@
+"""
+Configuración de logging
+Los hilos de las peticiones solo encolan el registro (QueueHandler); un hilo en
+segundo plano lo formatea (texto o JSON por línea) y lo escribe. Los eventos
+frecuentes se pueden muestrear por logger y cada línea lleva el ID de la
+petición que la originó.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional
+import config
+
+# ID de la petición en curso (lo fija app.py; los trabajos en segundo plano lo heredan)
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+TEXT_FORMAT = '[%(levelname)s] %(message)s'
+
+# Atributos propios de LogRecord: lo demás son campos pasados con extra={...}
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro, con los campos de extra={...} al mismo nivel"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry['request_id'] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar solo una fracción de los registros por debajo de WARNING de los
+    loggers configurados ({'parser': 0.1} = 1 de cada 10). Avisos y errores
+    siempre pasan.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.name)
+        if rate is None:
+            # 'database' también se aplica a 'database.algo'
+            for name, value in self.rates.items():
+                if record.name.startswith(name + '.'):
+                    rate = value
+                    break
+        return rate is None or random.random() < rate
+
+
+class _AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Encola el registro sin formatearlo: el mensaje y la traza se construyen en el
+    hilo del listener. Solo se fija aquí el ID de petición, que depende del hilo.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        return record
+
+
+class _RequestIdFilter(logging.Filter):
+    """Añade el ID de petición cuando el logging es síncrono"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def parse_sampling(value: str) -> Dict[str, float]:
+    """'parser=0.1,database=0.05' -> {'parser': 0.1, 'database': 0.05}"""
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        name, rate = item.split('=', 1)
+        rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+
+def _start_listener(log_queue: queue.Queue, handler: logging.Handler):
+    global _listener
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    """Vacía la cola antes de salir para no perder los últimos registros"""
+    if _listener is not None:
+        _listener.stop()
+
+
+def configure_logging():
+    """Configura el logging raíz según LOG_LEVEL, LOG_FORMAT, LOG_ASYNC y LOG_SAMPLING"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.setLevel(config.LOG_LEVEL)
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if config.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    if config.LOG_ASYNC:
+        log_queue = queue.SimpleQueue()
+        handler = _AsyncQueueHandler(log_queue)
+        _start_listener(log_queue, output)
+        atexit.register(_stop_listener)
+        # El hilo del listener no sobrevive a un fork (gunicorn con preload_app)
+        os.register_at_fork(after_in_child=lambda: _start_listener(log_queue, output))
+    else:
+        handler = output
+        handler.addFilter(_RequestIdFilter())
+
+    rates = parse_sampling(config.LOG_SAMPLING)
+    if rates:
+        # El filtro va en el handler de entrada: lo descartado ni siquiera se encola
+        handler.addFilter(SamplingFilter(rates))
+    root.addHandler(handler)
@@ -3,44 +3,89 @@ Parser de intenciones y extracción de entidades
 Detecta intenciones y extrae información de texto en español
 """
 import re
+import time
 import logging
-from typing import Dict, Optional, Tuple
-from datetime import datetime, timedelta
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from datetime import date, datetime
 import dateparser
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 import config
 import database
+import instrumentation
+import spanish_dates
 
 logger = logging.getLogger(__name__)
 
 
+# Con menos textos por proceso no compensa arrancar procesos hijos
+PARALLEL_MIN_TEXTS_PER_PROCESS = 200
+
+_batch_parser = None
+
+
+def _init_batch_worker(db_path: str):
+    """Inicializa el parser de cada proceso hijo de parse_many"""
+    global _batch_parser
+    _batch_parser = IntentParser(database.Database(db_path))
+
+
+def _parse_batch_chunk(texts: List[str], today: date) -> List[Dict]:
+    return _batch_parser.parse_many(texts, today=today)
+
+
+def _alternation(words) -> str:
+    """Alternativa regex con las palabras escapadas, las más largas primero"""
+    return '|'.join(re.escape(word) for word in sorted(set(words), key=len, reverse=True))
+
+
 class IntentParser:
     """Parser de intenciones y entidades"""
     
-    # Patrones de intenciones
-    INTENT_PATTERNS = {
+    # Reglas de intenciones: (palabras iniciales, palabras finales), equivale al
+    # patrón r'\b(inicial)\b.*\b(final)\b'. Todas se evalúan en un solo recorrido
+    INTENT_RULES = {
         'CREAR': [
-            r'\b(crear|nueva|nuevo|añadir|agregar|añade|agrega)\b.*\b(tarea|recordar|recordatorio|recordarme)\b',
-            r'\b(tarea|recordar|recordatorio)\b.*\b(crear|nueva|nuevo|añadir|agregar)\b',
+            (('crear', 'nueva', 'nuevo', 'añadir', 'agregar', 'añade', 'agrega'),
+             ('tarea', 'recordar', 'recordatorio', 'recordarme')),
+            (('tarea', 'recordar', 'recordatorio'),
+             ('crear', 'nueva', 'nuevo', 'añadir', 'agregar')),
         ],
         'LISTAR': [
-            r'\b(listar|mostrar|ver|muestra|muéstrame|listar|lista)\b.*\b(tarea|tareas|pendiente|pendientes)\b',
-            r'\b(tarea|tareas)\b.*\b(pendiente|pendientes|hoy|mañana|semana)\b',
+            (('listar', 'mostrar', 'ver', 'muestra', 'muéstrame', 'lista'),
+             ('tarea', 'tareas', 'pendiente', 'pendientes')),
+            (('tarea', 'tareas'),
+             ('pendiente', 'pendientes', 'hoy', 'mañana', 'semana')),
         ],
         'CERRAR': [
-            r'\b(cerrar|completar|hecha|terminada|terminar|completa|da por hecha|marcar como)\b.*\b(tarea|tareas)\b',
-            r'\b(tarea|tareas)\b.*\b(cerrar|completar|hecha|terminada)\b',
+            (('cerrar', 'completar', 'hecha', 'terminada', 'terminar', 'completa', 'da por hecha', 'marcar como'),
+             ('tarea', 'tareas')),
+            (('tarea', 'tareas'),
+             ('cerrar', 'completar', 'hecha', 'terminada')),
         ],
         'REPROGRAMAR': [
-            r'\b(cambiar|mover|reprogramar|posponer|adelantar)\b.*\b(fecha|tarea)\b',
-            r'\b(fecha)\b.*\b(cambiar|mover|reprogramar)\b',
+            (('cambiar', 'mover', 'reprogramar', 'posponer', 'adelantar'),
+             ('fecha', 'tarea')),
+            (('fecha',),
+             ('cambiar', 'mover', 'reprogramar')),
         ],
         'AMPLIAR': [
-            r'\b(ampliar|ampliación|amplía|añadir|agregar)\b.*\b(tarea|información|detalle)\b',
-            r'\b(tarea)\b.*\b(ampliar|ampliación|amplía)\b',
+            (('ampliar', 'ampliación', 'amplía', 'añadir', 'agregar'),
+             ('tarea', 'información', 'detalle')),
+            (('tarea',),
+             ('ampliar', 'ampliación', 'amplía')),
         ],
     }
     
+    # Todas las palabras de las reglas en una sola expresión. El lookahead permite
+    # encontrar coincidencias solapadas ("da por hecha" y "hecha")
+    INTENT_KEYWORDS_RE = re.compile(
+        r'(?=\b(' + _alternation(word for rules in INTENT_RULES.values()
+                                  for rule in rules for words in rule for word in words) + r')\b)',
+        re.IGNORECASE
+    )
+    
     # Palabras clave de prioridad
     PRIORITY_KEYWORDS = {
         'urgent': ['urgente', 'urgent', 'inmediato', 'inmediata', 'ya', 'ahora'],
@@ -50,12 +95,40 @@ class IntentParser:
     
     # Patrones para detectar cliente
     CLIENT_PATTERNS = [
-        r'\b(?:cliente|del cliente|para el cliente|con el cliente)\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ\s]+)',
-        r'\bcliente\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ\s]+)',
+        re.compile(r'\b(?:cliente|del cliente|para el cliente|con el cliente)\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ\s]+)',
+                   re.IGNORECASE),
+        re.compile(r'\bcliente\s+([A-ZÁÉÍÓÚÑ][a-záéíóúñ\s]+)', re.IGNORECASE),
     ]
     
+    TASK_ID_RE = re.compile(r'\b(tarea|tareas)\s+(\d+)')
+    
+    # Palabras que se quitan del título. El cliente se quita entre las de intención y
+    # las de fecha/prioridad, como siempre: "cliente crear acme" solo casa tras quitar
+    # "crear", y el nombre no acaba en \b, así que al quitarlo puede dejar suelta otra palabra
+    TITLE_INTENT_RE = re.compile(
+        r'\b(?:' + _alternation([
+            'crear', 'nueva', 'nuevo', 'añadir', 'agregar', 'tarea', 'recordar', 'recordatorio',
+        ]) + r')\b',
+        re.IGNORECASE
+    )
+    # "pasado mañana" pierde solo "mañana" ("pasado" queda en el título)
+    TITLE_DATE_PRIORITY_RE = re.compile(
+        r'\b(?:' + _alternation([
+            'hoy', 'mañana', 'ayer', 'lunes', 'martes', 'miércoles', 'jueves',
+            'viernes', 'sábado', 'domingo',
+            'urgente', 'importante', 'alta', 'baja', 'prioridad',
+        ]) + r')\b',
+        re.IGNORECASE
+    )
+    DOUBLE_A_RE = re.compile(r'\ba\s+a\b', re.IGNORECASE)
+    
     def __init__(self, db: database.Database = None):
         self.db = db or database.Database()
+        # Índice de clientes: (versión, instante de carga, nombres normalizados, clientes, por nombre)
+        self._client_index = None
+        self._client_index_lock = threading.Lock()
+        # Fechas ya extraídas durante el parse() en curso (por hilo)
+        self._local = threading.local()
     
     def parse(self, text: str) -> Dict:
         """
@@ -67,9 +140,69 @@ class IntentParser:
             - confidence: float (0-1)
             - entities: dict con cliente, fecha, prioridad, título
         """
-        text = text.lower().strip()
-        logger.info(f"Parseando texto: {text}")
+        return self._parse_text(text, date.today(), logging.INFO)
+    
+    def parse_many(self, texts: List[str], processes: int = 1,
+                   today: date = None) -> List[Dict]:
+        """
+        Parsea un lote de textos (transcripciones históricas, benchmarks)
+        
+        El índice de clientes y la fecha de referencia se preparan una sola vez
+        para todo el lote y cada resultado se registra a nivel DEBUG.
+        
+        Args:
+            texts: Textos a parsear
+            processes: Procesos a usar; con más de 1 el lote se reparte entre
+                procesos hijos, cada uno con su propia conexión e índice
+            today: Fecha de referencia para las fechas relativas (por defecto, hoy)
         
+        Returns:
+            Resultados en el mismo orden que texts
+        """
+        today = today or date.today()
+        start = time.perf_counter()
+        
+        if processes > 1 and len(texts) >= processes * PARALLEL_MIN_TEXTS_PER_PROCESS:
+            chunk_size = -(-len(texts) // processes)
+            chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_batch_worker,
+                                     initargs=(self.db.db_path,)) as executor:
+                results = [result for chunk_results in executor.map(_parse_batch_chunk, chunks,
+                                                                    [today] * len(chunks))
+                           for result in chunk_results]
+        else:
+            self._get_client_index()
+            results = [self._parse_text(text, today, logging.DEBUG) for text in texts]
+        
+        elapsed = time.perf_counter() - start
+        logger.info(f"Lote parseado: {len(texts)} textos en {elapsed:.3f}s")
+        return results
+    
+    def _parse_text(self, text: str, today: date, log_level: int) -> Dict:
+        """Parsea un texto con la fecha de referencia dada"""
+        text = text.lower().strip()
+        # En el camino caliente: sin construir mensajes si el nivel está desactivado
+        log_enabled = logger.isEnabledFor(log_level)
+        if log_enabled:
+            logger.log(log_level, "Parseando texto: %s", text)
+        
+        self._local.dates = {}
+        self._local.today = today
+        started = time.perf_counter()
+        try:
+            result = self._parse(text)
+        finally:
+            self._local.dates = None
+            self._local.today = None
+        instrumentation.PARSE_SECONDS.observe(time.perf_counter() - started, intent=result['intent'])
+        
+        if log_enabled:
+            logger.log(log_level, "Resultado del parseo: %s", result,
+                       extra={'intent': result['intent'], 'confidence': result['confidence']})
+        return result
+    
+    def _parse(self, text: str) -> Dict:
+        """Cuerpo de parse() con el texto ya normalizado"""
         # Detectar intención
         intent, confidence = self._detect_intent(text)
         
@@ -86,29 +219,23 @@ class IntentParser:
         elif intent == 'AMPLIAR':
             entities = self._extract_ampliar_entities(text)
         
-        result = {
+        return {
             'intent': intent,
             'confidence': confidence,
             'entities': entities,
             'original_text': text
         }
-        
-        logger.info(f"Resultado del parseo: {result}")
-        return result
     
     def _detect_intent(self, text: str) -> Tuple[str, float]:
         """Detecta la intención principal"""
         best_intent = 'UNKNOWN'
         best_confidence = 0.0
         
-        for intent, patterns in self.INTENT_PATTERNS.items():
-            for pattern in patterns:
-                match = re.search(pattern, text, re.IGNORECASE)
-                if match:
-                    confidence = len(match.group()) / len(text)
-                    if confidence > best_confidence:
-                        best_confidence = confidence
-                        best_intent = intent
+        for intent, match_length in self._score_intents(text):
+            confidence = match_length / len(text)
+            if confidence > best_confidence:
+                best_confidence = confidence
+                best_intent = intent
         
         # Si no hay match claro, intentar inferir por palabras clave
         if best_intent == 'UNKNOWN':
@@ -138,6 +265,41 @@ class IntentParser:
         
         return best_intent, best_confidence
     
+    def _score_intents(self, text: str):
+        """
+        Longitud de la coincidencia de cada regla de INTENT_RULES (en su orden)
+        
+        Un único recorrido localiza todas las palabras clave; para cada regla la
+        coincidencia va desde la primera palabra inicial que tiene detrás una final
+        hasta la última palabra final, igual que r'\b(A)\b.*\b(B)\b'.
+        """
+        # '.' no cruza saltos de línea: vale la primera línea con coincidencia, como en re.search
+        lines = [[(m.start(), m.start() + len(m.group(1)), m.group(1))
+                  for m in self.INTENT_KEYWORDS_RE.finditer(line)]
+                 for line in text.split('\n')]
+        
+        for intent, rules in self.INTENT_RULES.items():
+            for first_words, last_words in rules:
+                best = 0
+                for occurrences in lines:
+                    last = None
+                    for occurrence in reversed(occurrences):
+                        if occurrence[2] in last_words:
+                            last = occurrence
+                            break
+                    if last is None:
+                        continue
+                    for start, end, word in occurrences:
+                        if start >= last[0]:
+                            break
+                        if word in first_words and end <= last[0]:
+                            best = last[1] - start
+                            break
+                    if best:
+                        break
+                if best:
+                    yield intent, best
+    
     def _extract_create_entities(self, text: str) -> Dict:
         """Extrae entidades para crear tarea"""
         entities = {}
@@ -190,7 +352,7 @@ class IntentParser:
             entities['client'] = client
         
         # Buscar número de tarea
-        task_id_match = re.search(r'\b(tarea|tareas)\s+(\d+)', text)
+        task_id_match = self.TASK_ID_RE.search(text)
         if task_id_match:
             entities['task_id'] = int(task_id_match.group(2))
         
@@ -210,7 +372,7 @@ class IntentParser:
         if client:
             entities['client'] = client
         
-        task_id_match = re.search(r'\b(tarea|tareas)\s+(\d+)', text)
+        task_id_match = self.TASK_ID_RE.search(text)
         if task_id_match:
             entities['task_id'] = int(task_id_match.group(2))
         
@@ -221,7 +383,7 @@ class IntentParser:
         entities = {}
         
         # Extraer ID de tarea
-        task_id_match = re.search(r'\b(tarea|tareas)\s+(\d+)', text)
+        task_id_match = self.TASK_ID_RE.search(text)
         if task_id_match:
             entities['task_id'] = int(task_id_match.group(2))
         
@@ -231,7 +393,7 @@ class IntentParser:
         """Extrae información del cliente con fuzzy matching"""
         # Buscar patrón "cliente X"
         for pattern in self.CLIENT_PATTERNS:
-            match = re.search(pattern, text, re.IGNORECASE)
+            match = pattern.search(text)
             if match:
                 client_name = match.group(1).strip()
                 return self._fuzzy_match_client(client_name)
@@ -259,50 +421,87 @@ class IntentParser:
         
         return None
     
+    def _get_client_index(self) -> Tuple[list, list, Dict]:
+        """
+        Nombres normalizados de los clientes, cargados una vez y reutilizados
+        
+        Se recarga cuando cambia db.clients_version (altas y bajas en este proceso)
+        o pasado PARSER_CLIENT_INDEX_TTL_SECONDS (cambios hechos por otros workers)
+        """
+        index = self._client_index
+        if (index is not None and index[0] == self.db.clients_version
+                and time.monotonic() - index[1] < config.PARSER_CLIENT_INDEX_TTL_SECONDS):
+            return index[2], index[3], index[4]
+        
+        with self._client_index_lock:
+            index = self._client_index
+            if (index is None or index[0] != self.db.clients_version
+                    or time.monotonic() - index[1] >= config.PARSER_CLIENT_INDEX_TTL_SECONDS):
+                version = self.db.clients_version
+                clients = self.db.search_clients()
+                keys = [database.normalize_name(client['name']) for client in clients]
+                by_key = {key: client for key, client in zip(keys, clients)}
+                index = (version, time.monotonic(), keys, clients, by_key)
+                self._client_index = index
+                logger.debug(f"Índice de clientes del parser cargado ({len(clients)} clientes)")
+        return index[2], index[3], index[4]
+    
     def _fuzzy_match_client(self, name: str) -> Optional[Dict]:
         """Busca cliente con fuzzy matching"""
-        clients = self.db.search_clients()
+        keys, clients, by_key = self._get_client_index()
         if not clients:
             return {'name': name, 'needs_creation': True}
         
-        best_match = None
-        best_score = 0.0
-        
-        for client in clients:
-            score = fuzz.ratio(name.lower(), client['name'].lower()) / 100.0
-            if score > best_score:
-                best_score = score
-                best_match = client
-        
-        if best_match:
+        key = database.normalize_name(name)
+        exact = by_key.get(key)
+        if exact:
+            return {'id': exact['id'], 'name': exact['name'], 'confidence': 1.0}
+        
+        # score_cutoff descarta en C los candidatos que no pueden llegar al umbral
+        match = process.extractOne(
+            key, keys,
+            scorer=fuzz.ratio,
+            score_cutoff=config.FUZZY_MATCH_THRESHOLD_CONFIRM * 100
+        )
+        if match:
+            _, score, position = match
+            best_match = clients[position]
+            best_score = score / 100.0
             if best_score >= config.FUZZY_MATCH_THRESHOLD_AUTO:
                 return {'id': best_match['id'], 'name': best_match['name'], 'confidence': best_score}
-            elif best_score >= config.FUZZY_MATCH_THRESHOLD_CONFIRM:
-                return {'id': best_match['id'], 'name': best_match['name'], 
-                       'confidence': best_score, 'needs_confirmation': True}
+            return {'id': best_match['id'], 'name': best_match['name'], 
+                   'confidence': best_score, 'needs_confirmation': True}
         
         return {'name': name, 'needs_creation': True}
     
     def _extract_date(self, text: str) -> Optional[str]:
-        """Extrae fecha usando dateparser"""
-        # Palabras clave de tiempo relativo
-        time_keywords = {
-            'hoy': datetime.now(),
-            'mañana': datetime.now() + timedelta(days=1),
-            'pasado mañana': datetime.now() + timedelta(days=2),
-            'ayer': datetime.now() - timedelta(days=1),
-        }
-        
-        text_lower = text.lower()
-        for keyword, date in time_keywords.items():
-            if keyword in text_lower:
-                return date.strftime('%Y-%m-%d')
-        
-        # Usar dateparser para fechas más complejas
+        """Extrae fecha: reglas en español y dateparser como respaldo"""
+        cache = getattr(self._local, 'dates', None)
+        if cache is not None and text in cache:
+            return cache[text]
+        
+        today = getattr(self._local, 'today', None) or date.today()
+        rule_date = spanish_dates.extract_date(text, today)
+        if rule_date:
+            result = rule_date.strftime('%Y-%m-%d')
+        elif spanish_dates.has_date_hint(text):
+            result = self._extract_date_fallback(text, today)
+        else:
+            result = None
+        
+        if cache is not None:
+            cache[text] = result
+        return result
+    
+    def _extract_date_fallback(self, text: str, today: date) -> Optional[str]:
+        """Fechas que no cubren las reglas (lento: prueba muchos formatos)"""
+        relative_base = datetime.now()
+        if today != relative_base.date():
+            relative_base = datetime.combine(today, relative_base.time())
         try:
             parsed_date = dateparser.parse(text, languages=['es'], settings={
                 'PREFER_DATES_FROM': 'future',
-                'RELATIVE_BASE': datetime.now()
+                'RELATIVE_BASE': relative_base
             })
             if parsed_date:
                 return parsed_date.strftime('%Y-%m-%d')
@@ -326,10 +525,7 @@ class IntentParser:
         title = text
         
         # Eliminar palabras de intención
-        intent_words = ['crear', 'nueva', 'nuevo', 'añadir', 'agregar', 'tarea', 
-                       'recordar', 'recordatorio']
-        for word in intent_words:
-            title = re.sub(r'\b' + word + r'\b', '', title, flags=re.IGNORECASE)
+        title = self.TITLE_INTENT_RE.sub('', title)
         
         # Eliminar información de cliente
         if 'client' in entities:
@@ -337,22 +533,11 @@ class IntentParser:
             title = re.sub(r'\bcliente\s+' + re.escape(client_name), '', title, flags=re.IGNORECASE)
             title = re.sub(r'\b' + re.escape(client_name), '', title, flags=re.IGNORECASE)
         
-        # Eliminar palabras de fecha (pero mantener el contexto)
-        date_words = ['hoy', 'mañana', 'pasado mañana', 'ayer', 'lunes', 'martes', 
-                     'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
-        for word in date_words:
-            # Eliminar "mañana" pero mantener "ir mañana a" -> "ir a"
-            if word == 'mañana':
-                title = re.sub(r'\bmañana\s+a\b', 'a', title, flags=re.IGNORECASE)
-            title = re.sub(r'\b' + word + r'\b', '', title, flags=re.IGNORECASE)
-        
-        # Eliminar palabras de prioridad
-        priority_words = ['urgente', 'importante', 'alta', 'baja', 'prioridad']
-        for word in priority_words:
-            title = re.sub(r'\b' + word + r'\b', '', title, flags=re.IGNORECASE)
+        # Eliminar palabras de fecha y prioridad ("ir mañana a" -> "ir a" tras limpiar espacios)
+        title = self.TITLE_DATE_PRIORITY_RE.sub('', title)
         
         # Limpiar espacios múltiples y "a a" -> "a"
-        title = re.sub(r'\ba\s+a\b', 'a', title, flags=re.IGNORECASE)
+        title = self.DOUBLE_A_RE.sub('a', title)
         title = ' '.join(title.split())
         
         # Si después de limpiar queda muy poco, usar el texto original
@@ -14,8 +14,10 @@ def main():
         logger.info("Pre-cargando modelo Whisper...")
         logger.info(f"Modelo: {config.WHISPER_MODEL}")
         
-        import whisper
-        whisper.load_model(config.WHISPER_MODEL)
+        logger.info(f"Backend: {config.WHISPER_BACKEND} ({config.WHISPER_COMPUTE_TYPE})")
+        
+        import audio_pipeline
+        audio_pipeline.preload_model()
         
         logger.info("✅ Modelo pre-cargado correctamente")
         return 0
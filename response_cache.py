@@ -0,0 +1,59 @@
+"""
+Caché de respuestas de la API
+Guarda el JSON ya serializado de los listados junto con la versión de los datos
+con la que se generó; en cuanto la versión cambia, la entrada deja de servirse
+"""
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+import config
+
+
+class ResponseCache:
+    """LRU en memoria acotado por número de entradas y por bytes"""
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None):
+        """
+        Args:
+            max_entries: Entradas máximas (0 desactiva la caché)
+            max_bytes: Tamaño total máximo de las respuestas guardadas
+        """
+        self.max_entries = max_entries if max_entries is not None else config.RESPONSE_CACHE_SIZE
+        self.max_bytes = max_bytes if max_bytes is not None else config.RESPONSE_CACHE_MAX_MB * 1024 * 1024
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0}
+
+    def get(self, key: str, version: int) -> Optional[bytes]:
+        """Respuesta guardada para la clave si se generó con esta versión de los datos"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[1]
+                self._remove(key)
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, key: str, version: int, body: bytes):
+        if not self.max_entries or len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, body)
+            self._bytes += len(body)
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        _, body = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
@@ -0,0 +1,189 @@
+"""
+Extracción de fechas en español
+Reglas para las expresiones habituales de los dictados ("el lunes", "dentro de tres días",
+"el 15 de marzo", "la semana que viene"); dateparser queda como respaldo en el parser
+"""
+import calendar
+import re
+import unicodedata
+from datetime import date, timedelta
+from typing import Optional
+
+WEEKDAYS = {
+    'lunes': 0, 'martes': 1, 'miercoles': 2, 'jueves': 3,
+    'viernes': 4, 'sabado': 5, 'domingo': 6,
+}
+
+MONTHS = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6,
+    'julio': 7, 'agosto': 8, 'septiembre': 9, 'setiembre': 9, 'octubre': 10,
+    'noviembre': 11, 'diciembre': 12,
+}
+
+NUMBERS = {
+    'un': 1, 'uno': 1, 'una': 1, 'dos': 2, 'tres': 3, 'cuatro': 4, 'cinco': 5,
+    'seis': 6, 'siete': 7, 'ocho': 8, 'nueve': 9, 'diez': 10, 'once': 11,
+    'doce': 12, 'trece': 13, 'catorce': 14, 'quince': 15, 'dieciseis': 16,
+    'diecisiete': 17, 'dieciocho': 18, 'diecinueve': 19, 'veinte': 20,
+    'veintiuno': 21, 'veintiun': 21, 'veintidos': 22, 'veintitres': 23,
+    'veinticuatro': 24, 'veinticinco': 25, 'veintiseis': 26, 'veintisiete': 27,
+    'veintiocho': 28, 'veintinueve': 29, 'treinta': 30, 'treinta y uno': 31,
+}
+
+
+def _words(words) -> str:
+    return '|'.join(sorted(words, key=len, reverse=True))
+
+
+_NUMBER = r'(\d{1,2}|' + _words(NUMBERS) + r')'
+_WEEKDAY = r'(' + _words(WEEKDAYS) + r')'
+_MONTH = r'(' + _words(MONTHS) + r')'
+_NEXT_WEEK = r'(?:la\s+)?(?:semana\s+que\s+viene|proxima\s+semana|semana\s+proxima)'
+
+# El orden importa: de la expresión más concreta a la más genérica
+FULL_DATE_RE = re.compile(
+    r'\b(?:dia\s+)?' + _NUMBER + r'\s+de\s+' + _MONTH + r'(?:\s+(?:de\s+|del\s+)?(\d{4}))?\b'
+)
+NUMERIC_DATE_RE = re.compile(r'\b(\d{1,2})/(\d{1,2})(?:/(\d{2}|\d{4}))?\b')
+DAY_OF_MONTH_RE = re.compile(r'\bel\s+dia\s+' + _NUMBER + r'\b')
+WEEKDAY_RE = re.compile(r'\b' + _WEEKDAY + r'\b')
+NEXT_WEEK_RE = re.compile(r'\b' + _NEXT_WEEK + r'\b')
+RELATIVE_RE = re.compile(
+    r'\b(?:dentro\s+de|en)\s+' + _NUMBER + r'\s+(dias?|semanas?|mes|meses)\b'
+)
+NEXT_MONTH_RE = re.compile(r'\b(?:el\s+)?(?:mes\s+que\s+viene|proximo\s+mes|mes\s+proximo)\b')
+DAY_AFTER_TOMORROW_RE = re.compile(r'\bpasado\s+manana\b')
+# "por la mañana" / "de la mañana" es una franja horaria, no "mañana"
+TOMORROW_RE = re.compile(r'(?<!la\s)(?<!esta\s)\bmanana\b')
+TODAY_RE = re.compile(r'\b(?:hoy|esta\s+(?:manana|tarde|noche))\b')
+DAY_BEFORE_YESTERDAY_RE = re.compile(r'\banteayer\b')
+YESTERDAY_RE = re.compile(r'\bayer\b')
+
+# Si el texto no tiene nada de esto, dateparser tampoco encontraría una fecha
+DATE_HINT_RE = re.compile(
+    r'\d|\b(?:' + _words(list(MONTHS) + list(WEEKDAYS)) + r'|semanas?|mes|meses|anos?|dias?|proxim\w*)\b'
+)
+
+
+def _fold(text: str) -> str:
+    """Minúsculas y sin acentos ("Miércoles" -> "miercoles", "mañana" -> "manana")"""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def _number(token: str) -> int:
+    return int(token) if token.isdigit() else NUMBERS[token]
+
+
+def _add_months(day: date, months: int) -> date:
+    month_index = day.month - 1 + months
+    year = day.year + month_index // 12
+    month = month_index % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def _safe_date(year: int, month: int, day: int) -> Optional[date]:
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _next_weekday(today: date, weekday: int) -> date:
+    """Próximo día de la semana indicado (si es hoy, el de la semana siguiente)"""
+    days_ahead = (weekday - today.weekday()) % 7 or 7
+    return today + timedelta(days=days_ahead)
+
+
+def _future_date(today: date, month: int, day: int, year: Optional[int]) -> Optional[date]:
+    """Fecha con día y mes; sin año se toma la próxima (este año o el siguiente)"""
+    if year is not None:
+        return _safe_date(year, month, day)
+    result = _safe_date(today.year, month, day)
+    if result is not None and result < today:
+        result = _safe_date(today.year + 1, month, day)
+    return result
+
+
+def has_date_hint(text: str) -> bool:
+    """Indica si merece la pena probar dateparser con el texto"""
+    return bool(DATE_HINT_RE.search(_fold(text)))
+
+
+def extract_date(text: str, today: Optional[date] = None) -> Optional[date]:
+    """
+    Extrae la primera fecha reconocible por las reglas
+    
+    Args:
+        text: Texto del usuario
+        today: Fecha de referencia (por defecto, hoy)
+    
+    Returns:
+        date o None si ninguna regla la reconoce
+    """
+    today = today or date.today()
+    folded = _fold(text)
+    
+    match = FULL_DATE_RE.search(folded)
+    if match:
+        year = int(match.group(3)) if match.group(3) else None
+        result = _future_date(today, MONTHS[match.group(2)], _number(match.group(1)), year)
+        if result:
+            return result
+    
+    match = NUMERIC_DATE_RE.search(folded)
+    if match:
+        year = None
+        if match.group(3):
+            year = int(match.group(3))
+            if year < 100:
+                year += 2000
+        result = _future_date(today, int(match.group(2)), int(match.group(1)), year)
+        if result:
+            return result
+    
+    match = DAY_OF_MONTH_RE.search(folded)
+    if match:
+        day = _number(match.group(1))
+        result = _safe_date(today.year, today.month, day)
+        if result is not None and result < today:
+            next_month = _add_months(today.replace(day=1), 1)
+            result = _safe_date(next_month.year, next_month.month, day)
+        if result:
+            return result
+    
+    match = WEEKDAY_RE.search(folded)
+    if match:
+        weekday = WEEKDAYS[match.group(1)]
+        if NEXT_WEEK_RE.search(folded):
+            # "el martes de la semana que viene": ese día de la semana siguiente
+            next_monday = today + timedelta(days=7 - today.weekday())
+            return next_monday + timedelta(days=weekday)
+        return _next_weekday(today, weekday)
+    
+    match = RELATIVE_RE.search(folded)
+    if match:
+        amount = _number(match.group(1))
+        unit = match.group(2)
+        if unit.startswith('dia'):
+            return today + timedelta(days=amount)
+        if unit.startswith('semana'):
+            return today + timedelta(weeks=amount)
+        return _add_months(today, amount)
+    
+    if NEXT_WEEK_RE.search(folded):
+        return today + timedelta(weeks=1)
+    if NEXT_MONTH_RE.search(folded):
+        return _add_months(today, 1)
+    if DAY_AFTER_TOMORROW_RE.search(folded):
+        return today + timedelta(days=2)
+    if TOMORROW_RE.search(folded):
+        return today + timedelta(days=1)
+    if TODAY_RE.search(folded):
+        return today
+    if DAY_BEFORE_YESTERDAY_RE.search(folded):
+        return today - timedelta(days=2)
+    if YESTERDAY_RE.search(folded):
+        return today - timedelta(days=1)
+    
+    return None
@@ -4,6 +4,12 @@ let audioChunks = [];
 let audioBlob = null;
 var isRecording = false; // Global para acceso desde otros scripts
 
+// Streaming por WebSocket: se envían fragmentos mientras se graba
+const STREAM_TIMESLICE_MS = 500;
+let streamSocket = null;
+let streamPending = [];
+let streamFinal = null;
+
 const recordBtn = document.getElementById('recordBtn');
 const recordingStatus = document.getElementById('recordingStatus');
 const audioPlayback = document.getElementById('audioPlayback');
@@ -64,10 +70,12 @@ async function startRecording() {
         
         mediaRecorder = new MediaRecorder(stream, options);
         audioChunks = [];
+        openStreamSocket();
         
         mediaRecorder.ondataavailable = (event) => {
             if (event.data.size > 0) {
                 audioChunks.push(event.data);
+                sendStreamChunk(event.data);
             }
         };
         
@@ -76,11 +84,15 @@ async function startRecording() {
             audioPlayback.src = URL.createObjectURL(audioBlob);
             audioPlayback.style.display = 'block';
             
-            // Procesar audio automáticamente
-            processAudio();
+            // Procesar audio automáticamente (streaming si está disponible)
+            if (streamSocket) {
+                finishStreaming();
+            } else {
+                processAudio();
+            }
         };
         
-        mediaRecorder.start();
+        mediaRecorder.start(STREAM_TIMESLICE_MS);
         
         // Actualizar UI
         recordBtn.classList.add('recording');
@@ -123,6 +135,102 @@ function stopRecording() {
     }
 }
 
+function openStreamSocket() {
+    streamSocket = null;
+    streamPending = [];
+    streamFinal = null;
+    
+    if (!window.WebSocket) return;
+    
+    const protocol = window.location.protocol === 'https:' ? 'wss:' : 'ws:';
+    const socket = new WebSocket(`${protocol}//${window.location.host}${API_BASE}/api/audio/stream`);
+    socket.binaryType = 'arraybuffer';
+    
+    streamFinal = new Promise((resolve, reject) => {
+        socket.onopen = () => {
+            streamPending.forEach(chunk => socket.send(chunk));
+            streamPending = [];
+        };
+        
+        socket.onmessage = (event) => {
+            const message = JSON.parse(event.data);
+            if (message.type === 'partial') {
+                // Transcripción parcial mientras se sigue grabando
+                transcriptText.textContent = message.text;
+                parsedInfo.innerHTML = '';
+                transcriptSection.style.display = 'block';
+            } else if (message.type === 'final') {
+                resolve(message);
+                socket.close();
+            } else if (message.type === 'error') {
+                reject(new Error(message.error));
+            }
+        };
+        
+        socket.onerror = () => reject(new Error('Error en la conexión de streaming'));
+        socket.onclose = () => reject(new Error('Conexión de streaming cerrada'));
+    });
+    
+    // Evitar avisos de promesa rechazada si al final no se usa
+    streamFinal.catch(() => {});
+    streamSocket = socket;
+}
+
+function sendStreamChunk(chunk) {
+    if (!streamSocket) return;
+    
+    if (streamSocket.readyState === WebSocket.OPEN) {
+        streamSocket.send(chunk);
+    } else if (streamSocket.readyState === WebSocket.CONNECTING) {
+        streamPending.push(chunk);
+    }
+}
+
+async function finishStreaming() {
+    const socket = streamSocket;
+    streamSocket = null;
+    
+    showLoading();
+    
+    let data;
+    try {
+        if (socket.readyState !== WebSocket.OPEN) {
+            throw new Error('Streaming no disponible');
+        }
+        socket.send(JSON.stringify({ type: 'stop' }));
+        
+        data = await streamFinal;
+        if (!data.transcript) {
+            throw new Error('No se pudo transcribir el audio');
+        }
+    } catch (error) {
+        // Si el streaming falla se sube la grabación completa
+        console.warn('Streaming no disponible, subiendo audio completo:', error);
+        hideLoading();
+        processAudio();
+        return;
+    }
+    
+    hideLoading();
+    showAudioResult(data);
+}
+
+function showAudioResult(data) {
+    // Mostrar transcripción
+    transcriptText.textContent = data.transcript || 'Sin transcripción';
+    
+    // Mostrar información parseada
+    displayParsedInfo(data.parsed);
+    
+    // Mostrar sección
+    transcriptSection.style.display = 'block';
+    
+    // Procesar intención automáticamente
+    if (data.parsed && data.parsed.intent !== 'UNKNOWN') {
+        handleIntent(data.parsed);
+    }
+}
+
 async function processAudio() {
     if (!audioBlob) {
         showError('No hay audio para procesar');
@@ -132,33 +240,8 @@ async function processAudio() {
     showLoading();
     
     try {
-        const formData = new FormData();
-        formData.append('audio', audioBlob, 'recording.ogg');
-        
-        const response = await fetch(API_BASE + '/api/audio/process', {
-            method: 'POST',
-            body: formData
-        });
-        
-        const data = await response.json();
-        
-        if (!response.ok) {
-            throw new Error(data.error || 'Error procesando audio');
-        }
-        
-        // Mostrar transcripción
-        transcriptText.textContent = data.transcript || 'Sin transcripción';
-        
-        // Mostrar información parseada
-        displayParsedInfo(data.parsed);
-        
-        // Mostrar sección
-        transcriptSection.style.display = 'block';
-        
-        // Procesar intención automáticamente
-        if (data.parsed && data.parsed.intent !== 'UNKNOWN') {
-            handleIntent(data.parsed);
-        }
+        const data = await transcribeAudio(audioBlob, 'recording.ogg');
+        showAudioResult(data);
         
     } catch (error) {
         console.error('Error procesando audio:', error);
@@ -168,6 +251,43 @@ async function processAudio() {
     }
 }
 
+// Sube el audio a la cola de transcripción y espera el resultado (long-poll)
+async function transcribeAudio(blob, filename) {
+    const formData = new FormData();
+    formData.append('audio', blob, filename);
+    
+    const response = await fetch(API_BASE + '/api/audio/jobs', {
+        method: 'POST',
+        body: formData
+    });
+    
+    const data = await response.json();
+    
+    if (response.status === 429) {
+        throw new Error('Servidor ocupado, inténtalo de nuevo en unos segundos');
+    }
+    if (!response.ok) {
+        throw new Error(data.error || 'Error procesando audio');
+    }
+    
+    let job = data.job;
+    while (job.status !== 'done' && job.status !== 'error') {
+        const pollResponse = await fetch(`${API_BASE}/api/audio/jobs/${job.id}?wait=20`);
+        const pollData = await pollResponse.json();
+        
+        if (!pollResponse.ok) {
+            throw new Error(pollData.error || 'Error consultando transcripción');
+        }
+        job = pollData.job;
+    }
+    
+    if (job.status === 'error') {
+        throw new Error(job.error || 'Error procesando audio');
+    }
+    
+    return job.result;
+}
+
 function displayParsedInfo(parsed) {
     if (!parsed || parsed.intent === 'UNKNOWN') {
         parsedInfo.innerHTML = '<p>No se pudo detectar una intención clara.</p>';
@@ -309,8 +429,8 @@ async function createTask(parsed) {
         
         showSuccess('Tarea creada correctamente');
         
-        // Recargar lista de tareas
-        loadTasks();
+        // Mostrar la lista (si ya está visible, el evento task.created la actualiza)
+        refreshTasksAfterWrite();
         
     } catch (error) {
         console.error('Error creando tarea:', error);
@@ -4,23 +4,44 @@ const tasksList = document.getElementById('tasksList');
 const showTasksBtn = document.getElementById('showTasksBtn');
 const closeTasksBtn = document.getElementById('closeTasksBtn');
 const ampliarTasksBtn = document.getElementById('ampliarTasksBtn');
+const taskSearchInput = document.getElementById('taskSearchInput');
 
-showTasksBtn.addEventListener('click', loadTasks);
+showTasksBtn.addEventListener('click', () => loadTasks());
 closeTasksBtn.addEventListener('click', loadTasksForClosing);
 ampliarTasksBtn.addEventListener('click', loadTasksForAmpliar);
+taskSearchInput.addEventListener('input', onTaskSearchInput);
+
+// Solo los campos que pinta la lista (sin solution)
+const TASK_LIST_FIELDS = 'id,title,client_name,due_date,priority,status,created_at,ampliacion';
+let loadedTasks = [];
+let tasksNextCursor = null;
+let tasksStatus = 'pending';
+
+async function fetchTasksPage(status, cursor = null) {
+    const params = new URLSearchParams({ status, fields: TASK_LIST_FIELDS });
+    if (cursor) {
+        params.set('cursor', cursor);
+    }
+    
+    const response = await fetch(`${API_BASE}/api/tasks?${params}`);
+    const data = await response.json();
+    
+    if (!response.ok) {
+        throw new Error(data.error || 'Error cargando tareas');
+    }
+    return data;
+}
 
 async function loadTasks(status = 'pending') {
     showLoading();
     
     try {
-        const response = await fetch(`${API_BASE}/api/tasks?status=${status}`);
-        const data = await response.json();
-        
-        if (!response.ok) {
-            throw new Error(data.error || 'Error cargando tareas');
-        }
+        const data = await fetchTasksPage(status);
+        tasksStatus = status;
+        loadedTasks = data.tasks || [];
+        tasksNextCursor = data.next_cursor;
         
-        displayTasks(data.tasks || []);
+        displayTasks(loadedTasks);
         tasksSection.style.display = 'block';
         
         // Scroll a la sección
@@ -34,7 +55,195 @@ async function loadTasks(status = 'pending') {
     }
 }
 
-function displayTasks(tasks) {
+async function loadMoreTasks() {
+    if (!tasksNextCursor) return;
+    showLoading();
+    
+    try {
+        const data = await fetchTasksPage(tasksStatus, tasksNextCursor);
+        loadedTasks = loadedTasks.concat(data.tasks || []);
+        tasksNextCursor = data.next_cursor;
+        displayTasks(loadedTasks);
+    } catch (error) {
+        console.error('Error cargando tareas:', error);
+        showError('Error cargando tareas: ' + error.message);
+    } finally {
+        hideLoading();
+    }
+}
+
+let taskSearchTimer = null;
+
+function onTaskSearchInput() {
+    clearTimeout(taskSearchTimer);
+    taskSearchTimer = setTimeout(searchTasks, 250);
+}
+
+async function searchTasks() {
+    const query = taskSearchInput.value.trim();
+    if (!query) {
+        displayTasks(loadedTasks);
+        return;
+    }
+    
+    try {
+        const params = new URLSearchParams({ q: query, status: tasksStatus });
+        const response = await fetch(`${API_BASE}/api/tasks/search?${params}`);
+        const data = await response.json();
+        
+        if (!response.ok) {
+            throw new Error(data.error || 'Error buscando tareas');
+        }
+        // Descartar respuestas de búsquedas ya reemplazadas por otra
+        if (taskSearchInput.value.trim() === query) {
+            displayTasks(data.tasks || [], false);
+        }
+    } catch (error) {
+        console.error('Error buscando tareas:', error);
+        showError('Error buscando tareas: ' + error.message);
+    }
+}
+
+// Cambios en vivo (Server-Sent Events): se aplican a la lista cargada sin volver a descargarla
+let taskEvents = null;
+let taskEventsConnected = false;
+// Sin conexión de eventos (límite por proceso alcanzado) la lista se sondea; con ETag suele ser un 304
+const TASK_POLL_INTERVAL_MS = 15000;
+let taskPollTimer = null;
+
+function startTaskPolling() {
+    if (taskPollTimer) return;
+    taskPollTimer = setInterval(refreshLoadedTasks, TASK_POLL_INTERVAL_MS);
+}
+
+function stopTaskPolling() {
+    clearInterval(taskPollTimer);
+    taskPollTimer = null;
+}
+
+function connectTaskEvents() {
+    if (!window.EventSource) {
+        startTaskPolling();
+        return;
+    }
+    
+    taskEvents = new EventSource(`${API_BASE}/api/events`);
+    taskEvents.onopen = () => {
+        taskEventsConnected = true;
+        stopTaskPolling();
+    };
+    taskEvents.onerror = () => {
+        taskEventsConnected = false;
+        // Tras un 503 (demasiadas conexiones) EventSource no reintenta solo:
+        // se sondea la lista hasta que vuelva a haber hueco
+        if (taskEvents.readyState === EventSource.CLOSED) {
+            startTaskPolling();
+            setTimeout(connectTaskEvents, 30000);
+        }
+    };
+    
+    taskEvents.addEventListener('task.created', event => {
+        const task = JSON.parse(event.data).task;
+        if (task && task.status === tasksStatus) {
+            insertLoadedTask(task);
+        }
+    });
+    taskEvents.addEventListener('task.updated', event => {
+        const data = JSON.parse(event.data);
+        applyTaskChanges(data.id, data.changes);
+    });
+    taskEvents.addEventListener('task.deleted', event => {
+        removeLoadedTask(JSON.parse(event.data).id);
+    });
+    // Cambios que no se pueden aplicar como diff (otro worker, eventos perdidos, importaciones)
+    taskEvents.addEventListener('resync', refreshLoadedTasks);
+    taskEvents.addEventListener('tasks.imported', refreshLoadedTasks);
+}
+
+// Mismo orden que el servidor: due_date ascendente (sin fecha primero), luego más recientes
+function compareTasks(a, b) {
+    const dueA = a.due_date || '';
+    const dueB = b.due_date || '';
+    if (dueA !== dueB) return dueA < dueB ? -1 : 1;
+    const createdA = a.created_at || '';
+    const createdB = b.created_at || '';
+    if (createdA !== createdB) return createdA > createdB ? -1 : 1;
+    return b.id - a.id;
+}
+
+function insertLoadedTask(task) {
+    loadedTasks = loadedTasks.filter(t => t.id !== task.id);
+    const index = loadedTasks.findIndex(t => compareTasks(task, t) < 0);
+    if (index !== -1) {
+        loadedTasks.splice(index, 0, task);
+    } else if (!tasksNextCursor) {
+        loadedTasks.push(task);
+    }
+    // Si va detrás de lo cargado y hay más páginas, aparecerá con "Cargar más"
+    renderLoadedTasks();
+}
+
+function removeLoadedTask(taskId) {
+    const count = loadedTasks.length;
+    loadedTasks = loadedTasks.filter(t => t.id !== taskId);
+    if (loadedTasks.length !== count) {
+        renderLoadedTasks();
+    }
+}
+
+async function applyTaskChanges(taskId, changes) {
+    const task = loadedTasks.find(t => t.id === taskId);
+    
+    if ('client_id' in changes || (!task && changes.status === tasksStatus)) {
+        // Hace falta la fila completa: nombre del cliente o tarea que entra en la lista
+        const response = await fetch(`${API_BASE}/api/tasks/${taskId}`);
+        if (!response.ok) return;
+        const fresh = (await response.json()).task;
+        if (fresh.status === tasksStatus) {
+            insertLoadedTask(fresh);
+        } else {
+            removeLoadedTask(taskId);
+        }
+        return;
+    }
+    if (!task) return;
+    
+    Object.assign(task, changes);
+    if (task.status !== tasksStatus) {
+        removeLoadedTask(taskId);
+    } else if ('due_date' in changes) {
+        insertLoadedTask(task);
+    } else {
+        renderLoadedTasks();
+    }
+}
+
+async function refreshLoadedTasks() {
+    if (tasksSection.style.display !== 'block') return;
+    try {
+        const data = await fetchTasksPage(tasksStatus);
+        loadedTasks = data.tasks || [];
+        tasksNextCursor = data.next_cursor;
+        renderLoadedTasks();
+    } catch (error) {
+        console.error('Error recargando tareas:', error);
+    }
+}
+
+function renderLoadedTasks() {
+    // Con una búsqueda en pantalla no se sustituyen sus resultados
+    if (tasksSection.style.display === 'block' && !taskSearchInput.value.trim()) {
+        displayTasks(loadedTasks);
+    }
+}
+
+// Tras una escritura propia: con eventos conectados la lista se actualiza sola
+function refreshTasksAfterWrite() {
+    if (taskEventsConnected && tasksSection.style.display === 'block') return;
+    loadTasks();
+}
+
+function displayTasks(tasks, showLoadMore = true) {
     if (tasks.length === 0) {
         tasksList.innerHTML = `
             <div class="empty-state">
@@ -45,7 +254,13 @@ function displayTasks(tasks) {
         return;
     }
     
-    tasksList.innerHTML = tasks.map(task => createTaskHTML(task)).join('');
+    tasksList.innerHTML = tasks.map(task => createTaskHTML(task)).join('') +
+        (showLoadMore && tasksNextCursor ? '<button class="btn btn-outline" id="loadMoreTasksBtn">Cargar más</button>' : '');
+    
+    const loadMoreBtn = document.getElementById('loadMoreTasksBtn');
+    if (loadMoreBtn) {
+        loadMoreBtn.addEventListener('click', loadMoreTasks);
+    }
     
     // Agregar event listeners a los botones
     tasks.forEach(task => {
@@ -65,12 +280,16 @@ function createTaskHTML(task) {
     const dueDate = task.due_date ? formatDate(task.due_date) : 'Sin fecha';
     const clientName = task.client_name || 'Sin cliente';
     const priority = task.priority || 'normal';
+    const titleHtml = task.title_highlight ? highlightHtml(task.title_highlight) : escapeHtml(task.title);
+    // En resultados de búsqueda, fragmento de la nota donde aparece el término
+    const snippet = task.snippet && task.snippet !== task.title_highlight
+        ? `<div class="task-snippet">${highlightHtml(task.snippet)}</div>` : '';
     
     return `
         <div class="task-item ${task.status === 'completed' ? 'completed' : ''}">
             <div class="task-header">
                 <div class="task-title">
-                    ${escapeHtml(task.title)}
+                    ${titleHtml}
                     <span class="task-id">#${task.id}</span>
                 </div>
             </div>
@@ -79,6 +298,7 @@ function createTaskHTML(task) {
                 <span class="badge badge-date">📅 ${dueDate}</span>
                 <span class="badge badge-priority ${priority}">⚡ ${priority}</span>
             </div>
+            ${snippet}
             ${task.ampliacion ? `<div style="margin-top: 0.75rem; padding: 0.875rem; background: #fee2e2; border-radius: 8px; border-left: 3px solid #dc2626; font-size: 0.95rem;">
                 <strong style="color: #dc2626;">Ampliación:</strong> ${escapeHtml(task.ampliacion)}
             </div>` : ''}
@@ -123,6 +343,13 @@ function escapeHtml(text) {
     return div.innerHTML;
 }
 
+function highlightHtml(text) {
+    // Escapar todo y restaurar solo las marcas <mark> que añade la búsqueda
+    return escapeHtml(text)
+        .replace(/&lt;mark&gt;/g, '<mark>')
+        .replace(/&lt;\/mark&gt;/g, '</mark>');
+}
+
 async function completeTask(taskId) {
     showModal(
         'Confirmar',
@@ -142,7 +369,7 @@ async function completeTask(taskId) {
                 }
                 
                 showSuccess('Tarea completada');
-                loadTasks();
+                refreshTasksAfterWrite();
                 
             } catch (error) {
                 console.error('Error completando tarea:', error);
@@ -196,19 +423,7 @@ async function processAmpliarAudio(taskId) {
     showLoading();
     
     try {
-        const formData = new FormData();
-        formData.append('audio', audioBlob, 'ampliar.ogg');
-        
-        const response = await fetch(API_BASE + '/api/audio/process', {
-            method: 'POST',
-            body: formData
-        });
-        
-        const data = await response.json();
-        
-        if (!response.ok) {
-            throw new Error(data.error || 'Error procesando audio');
-        }
+        const data = await transcribeAudio(audioBlob, 'ampliar.ogg');
         
         // Guardar ampliación
         const ampliarResponse = await fetch(`${API_BASE}/api/tasks/${taskId}/ampliar`, {
@@ -228,7 +443,7 @@ async function processAmpliarAudio(taskId) {
         }
         
         showSuccess('Ampliación guardada');
-        loadTasks();
+        refreshTasksAfterWrite();
         
     } catch (error) {
         console.error('Error procesando ampliación:', error);
@@ -238,3 +453,4 @@ async function processAmpliarAudio(taskId) {
     }
 }
 
+connectTaskEvents();
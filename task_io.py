@@ -0,0 +1,262 @@
+"""
+Importación y exportación de tareas en bloque
+Lee NDJSON (un objeto JSON por línea) o CSV con cabecera directamente del
+cuerpo de la petición, valida cada fila y las inserta por lotes con
+executemany. La exportación genera las filas según se leen de la base de datos.
+"""
+import csv
+import io
+import json
+import logging
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, IO, Iterator, List, Optional, Tuple
+import config
+import database
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+
+# Columnas aceptadas al importar (client_name se resuelve a client_id)
+IMPORT_FIELDS = ('title', 'client_id', 'client_name', 'due_date', 'priority', 'status',
+                 'solution', 'ampliacion', 'created_at', 'completed_at')
+PRIORITIES = ('low', 'normal', 'high', 'urgent')
+STATUSES = ('pending', 'completed')
+# Errores que se devuelven en la respuesta; el resto solo se cuentan
+MAX_REPORTED_ERRORS = 100
+# Importación atómica: el cuerpo pasa a disco a partir de este tamaño
+SPOOL_MEMORY_BYTES = 1024 * 1024
+
+
+class ImportAborted(Exception):
+    """Importación atómica con filas erróneas: se deshace todo"""
+
+
+class ImportTooLarge(ImportAborted):
+    """Importación atómica con más de BULK_IMPORT_MAX_ROWS filas"""
+
+
+def detect_format(content_type: str, requested: str = None) -> Optional[str]:
+    """Formato de ?format= o, si no se indica, del Content-Type"""
+    value = (requested or content_type or '').split(';')[0].strip().lower()
+    if value in ('csv', 'text/csv'):
+        return 'csv'
+    if value in ('ndjson', 'jsonl', 'application/x-ndjson', 'application/jsonl',
+                 'application/json-lines'):
+        return 'ndjson'
+    return None
+
+
+def read_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Lee el cuerpo sin cargarlo entero en memoria
+
+    Yields:
+        (línea, fila, error): fila es None si la línea no se pudo leer
+    """
+    # utf-8-sig: los CSV guardados con Excel empiezan con BOM
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace', newline='')
+    if fmt == 'csv':
+        header = text.readline()
+        # Excel en español separa con punto y coma
+        delimiter = ';' if header.count(';') > header.count(',') else ','
+        fieldnames = [name.strip() for name in next(csv.reader([header], delimiter=delimiter), [])]
+        reader = csv.DictReader(text, fieldnames=fieldnames, delimiter=delimiter)
+        for row in reader:
+            # reader.line_num no cuenta la cabecera, leída aparte
+            yield reader.line_num + 1, row, None
+        return
+
+    for number, line in enumerate(text, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, None, f'JSON inválido: {e}'
+            continue
+        if not isinstance(row, dict):
+            yield number, None, 'Se esperaba un objeto JSON'
+            continue
+        yield number, row, None
+
+
+def _clean(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def validate_row(row: Dict) -> Dict:
+    """Tarea lista para add_tasks_bulk; lanza ValueError si la fila no es válida"""
+    task = {field: _clean(row.get(field)) for field in IMPORT_FIELDS}
+
+    if not task['title']:
+        raise ValueError('Título requerido')
+
+    if task['client_id'] is not None:
+        try:
+            task['client_id'] = int(task['client_id'])
+        except ValueError:
+            raise ValueError(f"client_id inválido: {task['client_id']}")
+
+    if task['due_date'] is not None:
+        try:
+            datetime.strptime(task['due_date'], '%Y-%m-%d')
+        except ValueError:
+            raise ValueError(f"due_date inválida (YYYY-MM-DD): {task['due_date']}")
+
+    for field in ('created_at', 'completed_at'):
+        if task[field] is not None:
+            try:
+                datetime.fromisoformat(task[field])
+            except ValueError:
+                raise ValueError(f'{field} inválida: {task[field]}')
+
+    if task['priority'] is not None:
+        task['priority'] = task['priority'].lower()
+        if task['priority'] not in PRIORITIES:
+            raise ValueError(f"Prioridad desconocida: {task['priority']}")
+
+    if task['status'] is not None:
+        task['status'] = task['status'].lower()
+        if task['status'] not in STATUSES:
+            raise ValueError(f"Estado desconocido: {task['status']}")
+
+    return task
+
+
+class _ImportReport:
+    """Tareas importadas y errores por línea"""
+
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+        self.error_count = 0
+        self.truncated = False
+
+    def add_error(self, line: int, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self) -> Dict:
+        # Los errores de clientes se detectan al insertar el lote, después de los de validación
+        errors = sorted(self.errors, key=lambda error: error['line'])
+        return {'imported': self.imported, 'errors': errors, 'error_count': self.error_count}
+
+
+def _batches(rows: Iterator[Tuple[int, Optional[Dict], Optional[str]]],
+             report: _ImportReport) -> Iterator[List[Tuple[int, Dict]]]:
+    """Filas válidas en lotes de (línea, tarea); las inválidas van al informe"""
+    batch = []
+    for count, (line, row, error) in enumerate(rows, 1):
+        if count > config.BULK_IMPORT_MAX_ROWS:
+            report.add_error(line, f'Máximo {config.BULK_IMPORT_MAX_ROWS} filas por importación')
+            report.truncated = True
+            break
+        if error:
+            report.add_error(line, error)
+            continue
+        try:
+            batch.append((line, validate_row(row)))
+        except ValueError as e:
+            report.add_error(line, str(e))
+            continue
+        if len(batch) >= config.BULK_IMPORT_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _flush(db: database.Database, batch: List[Tuple[int, Dict]], report: _ImportReport):
+    """Comprueba y resuelve los clientes del lote de una vez e inserta sus tareas"""
+    # Las claves ajenas no están activadas: un client_id inexistente se insertaría sin más
+    given_ids = list({task['client_id'] for _, task in batch if task['client_id'] is not None})
+    existing_ids = set(db.get_client_ids(given_ids))
+    names = [task['client_name'] for _, task in batch
+             if task['client_name'] and task['client_id'] is None]
+    client_ids = db.ensure_clients(names)
+
+    tasks = []
+    for line, task in batch:
+        if task['client_id'] is not None:
+            if task['client_id'] not in existing_ids:
+                report.add_error(line, f"Cliente inexistente: {task['client_id']}")
+                continue
+        elif task['client_name']:
+            task['client_id'] = client_ids.get(task['client_name'])
+        tasks.append(task)
+    report.imported += len(db.add_tasks_bulk(tasks))
+
+
+def import_tasks(db: database.Database, stream: IO[bytes], fmt: str,
+                 atomic: bool = False) -> Dict:
+    """
+    Importa las tareas del cuerpo de la petición
+
+    Cada lote se lee y valida fuera de la transacción y se inserta en la suya,
+    así un cliente que sube despacio no retiene el bloqueo de escritura. Las
+    filas inválidas se omiten y se informan con su número de línea.
+
+    Con atomic=True el cuerpo se guarda primero en un temporal y todo se inserta
+    en una sola transacción; cualquier error la deshace (ImportAborted, o
+    ImportTooLarge si se supera BULK_IMPORT_MAX_ROWS).
+
+    Returns:
+        {'imported': n, 'errors': [{'line': n, 'error': '...'}], 'error_count': n}
+    """
+    report = _ImportReport()
+    if atomic:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as body:
+            shutil.copyfileobj(stream, body)
+            body.seek(0)
+            with db.transaction():
+                for batch in _batches(read_rows(body, fmt), report):
+                    _flush(db, batch, report)
+                if report.error_count:
+                    error = ImportTooLarge if report.truncated else ImportAborted
+                    raise error(report.as_dict())
+    else:
+        for batch in _batches(read_rows(stream, fmt), report):
+            with db.transaction():
+                _flush(db, batch, report)
+
+    logger.info(f"Importación de tareas ({fmt}): {report.imported} importadas, "
+                f"{report.error_count} con errores")
+    return report.as_dict()
+
+
+def export_tasks(db: database.Database, fmt: str, status: str = None,
+                 client_id: int = None) -> Iterator[str]:
+    """Genera el contenido de la exportación fragmento a fragmento"""
+    tasks = db.iter_tasks(status=status, client_id=client_id,
+                          batch_size=config.EXPORT_BATCH_SIZE)
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=database.TASK_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for count, task in enumerate(tasks, 1):
+            writer.writerow(task)
+            if count % config.EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    chunk = []
+    for task in tasks:
+        chunk.append(json.dumps({field: task.get(field) for field in database.TASK_FIELDS},
+                                ensure_ascii=False) + '\n')
+        if len(chunk) >= config.EXPORT_BATCH_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# La configuración se lee al importar: apuntar los datos a un directorio temporal
+_data_dir = tempfile.mkdtemp(prefix='agenteweb-tests-')
+os.environ.setdefault('DATA_DIR', _data_dir)
+os.environ.setdefault('SQLITE_PATH', os.path.join(_data_dir, 'app.db'))
+os.environ.setdefault('WHISPER_WARMUP', 'false')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
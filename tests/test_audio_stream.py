@@ -0,0 +1,58 @@
+import shutil
+import subprocess
+import time
+import pytest
+import audio_pipeline
+import audio_stream
+import config
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='requiere ffmpeg')
+
+
+@pytest.fixture
+def webm(tmp_path):
+    path = tmp_path / 'clip.webm'
+    subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=f=440:d=8',
+                    '-ar', '48000', '-c:a', 'libopus', '-cluster_time_limit', '500', str(path)],
+                   check=True)
+    return path.read_bytes()
+
+
+def test_partials_only_transcribe_the_window(webm, monkeypatch):
+    transcribed = []
+
+    def transcribe_audio(audio, language='es'):
+        transcribed.append(len(audio) / audio_pipeline.SAMPLE_RATE)
+        return 'x'
+
+    monkeypatch.setattr(audio_pipeline, 'transcribe_audio', transcribe_audio)
+    monkeypatch.setattr(config, 'VAD_ENABLED', False)
+    monkeypatch.setattr(config, 'STREAM_PARTIAL_INTERVAL_SECONDS', 0)
+    monkeypatch.setattr(config, 'STREAM_WINDOW_SECONDS', 3)
+
+    streamer = audio_stream.StreamingTranscriber()
+    try:
+        size = len(webm) // 16 + 1
+        for start in range(0, len(webm), size):
+            streamer.feed(webm[start:start + size])
+            # El navegador envía un fragmento cada 500ms: ffmpeg tiene tiempo de decodificarlo
+            time.sleep(0.1)
+            streamer.maybe_partial()
+        streamer.finish()
+    finally:
+        streamer.close()
+
+    assert streamer.metrics['audio_seconds'] == pytest.approx(8.0, abs=0.05)
+    assert streamer.metrics['commits'] >= 2
+    # Ninguna pasada del modelo cubre más que la ventana más lo llegado desde el último parcial
+    assert max(transcribed) <= config.STREAM_WINDOW_SECONDS + 1
+
+
+def test_undecodable_stream(monkeypatch):
+    streamer = audio_stream.StreamingTranscriber()
+    try:
+        streamer.feed(b'no es audio' * 100)
+        with pytest.raises(Exception, match='decodificación'):
+            streamer.finish()
+    finally:
+        streamer.close()
@@ -0,0 +1,33 @@
+import pytest
+import app as app_module
+import config
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(config, 'EVENTS_MAX_STREAMS', 1)
+    return app_module.app.test_client()
+
+
+def test_events_rejected_over_limit(client):
+    first = client.get('/api/events')
+    assert first.status_code == 200
+    assert first.mimetype == 'text/event-stream'
+
+    rejected = client.get('/api/events')
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After'] == '30'
+
+    # Al cerrar la conexión se libera el hueco
+    first.close()
+    second = client.get('/api/events')
+    assert second.status_code == 200
+    second.close()
+
+
+def test_rejected_stream_does_not_hold_a_slot(client):
+    first = client.get('/api/events')
+    for _ in range(3):
+        assert client.get('/api/events').status_code == 503
+    first.close()
+    assert app_module.db.changes.subscriber_count() == 0
@@ -0,0 +1,36 @@
+import threading
+import pytest
+import app as app_module
+import audio_pipeline
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(audio_pipeline, '_model_ready', threading.Event())
+    monkeypatch.setattr(audio_pipeline, '_warmup_started', threading.Event())
+    monkeypatch.setattr(audio_pipeline, '_warmup_error', None)
+    return app_module.app.test_client()
+
+
+def test_ready_without_warm_up(client):
+    # flask run u otro servidor WSGI: nadie lanza el calentamiento
+    response = client.get('/healthz')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'ok'
+
+
+def test_warming_until_warm_up_finishes(client, monkeypatch):
+    release = threading.Event()
+
+    def warm_up():
+        release.wait(5)
+        audio_pipeline._model_ready.set()
+
+    monkeypatch.setattr(audio_pipeline, 'warm_up', warm_up)
+
+    audio_pipeline.warm_up_in_background()
+    assert client.get('/healthz').status_code == 503
+
+    release.set()
+    assert audio_pipeline._model_ready.wait(5)
+    assert client.get('/healthz').status_code == 200
@@ -0,0 +1,21 @@
+import pytest
+import database
+
+
+@pytest.fixture
+def db(tmp_path):
+    return database.Database(str(tmp_path / 'app.db'))
+
+
+@pytest.mark.parametrize('query, expected', [('-', ['-Guion']), ('@@', []), ('"', [])])
+def test_search_clients_without_words(db, query, expected):
+    # Sin palabras no hay consulta FTS, pero el prefijo sigue funcionando
+    db.add_client('-Guion')
+    assert [client['name'] for client in db.search_clients(query=query)] == expected
+
+
+def test_search_clients_prefix_and_word(db):
+    db.add_client('Juan Pérez')
+    db.add_client('Pere Soler')
+    names = [client['name'] for client in db.search_clients(query='per', limit=10)]
+    assert names == ['Pere Soler', 'Juan Pérez']
@@ -0,0 +1,67 @@
+import io
+import wave
+import numpy as np
+import pytest
+import audio_pipeline
+import config
+import transcription_cache
+from audio_pipeline import SAMPLE_RATE
+
+
+def _wav(audio: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as out:
+        out.setnchannels(1)
+        out.setsampwidth(2)
+        out.setframerate(SAMPLE_RATE)
+        out.writeframes((audio * 32767).astype('<i2').tobytes())
+    return buffer.getvalue()
+
+
+class _FakeBackend(audio_pipeline.TranscriptionBackend):
+    name = 'faster-whisper'
+
+    def __init__(self):
+        self.model_id = audio_pipeline._whisper_model_id(
+            self.name, config.WHISPER_MODEL, config.WHISPER_COMPUTE_TYPE)
+
+    def transcribe(self, audio, language='es'):
+        return 'hola'
+
+
+@pytest.fixture
+def loads(monkeypatch, tmp_path):
+    calls = []
+
+    def _load_backend():
+        calls.append(1)
+        return _FakeBackend()
+
+    monkeypatch.setattr(audio_pipeline, '_load_backend', _load_backend)
+    monkeypatch.setattr(audio_pipeline, '_whisper_model', None)
+    monkeypatch.setattr(audio_pipeline, '_cache', transcription_cache.TranscriptionCache(max_entries=16))
+    monkeypatch.setattr(config, 'WHISPER_BACKEND', 'faster-whisper')
+    monkeypatch.setattr(config, 'VAD_ENABLED', True)
+    return calls
+
+
+def test_silent_clip_does_not_load_model(loads):
+    metrics = {}
+    transcript = audio_pipeline.process_audio_bytes(_wav(np.zeros(SAMPLE_RATE * 3)), metrics=metrics)
+    assert transcript == ''
+    assert loads == []
+    assert 'model_load' not in metrics['timings_ms']
+
+
+def test_cold_load_is_timed_and_key_is_stable(loads):
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    data = _wav(0.3 * np.sin(2 * np.pi * 440 * t))
+    cold_key = audio_pipeline._model_id()
+
+    metrics = {}
+    assert audio_pipeline.process_audio_bytes(data, metrics=metrics) == 'hola'
+    assert loads == [1]
+    assert 'model_load' in metrics['timings_ms']
+    # La clave deducida de la configuración coincide con la del modelo cargado
+    assert audio_pipeline._model_id() == cold_key
+    assert audio_pipeline.process_audio_bytes(data, metrics={}) == 'hola'
@@ -0,0 +1,49 @@
+import json
+import os
+import subprocess
+import sys
+import transcription_jobs
+
+
+def _write_job(jobs_dir, job_id, status, pid):
+    job = {'id': job_id, 'status': status, 'pid': pid, 'created_at': 0, 'updated_at': 0,
+           'result': None, 'error': None}
+    (jobs_dir / f'{job_id}.json').write_text(json.dumps(job))
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_jobs_of_a_dead_process_fail_on_startup(tmp_path):
+    dead = _dead_pid()
+    _write_job(tmp_path, 'processing', transcription_jobs.STATUS_PROCESSING, dead)
+    _write_job(tmp_path, 'queued', transcription_jobs.STATUS_QUEUED, dead)
+    _write_job(tmp_path, 'legacy', transcription_jobs.STATUS_PROCESSING, None)
+    _write_job(tmp_path, 'alive', transcription_jobs.STATUS_PROCESSING, os.getpid())
+
+    jobs = transcription_jobs.TranscriptionJobQueue(lambda audio: {}, jobs_dir=str(tmp_path))
+
+    for job_id in ('processing', 'queued', 'legacy'):
+        job = jobs.get(job_id)
+        assert job['status'] == transcription_jobs.STATUS_ERROR
+        assert job['error']
+    # Otro worker vivo sigue con su trabajo
+    assert jobs.get('alive')['status'] == transcription_jobs.STATUS_PROCESSING
+
+
+def test_wait_stops_when_the_owner_dies(tmp_path):
+    jobs = transcription_jobs.TranscriptionJobQueue(lambda audio: {}, jobs_dir=str(tmp_path))
+    _write_job(tmp_path, 'orphan', transcription_jobs.STATUS_PROCESSING, _dead_pid())
+    job = jobs.wait('orphan', timeout=5)
+    assert job['status'] == transcription_jobs.STATUS_ERROR
+
+
+def test_completed_job(tmp_path):
+    jobs = transcription_jobs.TranscriptionJobQueue(lambda audio: {'text': 'hola'}, jobs_dir=str(tmp_path))
+    job = jobs.submit(b'audio')
+    done = jobs.wait(job['id'], timeout=5)
+    assert done['status'] == transcription_jobs.STATUS_DONE
+    assert done['result'] == {'text': 'hola'}
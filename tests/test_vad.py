@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+import audio_pipeline
+from audio_pipeline import SAMPLE_RATE, VAD_FRAME_MS
+
+
+def _tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(SAMPLE_RATE * seconds)) / SAMPLE_RATE
+    return (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+@pytest.mark.parametrize('seconds', [0.27, 0.3, 0.36, 0.4])
+def test_short_voiced_clip_shorter_than_padding(seconds):
+    # Con los valores por defecto 2*pad+1 son 13 tramas (390ms)
+    trimmed, metrics = audio_pipeline.apply_vad(_tone(seconds))
+    n_frames = int(SAMPLE_RATE * seconds) // (SAMPLE_RATE * VAD_FRAME_MS // 1000)
+    assert len(trimmed) == n_frames * SAMPLE_RATE * VAD_FRAME_MS // 1000
+
+
+def test_silence_is_dropped():
+    trimmed, metrics = audio_pipeline.apply_vad(np.zeros(SAMPLE_RATE * 3, dtype=np.float32))
+    assert len(trimmed) == 0
+    assert metrics['dropped_ratio'] == 1.0
+
+
+def test_padding_keeps_frames_around_speech():
+    silence = np.zeros(SAMPLE_RATE, dtype=np.float32)
+    audio = np.concatenate([silence, _tone(1.0), silence])
+    trimmed, _ = audio_pipeline.apply_vad(audio)
+    pad_seconds = (audio_pipeline.config.VAD_PAD_MS // VAD_FRAME_MS) * VAD_FRAME_MS / 1000
+    assert len(trimmed) / SAMPLE_RATE == pytest.approx(1.0 + 2 * pad_seconds, abs=0.07)
@@ -0,0 +1,161 @@
+"""
+Caché de transcripciones
+Evita repetir ffmpeg + Whisper cuando se reenvía el mismo audio
+"""
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """Caché en dos niveles: LRU en memoria y SQLite opcional en disco"""
+
+    def __init__(self, max_entries: int = None, db_path: str = None,
+                 disk_max_entries: int = None, ttl_seconds: int = None):
+        """
+        Args:
+            max_entries: Entradas del nivel en memoria
+            db_path: Ruta de la base SQLite (None desactiva el nivel en disco)
+            disk_max_entries: Entradas máximas en disco
+            ttl_seconds: Antigüedad máxima de una entrada
+        """
+        self.max_entries = max_entries if max_entries is not None else config.TRANSCRIPTION_CACHE_SIZE
+        self.db_path = db_path
+        self.disk_max_entries = disk_max_entries or config.TRANSCRIPTION_CACHE_DISK_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or config.TRANSCRIPTION_CACHE_TTL_SECONDS
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+        if self.db_path:
+            self._init_db()
+
+    @staticmethod
+    def make_key(data: bytes, model: str, language: str) -> str:
+        """Clave = hash del audio + modelo + idioma"""
+        digest = hashlib.sha256(data).hexdigest()
+        return f'{digest}:{model}:{language}'
+
+    def _get_connection(self):
+        return sqlite3.connect(self.db_path, timeout=5)
+
+    def _init_db(self):
+        conn = self._get_connection()
+        try:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transcriptions (
+                    key TEXT PRIMARY KEY,
+                    transcript TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_transcriptions_last_access '
+                         'ON transcriptions(last_access)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_transcriptions_created_at '
+                         'ON transcriptions(created_at)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        """Busca una transcripción (memoria primero, luego disco)"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                transcript, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return transcript
+                del self._memory[key]
+
+        if self.db_path:
+            try:
+                transcript = self._disk_get(key, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Error leyendo caché de transcripciones: {e}")
+                transcript = None
+            if transcript is not None:
+                self._memory_put(key, transcript, now)
+                with self._lock:
+                    self._stats['disk_hits'] += 1
+                return transcript
+
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key: str, transcript: str):
+        """Guarda una transcripción en ambos niveles"""
+        now = time.time()
+        self._memory_put(key, transcript, now)
+        if self.db_path:
+            try:
+                self._disk_put(key, transcript, now)
+            except sqlite3.Error as e:
+                logger.warning(f"Error guardando caché de transcripciones: {e}")
+
+    def stats(self) -> Dict:
+        """Contadores de aciertos/fallos y tamaño"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._memory)
+        hits = stats['memory_hits'] + stats['disk_hits']
+        total = hits + stats['misses']
+        stats['hit_ratio'] = round(hits / total, 3) if total else 0.0
+        return stats
+
+    def _memory_put(self, key: str, transcript: str, now: float):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._memory[key] = (transcript, now)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        conn = self._get_connection()
+        try:
+            row = conn.execute(
+                'SELECT transcript FROM transcriptions WHERE key = ? AND created_at >= ?',
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE transcriptions SET last_access = ? WHERE key = ?', (now, key))
+                conn.commit()
+                return row[0]
+            return None
+        finally:
+            conn.close()
+
+    def _disk_put(self, key: str, transcript: str, now: float):
+        conn = self._get_connection()
+        try:
+            conn.execute('''
+                INSERT OR REPLACE INTO transcriptions (key, transcript, created_at, last_access)
+                VALUES (?, ?, ?, ?)
+            ''', (key, transcript, now, now))
+            # Evicción por antigüedad y por tamaño (menos usadas recientemente)
+            conn.execute('DELETE FROM transcriptions WHERE created_at < ?',
+                         (now - self.ttl_seconds,))
+            conn.execute('''
+                DELETE FROM transcriptions WHERE key IN (
+                    SELECT key FROM transcriptions
+                    ORDER BY last_access DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (self.disk_max_entries,))
+            conn.commit()
+        finally:
+            conn.close()
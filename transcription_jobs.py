@@ -0,0 +1,250 @@
+"""
+Cola de trabajos de transcripción
+Ejecuta la transcripción en un pool acotado de hilos y persiste los resultados en disco
+"""
+import json
+import logging
+import contextvars
+import os
+import queue
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+# Estados posibles de un trabajo
+STATUS_QUEUED = 'queued'
+STATUS_PROCESSING = 'processing'
+STATUS_DONE = 'done'
+STATUS_ERROR = 'error'
+
+FINAL_STATUSES = (STATUS_DONE, STATUS_ERROR)
+
+
+class QueueFullError(Exception):
+    """La cola de transcripción ha alcanzado su capacidad máxima"""
+
+
+class TranscriptionJobQueue:
+    """Cola acotada de trabajos de transcripción con resultados en disco"""
+    
+    def __init__(self, handler: Callable[[bytes], Dict], workers: int = None,
+                 max_queued: int = None, jobs_dir: str = None):
+        """
+        Args:
+            handler: Función que recibe los bytes del audio y devuelve el resultado
+            workers: Número de hilos de transcripción
+            max_queued: Máximo de trabajos pendientes antes de rechazar (429)
+            jobs_dir: Directorio donde se guardan los resultados
+        """
+        self.handler = handler
+        self.workers = workers or config.TRANSCRIPTION_WORKERS
+        self.max_queued = max_queued or config.TRANSCRIPTION_QUEUE_MAX
+        self.jobs_dir = Path(jobs_dir or config.JOBS_FOLDER)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._queue = queue.Queue(maxsize=self.max_queued)
+        self._jobs = {}
+        self._events = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self._fail_orphaned_jobs()
+    
+    def _ensure_workers(self):
+        """Arranca los hilos de trabajo la primera vez (tras el fork de gunicorn)"""
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker_loop,
+                    name=f'transcription-worker-{i}',
+                    daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+            logger.info(f"Cola de transcripción iniciada con {self.workers} worker(s)")
+    
+    def _job_path(self, job_id: str) -> Path:
+        return self.jobs_dir / f'{job_id}.json'
+    
+    def _save_job(self, job: Dict):
+        """Escribe el estado del trabajo de forma atómica"""
+        path = self._job_path(job['id'])
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(job, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    
+    def _update_job(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            job['updated_at'] = time.time()
+            snapshot = dict(job)
+        self._save_job(snapshot)
+        if snapshot['status'] in FINAL_STATUSES:
+            event = self._events.pop(job_id, None)
+            if event:
+                event.set()
+            with self._lock:
+                self._jobs.pop(job_id, None)
+    
+    def submit(self, audio: bytes) -> Dict:
+        """
+        Encola un audio para transcripción
+        
+        Args:
+            audio: Contenido del archivo subido (se mantiene solo en memoria)
+        
+        Returns:
+            Estado inicial del trabajo
+        
+        Raises:
+            QueueFullError: Si hay demasiados trabajos pendientes
+        """
+        self._ensure_workers()
+        self._cleanup_expired()
+        
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        job = {
+            'id': job_id,
+            'status': STATUS_QUEUED,
+            # El audio solo está en la memoria de este proceso: si muere, el trabajo no puede terminar
+            'pid': os.getpid(),
+            'created_at': now,
+            'updated_at': now,
+            'result': None,
+            'error': None,
+        }
+        
+        with self._lock:
+            self._jobs[job_id] = job
+            self._events[job_id] = threading.Event()
+        self._save_job(job)
+        
+        try:
+            # El contexto viaja con el trabajo: los logs conservan el ID de la petición
+            self._queue.put_nowait((job_id, audio, contextvars.copy_context()))
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+                self._events.pop(job_id, None)
+            self._job_path(job_id).unlink(missing_ok=True)
+            raise QueueFullError('Cola de transcripción llena, inténtalo más tarde')
+        
+        logger.info(f"Trabajo de transcripción encolado: {job_id}")
+        return dict(job)
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Obtiene el estado de un trabajo (memoria o disco)"""
+        if not job_id.isalnum():
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                return dict(job)
+        
+        path = self._job_path(job_id)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                job = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No se pudo leer trabajo {job_id}: {e}")
+            return None
+        return self._fail_if_orphaned(job)
+    
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """
+        Espera (long-poll) hasta que el trabajo termine o venza el timeout
+        
+        Si el trabajo pertenece a otro proceso se consulta el disco periódicamente.
+        """
+        event = self._events.get(job_id)
+        if event:
+            event.wait(timeout)
+            return self.get(job_id)
+        
+        deadline = time.monotonic() + timeout
+        job = self.get(job_id)
+        while job and job['status'] not in FINAL_STATUSES and time.monotonic() < deadline:
+            time.sleep(0.25)
+            job = self.get(job_id)
+        return job
+    
+    def queued_count(self) -> int:
+        """Número de trabajos pendientes de empezar"""
+        return self._queue.qsize()
+    
+    def _worker_loop(self):
+        while True:
+            job_id, audio, context = self._queue.get()
+            try:
+                context.run(self._run_job, job_id, audio)
+            finally:
+                self._queue.task_done()
+    
+    def _run_job(self, job_id: str, audio: bytes):
+        self._update_job(job_id, status=STATUS_PROCESSING)
+        try:
+            result = self.handler(audio)
+            self._update_job(job_id, status=STATUS_DONE, result=result)
+            logger.info(f"Trabajo de transcripción completado: {job_id}")
+        except Exception as e:
+            logger.error(f"Error en trabajo de transcripción {job_id}: {e}", exc_info=True)
+            self._update_job(job_id, status=STATUS_ERROR, error=str(e))
+    
+    def _fail_orphaned_jobs(self):
+        """Al arrancar, marca como error los trabajos que un proceso anterior dejó sin terminar"""
+        for path in self.jobs_dir.glob('*.json'):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            self._fail_if_orphaned(job)
+    
+    def _fail_if_orphaned(self, job: Dict) -> Dict:
+        """Un trabajo pendiente cuyo proceso ya no existe no va a terminar nunca"""
+        if job.get('status') in FINAL_STATUSES or _process_alive(job.get('pid')):
+            return job
+        job.update(
+            status=STATUS_ERROR,
+            error='Trabajo interrumpido: el proceso que lo atendía se detuvo',
+            updated_at=time.time()
+        )
+        self._save_job(job)
+        logger.warning(f"Trabajo de transcripción interrumpido: {job['id']}")
+        return job
+    
+    def _cleanup_expired(self):
+        """Elimina del disco los resultados más antiguos que el TTL"""
+        cutoff = time.time() - config.TRANSCRIPTION_JOB_TTL_SECONDS
+        for path in self.jobs_dir.glob('*.json'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, aunque sea de otro usuario
+        return True
+    return True
@@ -0,0 +1,85 @@
+"""
+Servidor de transcripción
+Proceso único que carga el modelo Whisper y atiende a los workers web por un socket Unix
+(TRANSCRIPTION_MODE=remote), para no duplicar los pesos en cada worker de gunicorn
+"""
+import logging
+import os
+import sys
+import threading
+from multiprocessing.connection import Listener
+import config
+import log_config
+import audio_pipeline
+
+log_config.configure_logging()
+logger = logging.getLogger(__name__)
+
+
+def _handle_connection(conn, backend):
+    """Atiende una petición: ('ping',) -> model_id del backend o ('transcribe', audio, idioma)"""
+    try:
+        message = conn.recv()
+        op = message[0]
+        if op == 'ping':
+            conn.send(('ok', backend.model_id))
+        elif op == 'transcribe':
+            _, audio, language = message
+            conn.send(('ok', backend.transcribe(audio, language=language)))
+        else:
+            conn.send(('error', f'Operación desconocida: {op}'))
+    except EOFError:
+        pass
+    except Exception as e:
+        logger.error(f"Error atendiendo petición de transcripción: {e}", exc_info=True)
+        try:
+            conn.send(('error', str(e)))
+        except OSError:
+            pass
+    finally:
+        conn.close()
+
+
+def serve(socket_path: str = None):
+    """Carga el modelo y atiende peticiones hasta que se detenga el proceso"""
+    socket_path = socket_path or config.TRANSCRIPTION_SERVER_SOCKET
+    audio_pipeline.check_remote_secret()
+
+    # Cargar antes de escuchar: los workers esperan (ping) hasta que el socket exista
+    backend = audio_pipeline.load_local_backend()
+    if config.WHISPER_WARMUP_INFERENCE:
+        backend.warm_up()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with Listener(socket_path, family='AF_UNIX', authkey=config.SECRET_KEY.encode()) as listener:
+        os.chmod(socket_path, 0o600)
+        logger.info(f"Servidor de transcripción escuchando en {socket_path} ({backend.name})")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Autenticación fallida o cliente que se desconecta durante el saludo
+                logger.warning(f"Conexión rechazada: {e}")
+                continue
+            threading.Thread(
+                target=_handle_connection,
+                args=(conn, backend),
+                daemon=True
+            ).start()
+
+
+def main():
+    try:
+        serve()
+        return 0
+    except KeyboardInterrupt:
+        return 0
+    except Exception as e:
+        logger.error(f"Error en servidor de transcripción: {e}", exc_info=True)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())